@@ -0,0 +1,58 @@
+"""
+Arranque en frío de un worker: tiempo de `import main` y tiempo hasta la
+primera respuesta de /token, cada uno en un intérprete nuevo y sobre una base
+de datos SQLite temporal.
+
+    python -m benchmarks.arranque --repeticiones 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import time
+inicio = time.perf_counter()
+import main
+importado = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as cliente:
+	cliente.post("/token", data={"username": "nadie", "password": "nada"})
+	primera = time.perf_counter()
+print(importado - inicio, primera - inicio)
+"""
+
+
+def medir_una_vez():
+	with tempfile.TemporaryDirectory() as directorio:
+		entorno = dict(os.environ, PYTHONPATH=RAIZ)
+		salida = subprocess.run([sys.executable, "-c", SCRIPT], cwd=directorio, env=entorno,
+			capture_output=True, text=True, check=True).stdout.split()
+	return float(salida[-2]), float(salida[-1])
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--repeticiones", type=int, default=5)
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	args = parser.parse_args()
+
+	medidas = [medir_una_vez() for _ in range(args.repeticiones)]
+	resultado = {
+		"import_main_s": statistics.median(m[0] for m in medidas),
+		"primera_peticion_s": statistics.median(m[1] for m in medidas),
+		"repeticiones": args.repeticiones,
+	}
+	print(json.dumps(resultado))
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(resultado, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,69 @@
+"""
+Coste por petición de get_current_user: consulta del usuario en cada
+petición (comportamiento anterior), caché por (usuario, jti) y confianza en
+los scopes del token firmado. Como referencia, solo la verificación del JWT.
+
+    python -m benchmarks.autenticacion --iteraciones 5000
+"""
+import argparse
+import json
+import time
+from datetime import timedelta
+
+from benchmarks.entorno import crear_admin, directorio_temporal
+
+
+def por_llamada(funcion, iteraciones):
+	funcion()
+	inicio = time.perf_counter()
+	for _ in range(iteraciones):
+		funcion()
+	return 1e6 * (time.perf_counter() - inicio) / iteraciones
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--iteraciones", type=int, default=5000)
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	args = parser.parse_args()
+
+	with directorio_temporal():
+		usuario, _ = crear_admin()
+		from fastapi.security import SecurityScopes
+		from jose import jwt
+		from core import config
+		from db.database import SessionLocal
+		import security.auth as auth
+
+		with SessionLocal() as db:
+			admin = auth.get_user(db, usuario)
+			token = auth.create_access_token({"sub": admin.usuario, "uid": str(admin.id), "scopes": admin.role},
+				timedelta(minutes=30))
+		scopes = SecurityScopes(["cliente"])
+
+		def con_sesion(antes=None):
+			def llamada():
+				if antes:
+					antes()
+				with SessionLocal() as db:
+					auth.get_current_user(scopes, token, db)
+			return llamada
+
+		resultado = {"iteraciones": args.iteraciones}
+		resultado["solo_jwt_us"] = por_llamada(
+			lambda: jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM]), args.iteraciones)
+		# Sin caché: cada llamada vuelve a consultar la base, como antes
+		resultado["consulta_por_peticion_us"] = por_llamada(
+			con_sesion(auth._usuarios_en_cache.clear), args.iteraciones)
+		resultado["cache_us"] = por_llamada(con_sesion(), args.iteraciones)
+		config.AUTH_CONFIAR_SCOPES_TOKEN = True
+		resultado["scopes_del_token_us"] = por_llamada(con_sesion(), args.iteraciones)
+
+	print(json.dumps(resultado, indent=2))
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(resultado, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
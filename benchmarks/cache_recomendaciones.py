@@ -0,0 +1,85 @@
+"""
+Latencia de /producto/leer_productos_recomendados/ cuando los carruseles
+repiten unas pocas cestas, con y sin cache_recomendaciones. Se intercala una
+actualización de producto cada `--cambio-cada` peticiones para medir el
+coste de las invalidaciones.
+
+    python -m benchmarks.cache_recomendaciones --productos 20000 --peticiones 400
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.carga import percentiles
+from benchmarks.entorno import cliente_asgi, directorio_temporal, poblar_catalogo
+
+
+async def medir(cliente, cestas, args):
+	from engine.indice import indice_recomendador
+
+	rnd = random.Random(0)
+	cola = asyncio.Queue()
+	for i in range(args.peticiones):
+		cola.put_nowait(i)
+	latencias = []
+
+	async def trabajador():
+		while not cola.empty():
+			i = cola.get_nowait()
+			if args.cambio_cada and i % args.cambio_cada == args.cambio_cada - 1:
+				# Equivale a lo que hacen los endpoints de escritura tras el commit
+				indice_recomendador.agregar_producto(f"bench-{i}", f"Nuevo {i}", "pizza casera con queso")
+			inicio = time.perf_counter()
+			r = await cliente.post("/producto/leer_productos_recomendados/",
+				json={"nombres_productos": rnd.choice(cestas), "top_n": 10, "agregacion": "suma"})
+			r.raise_for_status()
+			latencias.append(time.perf_counter() - inicio)
+
+	inicio = time.perf_counter()
+	await asyncio.gather(*(trabajador() for _ in range(args.concurrencia)))
+	return latencias, time.perf_counter() - inicio
+
+
+async def ejecutar(args):
+	with directorio_temporal():
+		catalogo = poblar_catalogo(args.productos)
+		rnd = random.Random(1)
+		cestas = [[nombre for nombre, _ in rnd.sample(catalogo, args.semillas)] for _ in range(args.cestas)]
+		resultados = {"productos": args.productos, "cestas": args.cestas, "semillas": args.semillas,
+			"concurrencia": args.concurrencia, "cambio_cada": args.cambio_cada}
+		async with cliente_asgi() as cliente:
+			from engine.cache_resultados import cache_recomendaciones
+			from engine.planificador import planificador_indice
+			await planificador_indice.esperar_indice()
+
+			for nombre, activa in (("sin_cache", False), ("con_cache", True)):
+				cache_recomendaciones.activa = activa
+				cache_recomendaciones.limpiar()
+				latencias, duracion = await medir(cliente, cestas, args)
+				resultados[nombre] = {**percentiles(latencias), "peticiones_por_s": len(latencias) / duracion}
+			resultados["cache"] = cache_recomendaciones.estado()
+	return resultados
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--productos", type=int, default=20000)
+	parser.add_argument("--peticiones", type=int, default=400)
+	parser.add_argument("--cestas", type=int, default=20, help="cestas distintas que repiten los carruseles")
+	parser.add_argument("--semillas", type=int, default=5)
+	parser.add_argument("--concurrencia", type=int, default=8)
+	parser.add_argument("--cambio-cada", type=int, default=100, help="0 = catálogo sin cambios")
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	args = parser.parse_args()
+
+	resultado = asyncio.run(ejecutar(args))
+	print(json.dumps(resultado, indent=2))
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(resultado, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
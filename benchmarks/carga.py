@@ -0,0 +1,94 @@
+"""
+Latencia de /producto/leer_productos_libres/ sola y mientras corren
+recomendaciones concurrentes, con la aplicación en el mismo proceso.
+
+    python -m benchmarks.carga --productos 5000 --peticiones 200
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.entorno import cliente_asgi, directorio_temporal, poblar_catalogo
+
+
+def percentiles(latencias):
+	latencias = sorted(latencias)
+	def p(q):
+		return 1000 * latencias[min(len(latencias) - 1, int(q * len(latencias)))]
+	return {"p50_ms": p(0.50), "p90_ms": p(0.90), "p99_ms": p(0.99)}
+
+
+async def medir_lecturas(cliente, peticiones, concurrencia):
+	latencias = []
+	cola = asyncio.Queue()
+	for _ in range(peticiones):
+		cola.put_nowait(None)
+
+	async def trabajador():
+		while not cola.empty():
+			cola.get_nowait()
+			inicio = time.perf_counter()
+			r = await cliente.get("/producto/leer_productos_libres/", params={"limit": 50})
+			r.raise_for_status()
+			latencias.append(time.perf_counter() - inicio)
+
+	await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+	return latencias
+
+
+async def recomendar_sin_parar(cliente, catalogo, parar, contador):
+	i = 0
+	while not parar.is_set():
+		semillas = [catalogo[(i * 7 + j) % len(catalogo)][0] for j in range(20)]
+		r = await cliente.post("/producto/leer_productos_recomendados/",
+			json={"nombres_productos": semillas, "top_n": 10, "agregacion": "suma"})
+		r.raise_for_status()
+		contador[0] += 1
+		i += 1
+
+
+async def ejecutar(args):
+	with directorio_temporal():
+		catalogo = poblar_catalogo(args.productos)
+		async with cliente_asgi() as cliente:
+			from engine.planificador import planificador_indice
+			await planificador_indice.esperar_indice()
+
+			sola = await medir_lecturas(cliente, args.peticiones, args.concurrencia)
+
+			parar, contador = asyncio.Event(), [0]
+			fondo = [asyncio.create_task(recomendar_sin_parar(cliente, catalogo, parar, contador))
+				for _ in range(args.recomendadores)]
+			inicio = time.perf_counter()
+			con_carga = await medir_lecturas(cliente, args.peticiones, args.concurrencia)
+			duracion = time.perf_counter() - inicio
+			parar.set()
+			await asyncio.gather(*fondo)
+
+	return {
+		"productos": args.productos,
+		"lecturas_solas": percentiles(sola),
+		"lecturas_con_recomendaciones": percentiles(con_carga),
+		"recomendaciones_por_s": contador[0] / duracion,
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--productos", type=int, default=5000)
+	parser.add_argument("--peticiones", type=int, default=200)
+	parser.add_argument("--concurrencia", type=int, default=4)
+	parser.add_argument("--recomendadores", type=int, default=8)
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	args = parser.parse_args()
+
+	resultado = asyncio.run(ejecutar(args))
+	print(json.dumps(resultado, indent=2))
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(resultado, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
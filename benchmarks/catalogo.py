@@ -0,0 +1,28 @@
+import random
+
+# Vocabulario de ejemplo para generar catálogos hoteleros sintéticos
+PLATOS = ["pizza", "pasta", "ensalada", "sopa", "paella", "tortilla", "croquetas", "filete",
+	"pollo", "pescado", "gambas", "arroz", "hamburguesa", "bocadillo", "tarta", "helado",
+	"flan", "cafe", "te", "zumo", "cerveza", "vino", "coctel", "agua", "batido", "tostada"]
+ADJETIVOS = ["fresco", "casero", "picante", "dulce", "salado", "crujiente", "frio", "caliente",
+	"tostado", "natural", "artesanal", "ligero", "intenso", "suave", "gratinado", "asado"]
+INGREDIENTES = ["tomate", "queso", "jamon", "cebolla", "ajo", "aceite", "limon", "chocolate",
+	"vainilla", "fresa", "mango", "patata", "champinones", "atun", "bacon", "nata", "miel",
+	"albahaca", "oregano", "pimienta", "menta", "canela", "almendra", "naranja"]
+SERVICIOS = ["desayuno", "almuerzo", "cena", "terraza", "piscina", "habitacion", "bar",
+	"buffet", "carta", "menu", "infantil", "vegetariano", "sin gluten"]
+
+
+def generar_descripcion(rnd):
+	plato = rnd.choice(PLATOS)
+	ingredientes = rnd.sample(INGREDIENTES, rnd.randint(2, 5))
+	return (f"{plato} {rnd.choice(ADJETIVOS)} con {', '.join(ingredientes)} "
+		f"servido en {rnd.choice(SERVICIOS)} de la casa, ideal para {rnd.choice(SERVICIOS)}")
+
+
+def generar_catalogo(n, semilla=0):
+	"""
+	Lista de (nombre, descripcion) con nombres únicos y descripciones en español.
+	"""
+	rnd = random.Random(semilla)
+	return [(f"Producto {i:06d}", generar_descripcion(rnd)) for i in range(n)]
@@ -0,0 +1,124 @@
+"""
+Actualizaciones perdidas de consumo_producto bajo concurrencia: lectura,
++1 y escritura en Python (como antes) frente al UPDATE atómico y al
+acumulador write-behind.
+
+    python -m benchmarks.consumo --hilos 8 --incrementos 200 --productos 5
+"""
+import argparse
+import json
+import threading
+import time
+
+from benchmarks.entorno import directorio_temporal, poblar_catalogo
+
+
+def leer_modificar_escribir(id, n):
+	from db.database import SessionLocal
+	from models.data import Producto
+
+	with SessionLocal() as db:
+		producto = db.query(Producto).filter(Producto.id_producto == id).first()
+		producto.consumo_producto = producto.consumo_producto + n
+		db.commit()
+
+
+def atomico(id, n):
+	from db.consumo import sumar_consumo
+	from db.database import SessionLocal
+
+	with SessionLocal() as db:
+		sumar_consumo(db, {id: n})
+
+
+def lanzar(operacion, ids, hilos, incrementos):
+	errores = []
+	barrera = threading.Barrier(hilos)
+
+	def trabajador(h):
+		barrera.wait()
+		for i in range(incrementos):
+			try:
+				operacion(ids[(h + i) % len(ids)], 1)
+			except Exception as e:
+				errores.append(type(e).__name__)
+
+	inicio = time.perf_counter()
+	trabajadores = [threading.Thread(target=trabajador, args=(h,)) for h in range(hilos)]
+	for t in trabajadores:
+		t.start()
+	for t in trabajadores:
+		t.join()
+	return time.perf_counter() - inicio, errores
+
+
+def totales(ids):
+	from sqlalchemy import func, select, update
+	from db.database import SessionLocal
+	from models.data import Producto
+
+	with SessionLocal() as db:
+		total = db.scalar(select(func.sum(Producto.consumo_producto)))
+		db.execute(update(Producto).values(consumo_producto=0))
+		db.commit()
+	return total or 0
+
+
+def medir(nombre, operacion, ids, args, antes=None, despues=None):
+	if antes:
+		antes()
+	duracion, errores = lanzar(operacion, ids, args.hilos, args.incrementos)
+	if despues:
+		despues()
+	esperado = args.hilos * args.incrementos
+	total = totales(ids)
+	return {
+		"modo": nombre,
+		"esperado": esperado,
+		"guardado": total,
+		"perdidos": esperado - total,
+		"errores": len(errores),
+		"incrementos_por_s": esperado / duracion,
+	}
+
+
+def ejecutar(args):
+	with directorio_temporal():
+		poblar_catalogo(args.productos)
+		from db.consumo import AcumuladorConsumo
+		from db.database import SessionLocal
+		from models.data import Producto
+
+		with SessionLocal() as db:
+			ids = [str(i) for i, in db.query(Producto.id_producto)]
+			db.query(Producto).update({Producto.consumo_producto: 0})
+			db.commit()
+
+		acumulador = AcumuladorConsumo(intervalo=args.intervalo_ms / 1000, max_eventos=args.max_eventos)
+		return [
+			medir("leer_modificar_escribir", leer_modificar_escribir, ids, args),
+			medir("update_atomico", atomico, ids, args),
+			medir("write_behind", acumulador.sumar, ids, args,
+				antes=acumulador.iniciar, despues=acumulador.detener),
+		]
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--hilos", type=int, default=8)
+	parser.add_argument("--incrementos", type=int, default=200)
+	parser.add_argument("--productos", type=int, default=5)
+	parser.add_argument("--intervalo-ms", type=float, default=200)
+	parser.add_argument("--max-eventos", type=int, default=500)
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	args = parser.parse_args()
+
+	resultado = ejecutar(args)
+	print(json.dumps(resultado, indent=2))
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(resultado, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
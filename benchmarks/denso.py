@@ -0,0 +1,87 @@
+"""
+Motor de embeddings densos: tiempo de codificación y de construcción de cada
+índice ANN, bytes de los vectores y latencia y recall@k por recomendación
+frente a la búsqueda exacta, según el tamaño del catálogo.
+
+    python -m benchmarks.denso --tamanos 10000 100000 --ann exacto ivf hnsw
+"""
+import argparse
+import json
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from benchmarks.carga import percentiles
+from benchmarks.catalogo import generar_catalogo
+from core import config
+from engine import densos
+from engine.indice_denso import IndiceDenso
+
+
+def recall(aproximados, exactos):
+	aciertos = [len(set(a) & set(e)) / max(len(e), 1) for a, e in zip(aproximados, exactos)]
+	return float(np.mean(aciertos))
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--tamanos", type=int, nargs="+", default=[10000, 100000])
+	parser.add_argument("--ann", nargs="+", default=["exacto", "ivf", "hnsw"])
+	parser.add_argument("--cuantizacion", default=config.DENSO_CUANTIZACION)
+	parser.add_argument("--top-n", type=int, default=10)
+	parser.add_argument("--consultas", type=int, default=200)
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	args = parser.parse_args()
+	config.DENSO_CUANTIZACION = args.cuantizacion
+
+	resultados = []
+	for n in args.tamanos:
+		catalogo = [(str(uuid.UUID(int=i)), nombre, descripcion)
+			for i, (nombre, descripcion) in enumerate(generar_catalogo(n))]
+		codificador = densos.crear_codificador()
+		inicio = time.perf_counter()
+		vectores = densos.Vectores.desde_float32(codificador.ajustar([d for _, _, d in catalogo]))
+		codificacion = time.perf_counter() - inicio
+		consultas = np.random.default_rng(0).integers(0, n, args.consultas)
+		nombres = [catalogo[i][1] for i in consultas]
+
+		exactos = None
+		for tipo in args.ann:
+			config.DENSO_ANN = tipo
+			with tempfile.TemporaryDirectory() as directorio:
+				indice = IndiceDenso(fuente=lambda: catalogo, directorio=directorio)
+				inicio = time.perf_counter()
+				indice.construir()
+				construccion = time.perf_counter() - inicio
+				# Segunda construcción: se abre la generación guardada
+				indice = IndiceDenso(fuente=lambda: catalogo, directorio=directorio)
+				inicio = time.perf_counter()
+				indice.construir()
+				reapertura = time.perf_counter() - inicio
+
+			latencias, respuestas = [], []
+			for nombre in nombres:
+				inicio = time.perf_counter()
+				respuesta = indice.recomendar([nombre], args.top_n)
+				latencias.append(time.perf_counter() - inicio)
+				respuestas.append([r["nombre_producto"] for r in respuesta])
+			if tipo == "exacto":
+				exactos = respuestas
+			fila = {"n": n, "ann": tipo, "cuantizacion": args.cuantizacion,
+				"dimension": vectores.dimension, "bytes_vectores": vectores.nbytes,
+				"codificacion_s": codificacion, "construccion_s": construccion,
+				"reapertura_s": reapertura, **percentiles(latencias)}
+			if exactos is not None:
+				fila["recall"] = recall(respuestas, exactos)
+			resultados.append(fila)
+			print(json.dumps(fila))
+
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
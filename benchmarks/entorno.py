@@ -0,0 +1,81 @@
+import contextlib
+import os
+import tempfile
+
+from benchmarks.catalogo import generar_catalogo
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@contextlib.contextmanager
+def directorio_temporal():
+	"""
+	Ejecuta el bloque en un directorio temporal: la base SQLite y los snapshots
+	se crean en rutas relativas al directorio de trabajo.
+	"""
+	anterior = os.getcwd()
+	with tempfile.TemporaryDirectory() as directorio:
+		os.chdir(directorio)
+		try:
+			yield directorio
+		finally:
+			os.chdir(anterior)
+
+
+def crear_tablas():
+	"""
+	crear_esquema donde exista; en árboles anteriores, create_all sobre el
+	motor de db.database, para poder medir también la versión base.
+	"""
+	from db import database
+
+	if hasattr(database, "crear_esquema"):
+		database.crear_esquema()
+	else:
+		from models.data import Base
+		Base.metadata.create_all(bind=database.engine)
+
+
+def poblar_catalogo(n, imagen=None, lote=1000):
+	"""
+	Inserta n productos sintéticos; `imagen` son bytes opcionales para cada uno.
+	"""
+	from sqlalchemy import insert
+	from db.database import SessionLocal
+	from models.data import Producto
+
+	crear_tablas()
+	catalogo = generar_catalogo(n)
+	with SessionLocal() as db:
+		for inicio in range(0, n, lote):
+			db.execute(insert(Producto), [
+				{"nombre_producto": nombre, "desc_producto": descripcion, "imagen_b64": imagen}
+				for nombre, descripcion in catalogo[inicio:inicio + lote]])
+		db.commit()
+	return catalogo
+
+
+def crear_admin(usuario="admin", password="admin"):
+	from db.database import SessionLocal
+	from models.data import User
+	from security.auth import get_password_hash
+
+	crear_tablas()
+	with SessionLocal() as db:
+		db.add(User(usuario=usuario, role=["admin", "cliente"], hashed_password=get_password_hash(password)))
+		db.commit()
+	return usuario, password
+
+
+@contextlib.asynccontextmanager
+async def cliente_asgi():
+	"""
+	Cliente httpx contra la aplicación en el mismo proceso, con su lifespan.
+	"""
+	import httpx
+	from main import app
+
+	async with app.router.lifespan_context(app):
+		transporte = httpx.ASGITransport(app=app)
+		async with httpx.AsyncClient(transport=transporte, base_url="http://prueba") as cliente:
+			yield cliente
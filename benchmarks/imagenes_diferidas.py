@@ -0,0 +1,88 @@
+"""
+Bytes cargados, memoria pico y latencia por petición de las consultas
+`db.query(Producto).filter(...).first()` de los endpoints sobre un catálogo
+con imágenes de 200 KB: columna imagen_b64 cargada siempre (comportamiento
+anterior, reproducido con undefer_group) frente a diferida.
+
+    python -m benchmarks.imagenes_diferidas --productos 2000 --imagen-kb 200
+"""
+import argparse
+import json
+import os
+import random
+import time
+import tracemalloc
+
+from benchmarks.carga import percentiles
+from benchmarks.entorno import directorio_temporal, poblar_catalogo
+
+
+def bytes_cargados(producto):
+	return sum(len(v) for k, v in vars(producto).items()
+		if not k.startswith("_") and isinstance(v, (bytes, str)))
+
+
+def medir(ids, opciones):
+	from db.database import SessionLocal
+	from models.data import Producto
+
+	lecturas, escrituras, leidos, picos = [], [], [], []
+	for id in ids:
+		with SessionLocal() as db:
+			tracemalloc.start()
+			inicio = time.perf_counter()
+			producto = db.query(Producto).options(*opciones).filter(Producto.id_producto == id).first()
+			lecturas.append(time.perf_counter() - inicio)
+			picos.append(tracemalloc.get_traced_memory()[1])
+			tracemalloc.stop()
+			leidos.append(bytes_cargados(producto))
+		with SessionLocal() as db:
+			# Lo que hace actualizar_producto_consumo: buscar, modificar, commit, refresh
+			inicio = time.perf_counter()
+			producto = db.query(Producto).options(*opciones).filter(Producto.id_producto == id).first()
+			producto.consumo_producto = (producto.consumo_producto or 0) + 1
+			db.commit()
+			db.refresh(producto)
+			escrituras.append(time.perf_counter() - inicio)
+	return {
+		"bytes_por_peticion": sum(leidos) / len(leidos),
+		"pico_kb": sum(picos) / len(picos) / 1024,
+		"lectura": percentiles(lecturas),
+		"lectura_y_actualizacion": percentiles(escrituras),
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--productos", type=int, default=2000)
+	parser.add_argument("--imagen-kb", type=int, default=200)
+	parser.add_argument("--peticiones", type=int, default=300)
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	args = parser.parse_args()
+
+	with directorio_temporal():
+		poblar_catalogo(args.productos, imagen=os.urandom(args.imagen_kb * 1024))
+		from sqlalchemy.orm import undefer_group
+		from db.database import SessionLocal
+		from models.data import Producto
+
+		with SessionLocal() as db:
+			ids = [i for i, in db.query(Producto.id_producto)]
+		random.Random(0).shuffle(ids)
+		resultado = {
+			"productos": args.productos,
+			"imagen_kb": args.imagen_kb,
+			# Filas distintas en cada modo: la primera actualización de una fila
+			# cuesta distinto que las siguientes
+			"imagen_cargada": medir(ids[:args.peticiones], [undefer_group("imagen")]),
+			"imagen_diferida": medir(ids[args.peticiones:2 * args.peticiones], []),
+		}
+
+	print(json.dumps(resultado, indent=2))
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(resultado, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
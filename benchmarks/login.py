@@ -0,0 +1,75 @@
+"""
+Inicios de sesión por segundo en un worker y su efecto sobre la latencia de
+lecturas de productos concurrentes, con la aplicación en el mismo proceso.
+
+    python -m benchmarks.login --productos 2000 --logins 8 --peticiones 300
+    HASH_HILOS=1 python -m benchmarks.login      # otro tamaño del pool de bcrypt
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.carga import medir_lecturas, percentiles
+from benchmarks.entorno import cliente_asgi, crear_admin, directorio_temporal, poblar_catalogo
+
+
+async def login_sin_parar(cliente, usuario, password, parar, latencias, rechazos):
+	while not parar.is_set():
+		inicio = time.perf_counter()
+		r = await cliente.post("/token", data={"username": usuario, "password": password})
+		if r.status_code == 503:
+			rechazos[0] += 1
+			await asyncio.sleep(0.05)
+			continue
+		r.raise_for_status()
+		latencias.append(time.perf_counter() - inicio)
+
+
+async def ejecutar(args):
+	with directorio_temporal():
+		poblar_catalogo(args.productos)
+		usuario, password = crear_admin()
+		async with cliente_asgi() as cliente:
+			sola = await medir_lecturas(cliente, args.peticiones, args.concurrencia)
+
+			parar, logins, rechazos = asyncio.Event(), [], [0]
+			fondo = [asyncio.create_task(login_sin_parar(cliente, usuario, password, parar, logins, rechazos))
+				for _ in range(args.logins)]
+			inicio = time.perf_counter()
+			con_logins = await medir_lecturas(cliente, args.peticiones, args.concurrencia)
+			duracion = time.perf_counter() - inicio
+			parar.set()
+			await asyncio.gather(*fondo)
+			estado = (await cliente.get("/token/estado")).json()
+
+	return {
+		"productos": args.productos,
+		"logins_concurrentes": args.logins,
+		"logins_por_s": len(logins) / duracion,
+		"latencia_login": percentiles(logins) if logins else {},
+		"logins_rechazados": rechazos[0],
+		"lecturas_solas": percentiles(sola),
+		"lecturas_con_logins": percentiles(con_logins),
+		"pool_hash": estado,
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--productos", type=int, default=2000)
+	parser.add_argument("--peticiones", type=int, default=300)
+	parser.add_argument("--concurrencia", type=int, default=4)
+	parser.add_argument("--logins", type=int, default=8)
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	args = parser.parse_args()
+
+	resultado = asyncio.run(ejecutar(args))
+	print(json.dumps(resultado, indent=2))
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(resultado, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
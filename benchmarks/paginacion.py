@@ -0,0 +1,66 @@
+"""
+Memoria pico y latencia por página del listado de productos sobre un catálogo
+con imágenes: carga completa de objetos Producto (comportamiento anterior)
+frente a proyección de columnas con cursor keyset.
+
+    python -m benchmarks.paginacion --productos 100000 --imagen-kb 20
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+from benchmarks.entorno import directorio_temporal, poblar_catalogo
+
+
+def medir(funcion):
+	tracemalloc.start()
+	inicio = time.perf_counter()
+	resultado = funcion()
+	duracion = time.perf_counter() - inicio
+	_, pico = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return resultado, {"ms": 1000 * duracion, "pico_mb": pico / 2**20}
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--productos", type=int, default=100000)
+	parser.add_argument("--imagen-kb", type=int, default=20)
+	parser.add_argument("--limit", type=int, default=100)
+	parser.add_argument("--paginas", type=int, default=20)
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	args = parser.parse_args()
+
+	with directorio_temporal():
+		poblar_catalogo(args.productos, imagen=os.urandom(args.imagen_kb * 1024))
+		from db.database import SessionLocal
+		from db.productos import listar_pagina
+		from models.data import Producto
+
+		resultado = {"productos": args.productos, "imagen_kb": args.imagen_kb, "limit": args.limit}
+		with SessionLocal() as db:
+			_, resultado["carga_completa"] = medir(lambda: [
+				(p.id_producto, p.nombre_producto, p.desc_producto) for p in db.query(Producto).all()])
+		for orden in ("id", "consumo"):
+			paginas, cursor = [], None
+			with SessionLocal() as db:
+				for _ in range(args.paginas):
+					(_, cursor), medida = medir(lambda: listar_pagina(db, args.limit, cursor=cursor, orden=orden))
+					paginas.append(medida)
+			resultado[f"pagina_{orden}"] = {
+				"ms_media": sum(p["ms"] for p in paginas) / len(paginas),
+				"pico_mb_max": max(p["pico_mb"] for p in paginas),
+				"pico_mb_primera": paginas[0]["pico_mb"],
+				"pico_mb_ultima": paginas[-1]["pico_mb"],
+			}
+
+	print(json.dumps(resultado, indent=2))
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(resultado, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
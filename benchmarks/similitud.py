@@ -0,0 +1,71 @@
+"""
+Memoria pico y latencia por consulta de la similitud densa (cosine_similarity
+N×N + argsort) frente al motor disperso top-k, según el tamaño del catálogo.
+
+    python -m benchmarks.similitud --tamanos 1000 5000 10000 50000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from benchmarks.catalogo import generar_catalogo
+from engine.similitud import top_k_similares
+
+# Por encima de este tamaño la matriz densa no cabe razonablemente en memoria
+MAX_DENSO = 20000
+
+
+def medir(funcion):
+	tracemalloc.start()
+	inicio = time.perf_counter()
+	funcion()
+	duracion = time.perf_counter() - inicio
+	_, pico = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return duracion, pico
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 5000, 10000, 20000, 50000])
+	parser.add_argument("--top-n", type=int, default=5)
+	parser.add_argument("--consultas", type=int, default=20)
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	args = parser.parse_args()
+
+	resultados = []
+	for n in args.tamanos:
+		descripciones = [d for _, d in generar_catalogo(n)]
+		matriz = TfidfVectorizer().fit_transform(descripciones).tocsr()
+		consultas = np.random.default_rng(0).integers(0, n, args.consultas)
+		fila = {"n": n, "nnz": int(matriz.nnz)}
+
+		def disperso():
+			for i in consultas:
+				top_k_similares(matriz, matriz[[i]], args.top_n, excluir=[[i]])
+		duracion, pico = medir(disperso)
+		fila.update(disperso_ms=1000 * duracion / len(consultas), disperso_pico_mb=pico / 2**20)
+
+		if n <= MAX_DENSO:
+			def denso():
+				similitud = cosine_similarity(matriz, matriz)
+				for i in consultas:
+					similitud[i].argsort()[::-1][:args.top_n + 1]
+			duracion, pico = medir(denso)
+			fila.update(denso_ms=1000 * duracion / len(consultas), denso_pico_mb=pico / 2**20)
+
+		resultados.append(fila)
+		print(json.dumps(fila))
+
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,318 @@
+"""
+Suite de referencia del recomendador, de la API de productos y de /token
+sobre catálogos sintéticos en español. Cada tamaño y cada fase se mide en un
+intérprete nuevo con su propia base SQLite temporal, así la memoria pico de
+una medida no arrastra la de la anterior:
+
+- motor: throughput de limpiar_texto, tiempo de ajuste de crear_matrix_tfidf
+  y latencia y RSS pico de recomendar_productos, leyendo el catálogo de la base.
+- api: latencia de los endpoints /producto/* y de /token con la aplicación en
+  el mismo proceso (cliente ASGI), sin caché de recomendaciones.
+
+El resultado es un JSON con el commit, la máquina y los parámetros, para
+comparar ejecuciones posteriores con --comparar. Las medidas básicas solo usan
+lo que ya tenía la versión inicial del proyecto; lo añadido después (agregación,
+orden por consumo, /similares, /populares, planificador, caché) se mide solo
+si el árbol lo tiene, así que la suite también corre sobre la base.
+
+    python -m benchmarks.suite --salida base.json
+    python -m benchmarks.suite --tamanos 1000 10000 --imagen-kb 20 --salida nueva.json
+    python -m benchmarks.suite --comparar base.json nueva.json
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.carga import percentiles
+from benchmarks.entorno import RAIZ, cliente_asgi, crear_admin, directorio_temporal, poblar_catalogo
+
+# Versión del formato del JSON de resultados
+FORMATO = 1
+FASES = ("motor", "api")
+
+
+def rss_pico_mb():
+	# ru_maxrss viene en KB en Linux y en bytes en macOS
+	pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return pico / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def cestas(nombres, cantidad, semillas, semilla=0):
+	rnd = random.Random(semilla)
+	return [rnd.sample(nombres, min(semillas, len(nombres))) for _ in range(cantidad)]
+
+
+def medir_motor(args):
+	import pandas as pd
+	from sqlalchemy import select
+	from db.database import engine
+	from engine.recomendador import crear_matrix_tfidf, limpiar_texto, recomendar_productos
+	from models.data import Producto
+
+	try:
+		from engine.texto import normalizador_por_defecto
+	except ImportError:
+		# Árbol sin caché de textos: frío y caliente miden lo mismo
+		normalizador_por_defecto = None
+
+	poblar_catalogo(args.productos, imagen=os.urandom(args.imagen_kb * 1024) if args.imagen_kb else None)
+	inicio = time.perf_counter()
+	df = pd.read_sql(select(Producto.id_producto, Producto.nombre_producto, Producto.desc_producto,
+		Producto.consumo_producto), engine)
+	lectura = time.perf_counter() - inicio
+	normalizador = normalizador_por_defecto() if normalizador_por_defecto else None
+	rss_inicial = rss_pico_mb()
+	opciones = {"agregacion": "suma"} if "agregacion" in inspect.signature(recomendar_productos).parameters else {}
+
+	# recomendar_productos reajusta el TF-IDF en cada llamada; va primero para
+	# que el RSS pico del proceso sea el suyo
+	latencias = []
+	for cesta in cestas(list(df["nombre_producto"]), args.consultas, args.semillas):
+		inicio = time.perf_counter()
+		recomendar_productos(df, cesta, top_n=10, **opciones)
+		latencias.append(time.perf_counter() - inicio)
+	recomendar = {"primera_s": latencias[0], **percentiles(latencias),
+		"rss_inicial_mb": rss_inicial, "rss_pico_mb": rss_pico_mb()}
+
+	ajuste = {}
+	for nombre in ("frio_s", "caliente_s"):
+		if nombre == "frio_s" and normalizador:
+			normalizador.limpiar_cache()
+		inicio = time.perf_counter()
+		tfidf_matrix, vectorizer = crear_matrix_tfidf(df)
+		ajuste[nombre] = time.perf_counter() - inicio
+	ajuste.update(terminos=len(vectorizer.vocabulary_), nnz=int(tfidf_matrix.nnz))
+	df.drop("descripcion_limpia", axis=1, inplace=True)
+
+	# Con la caché de textos vacía (stemming de cada palabra) y llena
+	textos = list(df["desc_producto"])
+	if normalizador:
+		normalizador.limpiar_cache()
+	limpieza = {}
+	for nombre in ("frio_textos_por_s", "caliente_textos_por_s"):
+		inicio = time.perf_counter()
+		for texto in textos:
+			limpiar_texto(texto)
+		limpieza[nombre] = len(textos) / (time.perf_counter() - inicio)
+
+	return {"lectura_catalogo_s": lectura, "limpiar_texto": limpieza, "crear_matrix_tfidf": ajuste,
+		"recomendar_productos": recomendar}
+
+
+async def latencias(peticion, veces, calentamiento=3):
+	for _ in range(min(calentamiento, veces)):
+		(await peticion()).raise_for_status()
+	medidas = []
+	for _ in range(veces):
+		inicio = time.perf_counter()
+		r = await peticion()
+		medidas.append(time.perf_counter() - inicio)
+		r.raise_for_status()
+	return percentiles(medidas)
+
+
+def parametros_consulta(app, ruta, metodo="get"):
+	"""Parámetros de query que declara una ruta de la aplicación."""
+	operacion = app.openapi()["paths"].get(ruta, {}).get(metodo, {})
+	return {p["name"] for p in operacion.get("parameters", []) if p["in"] == "query"}
+
+
+def campos_cuerpo(app, ruta, metodo="post"):
+	"""Campos del cuerpo JSON que declara una ruta de la aplicación."""
+	esquema = app.openapi()
+	operacion = esquema["paths"].get(ruta, {}).get(metodo, {})
+	referencia = operacion.get("requestBody", {}).get("content", {}).get("application/json", {}).get("schema", {})
+	nombre = referencia.get("$ref", "").rsplit("/", 1)[-1]
+	return set(esquema.get("components", {}).get("schemas", {}).get(nombre, {}).get("properties", {}))
+
+
+# Endpoints posteriores a la versión base: se omiten si responden 404
+OPCIONALES = ("similares", "populares")
+
+
+async def medir_api(args):
+	from sqlalchemy import select
+	from db.database import SessionLocal
+	from models.data import Producto
+
+	catalogo = poblar_catalogo(args.productos, imagen=os.urandom(args.imagen_kb * 1024) if args.imagen_kb else None)
+	usuario, password = crear_admin()
+	with SessionLocal() as db:
+		ids = [str(i) for i in db.scalars(select(Producto.id_producto))]
+	rnd = random.Random(1)
+	lista = cestas([nombre for nombre, _ in catalogo], args.peticiones, args.semillas)
+	siguiente = iter(range(10**9))
+
+	async with cliente_asgi() as cliente:
+		from main import app
+
+		resultado = {}
+		try:
+			from engine.planificador import planificador_indice
+		except ImportError:
+			# Sin índice en memoria: cada recomendación reajusta el TF-IDF
+			pass
+		else:
+			inicio = time.perf_counter()
+			await planificador_indice.esperar_indice()
+			resultado["indice_s"] = time.perf_counter() - inicio
+		try:
+			from engine.cache_resultados import cache_recomendaciones
+		except ImportError:
+			pass
+		else:
+			# Se mide el motor, no la caché (benchmarks.cache_recomendaciones)
+			cache_recomendaciones.activa = False
+
+		login = {"username": usuario, "password": password}
+		r = await cliente.post("/token", data=login)
+		r.raise_for_status()
+		cabeceras = {"Authorization": f"Bearer {r.json()['access_token']}"}
+		pagina = {"limit": 50}
+		if "orden" in parametros_consulta(app, "/producto/leer_productos/"):
+			pagina["orden"] = "consumo"
+		cuerpo = {"top_n": 10}
+		if "agregacion" in campos_cuerpo(app, "/producto/leer_productos_recomendados/"):
+			cuerpo["agregacion"] = "suma"
+
+		rutas = {
+			"token": (lambda: cliente.post("/token", data=login), args.logins),
+			"leer_productos_libres": (lambda: cliente.get("/producto/leer_productos_libres/",
+				params={"limit": 50, "skip": rnd.randrange(0, max(1, args.productos - 50))}), args.peticiones),
+			"leer_productos": (lambda: cliente.get("/producto/leer_productos/", headers=cabeceras,
+				params=pagina), args.peticiones),
+			"leer_productos_recomendados": (lambda: cliente.post("/producto/leer_productos_recomendados/",
+				json={"nombres_productos": lista[next(siguiente) % len(lista)], **cuerpo}), args.peticiones),
+			"similares": (lambda: cliente.get(f"/producto/similares/{rnd.choice(ids)}",
+				params={"top_n": 10}), args.peticiones),
+			"populares": (lambda: cliente.get("/producto/populares/", params={"top_n": 10}), args.peticiones),
+			"incrementar_consumo": (lambda: cliente.put(f"/producto/incrementar_consumo/{rnd.choice(ids)}"),
+				args.peticiones),
+		}
+		if args.imagen_kb:
+			# El arranque (crear_esquema) ya pasó los BLOB al almacén; esto solo calienta la muestra
+			muestra = ids[:args.peticiones]
+			for id in muestra:
+				(await cliente.get(f"/producto/imagen/{id}")).raise_for_status()
+			rutas["imagen"] = (lambda: cliente.get(f"/producto/imagen/{rnd.choice(muestra)}"), args.peticiones)
+
+		for nombre, (peticion, veces) in rutas.items():
+			if nombre in OPCIONALES and veces and (await peticion()).status_code == 404:
+				continue
+			if veces:
+				resultado[nombre] = await latencias(peticion, veces)
+	resultado["rss_pico_mb"] = rss_pico_mb()
+	return resultado
+
+
+def trabajador(args):
+	with directorio_temporal():
+		if args.trabajador == "motor":
+			return medir_motor(args)
+		return asyncio.run(medir_api(args))
+
+
+def subproceso(fase, n, args):
+	with tempfile.TemporaryDirectory() as directorio:
+		entorno = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directorio, 'bench.db')}")
+		# Sin tabla de vecinos: en catálogos grandes su cálculo en segundo plano
+		# compite con las medidas (se mide aparte en benchmarks.vecinos)
+		entorno.setdefault("VECINOS_ACTIVO", "0")
+		orden = [sys.executable, "-m", "benchmarks.suite", "--trabajador", fase, "--productos", str(n),
+			"--imagen-kb", str(args.imagen_kb), "--consultas", str(args.consultas),
+			"--semillas", str(args.semillas), "--peticiones", str(args.peticiones),
+			"--logins", str(args.logins)]
+		salida = subprocess.run(orden, env=entorno, cwd=RAIZ, check=True, capture_output=True, text=True)
+	return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def commit():
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, check=True,
+			capture_output=True, text=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def aplanar(valor, prefijo=""):
+	if isinstance(valor, dict):
+		for clave, v in valor.items():
+			yield from aplanar(v, f"{prefijo}.{clave}" if prefijo else clave)
+	elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+		yield prefijo, valor
+
+
+def comparar(ruta_base, ruta_nueva):
+	"""
+	Cociente nueva/base de cada medida común. En latencias, tiempos y memoria
+	menos es mejor; en *_por_s, más.
+	"""
+	with open(ruta_base) as f:
+		base = {r["productos"]: r for r in json.load(f)["resultados"]}
+	with open(ruta_nueva) as f:
+		nueva = {r["productos"]: r for r in json.load(f)["resultados"]}
+	for n in sorted(base.keys() & nueva.keys()):
+		antes = dict(aplanar(base[n]))
+		for clave, valor in aplanar(nueva[n]):
+			if clave != "productos" and antes.get(clave):
+				print(f"{n:>7} {clave:<55} {antes[clave]:>12.4f} {valor:>12.4f} {valor / antes[clave]:>7.2f}x")
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 10000, 100000])
+	parser.add_argument("--fases", nargs="+", choices=FASES, default=list(FASES))
+	parser.add_argument("--imagen-kb", type=int, default=0, help="imagen aleatoria por producto; 0 = sin imágenes")
+	parser.add_argument("--consultas", type=int, default=5, help="llamadas a recomendar_productos")
+	parser.add_argument("--semillas", type=int, default=5, help="productos por cesta")
+	parser.add_argument("--peticiones", type=int, default=100, help="peticiones por endpoint")
+	parser.add_argument("--logins", type=int, default=20, help="peticiones a /token (bcrypt)")
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVA"), help="comparar dos ficheros de resultados")
+	parser.add_argument("--productos", type=int, help=argparse.SUPPRESS)
+	parser.add_argument("--trabajador", choices=FASES, help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.comparar:
+		comparar(*args.comparar)
+		return
+	if args.trabajador:
+		print(json.dumps(trabajador(args)))
+		return
+
+	resultados = []
+	for n in args.tamanos:
+		fila = {"productos": n}
+		for fase in args.fases:
+			fila[fase] = subproceso(fase, n, args)
+		resultados.append(fila)
+		print(json.dumps(fila), flush=True)
+
+	informe = {
+		"formato": FORMATO,
+		"fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+		"commit": commit(),
+		"python": platform.python_version(),
+		"plataforma": platform.platform(),
+		"cpus": os.cpu_count(),
+		"parametros": {clave: valor for clave, valor in vars(args).items()
+			if clave not in ("salida", "comparar", "productos", "trabajador")},
+		"resultados": resultados,
+	}
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(informe, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
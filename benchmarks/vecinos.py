@@ -0,0 +1,72 @@
+"""
+Tabla de vecinos precalculada: tiempo y memoria pico del cálculo por bloques,
+bytes de la tabla y latencia de "similares a este producto" leyendo la tabla
+frente a calcularlo en vivo con el índice.
+
+    python -m benchmarks.vecinos --tamanos 1000 10000 50000
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+import numpy as np
+
+from benchmarks.carga import percentiles
+from benchmarks.catalogo import generar_catalogo
+from engine import estado as motor
+from engine.vecinos import TablaVecinos, capturar
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 10000, 50000])
+	parser.add_argument("--k", type=int, default=20)
+	parser.add_argument("--top-n", type=int, default=10)
+	parser.add_argument("--consultas", type=int, default=200)
+	parser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+	args = parser.parse_args()
+
+	resultados = []
+	for n in args.tamanos:
+		catalogo = [(str(uuid.UUID(int=i)), nombre, descripcion)
+			for i, (nombre, descripcion) in enumerate(generar_catalogo(n))]
+		estado = motor.ajustar(catalogo)
+		ids = [catalogo[i][0] for i in np.random.default_rng(0).integers(0, n, args.consultas)]
+
+		with tempfile.TemporaryDirectory() as directorio:
+			tabla = TablaVecinos(directorio=directorio, k=args.k)
+			tracemalloc.start()
+			inicio = time.perf_counter()
+			tabla.construir(capturar(estado))
+			calculo = time.perf_counter() - inicio
+			_, pico = tracemalloc.get_traced_memory()
+			tracemalloc.stop()
+
+			tabla_ms = []
+			for id_producto in ids:
+				inicio = time.perf_counter()
+				tabla.similares(id_producto, args.top_n)
+				tabla_ms.append(time.perf_counter() - inicio)
+			bytes_tabla = tabla._tabla["vecinos"].nbytes + tabla._tabla["puntos"].nbytes
+
+		vivo_ms = []
+		for id_producto in ids[:max(1, args.consultas // 10)]:
+			inicio = time.perf_counter()
+			motor.similares(estado.preparar_similares(id_producto), args.top_n)
+			vivo_ms.append(time.perf_counter() - inicio)
+
+		fila = {"n": n, "k": args.k, "calculo_s": calculo, "pico_mb": pico / 2**20,
+			"bytes_tabla": bytes_tabla, "tabla": percentiles(tabla_ms), "en_vivo": percentiles(vivo_ms)}
+		resultados.append(fila)
+		print(json.dumps(fila))
+
+	if args.salida:
+		with open(args.salida, "w") as f:
+			json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from core import config
+
+# Trabajo de CPU (recomendaciones) fuera del bucle de eventos y con un tope de
+# hilos, para que una ráfaga de recomendaciones no acapare el threadpool de
+# FastAPI donde corren los endpoints síncronos con sesiones de base de datos
+ejecutor_cpu = ThreadPoolExecutor(max_workers=config.CPU_HILOS, thread_name_prefix="cpu")
+
+
+async def en_ejecutor_cpu(funcion, *args, **kwargs):
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(ejecutor_cpu, partial(funcion, *args, **kwargs))
+
+
+class ColaLlena(RuntimeError):
+	"""El ejecutor ya tiene `cola_maxima` trabajos pendientes."""
+
+
+class EjecutorLimitado:
+	"""
+	ThreadPoolExecutor con un tope de trabajos pendientes (en cola o en curso)
+	y métricas de la cola. Al superar el tope `enviar` lanza ColaLlena en
+	lugar de dejar crecer la espera sin límite.
+	"""
+
+	def __init__(self, hilos, cola_maxima, nombre):
+		self._ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix=nombre)
+		self._lock = threading.Lock()
+		self.hilos = hilos
+		self.cola_maxima = cola_maxima
+		self.pendientes = 0
+		self.en_curso = 0
+		self.maximo_pendientes = 0
+		self.completados = 0
+		self.rechazados = 0
+		self.espera_total = 0.0
+		self.ejecucion_total = 0.0
+
+	def enviar(self, funcion, *args, rechazar=True, **kwargs):
+		with self._lock:
+			if rechazar and self.cola_maxima and self.pendientes >= self.cola_maxima:
+				self.rechazados += 1
+				raise ColaLlena(f"{self.pendientes} trabajos pendientes")
+			self.pendientes += 1
+			self.maximo_pendientes = max(self.maximo_pendientes, self.pendientes)
+		encolado = time.perf_counter()
+
+		def tarea():
+			inicio = time.perf_counter()
+			with self._lock:
+				self.en_curso += 1
+				self.espera_total += inicio - encolado
+			try:
+				return funcion(*args, **kwargs)
+			finally:
+				with self._lock:
+					self.en_curso -= 1
+					self.pendientes -= 1
+					self.completados += 1
+					self.ejecucion_total += time.perf_counter() - inicio
+
+		return self._ejecutor.submit(tarea)
+
+	def ejecutar(self, funcion, *args, **kwargs):
+		"""Desde código síncrono: espera su turno sin rechazar."""
+		return self.enviar(funcion, *args, rechazar=False, **kwargs).result()
+
+	async def en_ejecutor(self, funcion, *args, **kwargs):
+		return await asyncio.wrap_future(self.enviar(funcion, *args, **kwargs))
+
+	def estado(self):
+		with self._lock:
+			completados = max(self.completados, 1)
+			return {
+				"hilos": self.hilos,
+				"cola_maxima": self.cola_maxima,
+				"pendientes": self.pendientes,
+				"en_cola": self.pendientes - self.en_curso,
+				"en_curso": self.en_curso,
+				"maximo_pendientes": self.maximo_pendientes,
+				"completados": self.completados,
+				"rechazados": self.rechazados,
+				"espera_media_ms": 1000 * self.espera_total / completados,
+				"ejecucion_media_ms": 1000 * self.ejecucion_total / completados,
+			}
+
+
+# bcrypt: pocos hilos para que los picos de login no se lleven toda la CPU
+ejecutor_hash = EjecutorLimitado(config.HASH_HILOS, config.HASH_COLA_MAXIMA, "hash")
@@ -1,4 +1,4 @@
-from db.database import SessionLocal, Base
+from db.database import SessionLocal, Base, crear_esquema
 from models.data import User
 from sqlalchemy.exc import IntegrityError
 from security.auth import get_password_hash
@@ -30,6 +30,7 @@ def create_user(session, username, password):
 
 if __name__ == "__main__":
     # Iniciar sesión con la base de datos
+    crear_esquema()
     db = SessionLocal()
     
     # Datos del nuevo usuario
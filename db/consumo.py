@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from uuid import UUID
+
+from sqlalchemy import bindparam, case, select, update
+
+from core import config
+from models.data import Producto
+
+logger = logging.getLogger(__name__)
+
+_tabla = Producto.__table__
+
+# Suma atómica en la propia base de datos, sin leer la fila; nunca baja de 0
+_SUMAR = (update(_tabla)
+	.where(_tabla.c.id_producto == bindparam("id"))
+	.values(consumo_producto=case(
+		(_tabla.c.consumo_producto + bindparam("n") < 0, 0),
+		else_=_tabla.c.consumo_producto + bindparam("n"))))
+
+
+def id_producto(id):
+	"""UUID del producto, o None si el id no tiene formato válido."""
+	try:
+		return UUID(str(id))
+	except ValueError:
+		return None
+
+
+def existe_producto(db, id):
+	clave = id_producto(id)
+	if clave is None:
+		return False
+	return db.scalar(select(_tabla.c.id_producto).where(_tabla.c.id_producto == clave)) is not None
+
+
+def sumar_consumo(db, incrementos):
+	"""
+	UPDATE producto SET consumo_producto = consumo_producto + :n para cada
+	(id, n) de `incrementos`, en una sola transacción. Devuelve las filas
+	actualizadas.
+	"""
+	parametros = [{"id": id_producto(id), "n": n} for id, n in incrementos.items() if n]
+	parametros = [p for p in parametros if p["id"] is not None]
+	if not parametros:
+		return 0
+	resultado = db.execute(_SUMAR, parametros)
+	db.commit()
+	return resultado.rowcount
+
+
+class AcumuladorConsumo:
+	"""
+	Write-behind de los contadores de consumo.
+
+	Los incrementos se suman en memoria por producto y un hilo los vuelca en
+	una transacción por lote cada `intervalo` segundos, o antes si se acumulan
+	`max_eventos`. Al detenerse vuelca lo pendiente. Si un volcado falla los
+	incrementos vuelven a la cola y se reintentan en el siguiente.
+
+	Al agrupar, un +1 y un -1 del mismo producto se anulan antes de llegar a
+	la base, así que el tope en 0 se aplica sobre el neto de cada lote.
+	"""
+
+	def __init__(self, sesiones=None, intervalo=None, max_eventos=None):
+		self._sesiones = sesiones
+		self.intervalo = config.CONSUMO_INTERVALO_MS / 1000 if intervalo is None else intervalo
+		self.max_eventos = config.CONSUMO_MAX_EVENTOS if max_eventos is None else max_eventos
+		self._lock = threading.Lock()
+		self._volcando = threading.Lock()
+		self._pendientes = {}
+		self._eventos = 0
+		self._despertar = threading.Event()
+		self._parar = threading.Event()
+		self._hilo = None
+		self.volcados = 0
+		self.filas_volcadas = 0
+		self.ultimo_error = None
+
+	@property
+	def activo(self):
+		return self._hilo is not None
+
+	def _sesion(self):
+		if self._sesiones is None:
+			from db.database import SessionLocal
+			return SessionLocal()
+		return self._sesiones()
+
+	def iniciar(self):
+		if self._hilo is not None:
+			return
+		self._parar.clear()
+		self._hilo = threading.Thread(target=self._bucle, name="volcado-consumo", daemon=True)
+		self._hilo.start()
+
+	def detener(self):
+		"""Para el hilo y vuelca lo pendiente antes de volver."""
+		if self._hilo is None:
+			return
+		self._parar.set()
+		self._despertar.set()
+		self._hilo.join()
+		self._hilo = None
+		self.volcar()
+
+	def sumar(self, id, n=1):
+		if self._hilo is None:
+			# Sin hilo de volcado (scripts, pruebas): escritura directa
+			with self._sesion() as db:
+				sumar_consumo(db, {id: n})
+			return
+		with self._lock:
+			self._pendientes[id] = self._pendientes.get(id, 0) + n
+			self._eventos += 1
+			lleno = self._eventos >= self.max_eventos
+		if lleno:
+			self._despertar.set()
+
+	def volcar(self):
+		"""Escribe en la base todo lo acumulado. Devuelve las filas actualizadas."""
+		with self._volcando:
+			with self._lock:
+				lote, self._pendientes, self._eventos = self._pendientes, {}, 0
+			if not lote:
+				return 0
+			try:
+				with self._sesion() as db:
+					filas = sumar_consumo(db, lote)
+			except Exception as e:
+				with self._lock:
+					for id, n in lote.items():
+						self._pendientes[id] = self._pendientes.get(id, 0) + n
+						self._eventos += 1
+				self.ultimo_error = str(e)
+				logger.exception("No se pudo volcar el consumo acumulado")
+				raise
+			self.volcados += 1
+			self.filas_volcadas += filas
+			self.ultimo_error = None
+			return filas
+
+	def _bucle(self):
+		while not self._parar.is_set():
+			self._despertar.wait(self.intervalo)
+			self._despertar.clear()
+			try:
+				self.volcar()
+			except Exception:
+				# Ya registrado; se reintenta en la siguiente vuelta
+				time.sleep(self.intervalo)
+
+	def estado(self):
+		with self._lock:
+			pendientes = len(self._pendientes)
+		return {
+			"activo": self.activo,
+			"pendientes": pendientes,
+			"volcados": self.volcados,
+			"filas_volcadas": self.filas_volcadas,
+			"ultimo_error": self.ultimo_error,
+		}
+
+
+acumulador_consumo = AcumuladorConsumo()
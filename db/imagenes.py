@@ -0,0 +1,155 @@
+import hashlib
+import io
+import os
+import tempfile
+
+from core import config
+
+# Bytes leídos por vuelta al copiar una subida al almacén
+TAM_TROZO = 1024 * 1024
+
+_FIRMAS = (
+	(b"\xff\xd8\xff", "image/jpeg"),
+	(b"\x89PNG\r\n\x1a\n", "image/png"),
+	(b"GIF87a", "image/gif"),
+	(b"GIF89a", "image/gif"),
+)
+
+
+def _ruta(huella, tamano=None):
+	# Dos niveles de directorio para no acumular miles de ficheros en uno
+	nombre = huella if tamano is None else f"{huella}_{tamano}"
+	return os.path.join(config.IMAGENES_DIR, huella[:2], nombre)
+
+
+def _escribir_atomico(destino, escribir):
+	os.makedirs(os.path.dirname(destino), exist_ok=True)
+	descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(destino), prefix=".subida-")
+	try:
+		with os.fdopen(descriptor, "wb") as f:
+			resultado = escribir(f)
+		os.replace(temporal, destino)
+	except BaseException:
+		os.unlink(temporal)
+		raise
+	return resultado
+
+
+def guardar_stream(fichero):
+	"""
+	Copia un fichero abierto al almacén por trozos, calculando su SHA-256 por
+	el camino. El contenido se direcciona por su huella: subir dos veces la
+	misma imagen la guarda una sola vez. Devuelve la huella.
+	"""
+	os.makedirs(config.IMAGENES_DIR, exist_ok=True)
+	descriptor, temporal = tempfile.mkstemp(dir=config.IMAGENES_DIR, prefix=".subida-")
+	try:
+		resumen = hashlib.sha256()
+		with os.fdopen(descriptor, "wb") as f:
+			while trozo := fichero.read(TAM_TROZO):
+				resumen.update(trozo)
+				f.write(trozo)
+		huella = resumen.hexdigest()
+		destino = _ruta(huella)
+		if os.path.exists(destino):
+			os.unlink(temporal)
+		else:
+			os.makedirs(os.path.dirname(destino), exist_ok=True)
+			os.replace(temporal, destino)
+	except BaseException:
+		if os.path.exists(temporal):
+			os.unlink(temporal)
+		raise
+	return huella
+
+
+def guardar_bytes(datos):
+	return guardar_stream(io.BytesIO(datos))
+
+
+def descartar(huella):
+	"""
+	Borra del almacén el original y las miniaturas de `huella`. Solo para
+	imágenes que ninguna fila referencia.
+	"""
+	for ruta in [_ruta(huella)] + [_ruta(huella, tamano) for tamano in tamanos()]:
+		try:
+			os.unlink(ruta)
+		except FileNotFoundError:
+			pass
+
+
+def tipo_mime(ruta):
+	with open(ruta, "rb") as f:
+		cabecera = f.read(12)
+	for firma, tipo in _FIRMAS:
+		if cabecera.startswith(firma):
+			return tipo
+	if cabecera[:4] == b"RIFF" and cabecera[8:12] == b"WEBP":
+		return "image/webp"
+	# Lo que devolvía el endpoint original para cualquier imagen
+	return "image/jpeg"
+
+
+def tamanos():
+	return tuple(int(t) for t in config.IMAGENES_TAMANOS.split(",") if t.strip())
+
+
+def generar_variante(huella, tamano):
+	"""
+	Miniatura de `tamano` píxeles de lado mayor, generada una vez y guardada
+	junto al original. Si la imagen ya es más pequeña se sirve el original.
+	"""
+	from PIL import Image
+
+	destino = _ruta(huella, tamano)
+	if os.path.exists(destino):
+		return destino
+	with Image.open(_ruta(huella)) as imagen:
+		if max(imagen.size) <= tamano:
+			return _ruta(huella)
+		imagen.thumbnail((tamano, tamano))
+		if imagen.mode in ("RGBA", "LA", "P"):
+			formato, opciones = "PNG", {"optimize": True}
+		else:
+			formato, opciones = "JPEG", {"quality": 85, "optimize": True}
+			imagen = imagen.convert("RGB")
+		_escribir_atomico(destino, lambda f: imagen.save(f, formato, **opciones))
+	return destino
+
+
+def generar_variantes(huella):
+	"""Pre-genera todas las miniaturas configuradas; pensado para segundo plano."""
+	for tamano in tamanos():
+		try:
+			generar_variante(huella, tamano)
+		except (OSError, ValueError):
+			# Imagen que Pillow no sabe leer: se sirve siempre el original
+			return
+
+
+def ruta_imagen(huella, tamano=None):
+	"""
+	Ruta del fichero a servir, o None si el original no está en el almacén.
+	"""
+	if not os.path.exists(_ruta(huella)):
+		return None
+	if tamano is None:
+		return _ruta(huella)
+	try:
+		return generar_variante(huella, tamano)
+	except (OSError, ValueError):
+		return _ruta(huella)
+
+
+def etag(huella, tamano=None):
+	# ETag fuerte: el contenido queda fijado por la huella y el tamaño
+	return f'"{huella}"' if tamano is None else f'"{huella}-{tamano}"'
+
+
+def coincide_etag(cabecera, valor):
+	"""Comparación débil de If-None-Match (RFC 9110), admite listas y '*'."""
+	if not cabecera:
+		return False
+	candidatos = [c.strip() for c in cabecera.split(",")]
+	return "*" in candidatos or any(c.removeprefix("W/") == valor for c in candidatos)
@@ -0,0 +1,72 @@
+from uuid import UUID
+
+from sqlalchemy import delete, select, update
+
+# Ids por sentencia; por debajo del límite de parámetros de SQLite
+TAM_BLOQUE = 500
+
+
+def _normalizar_ids(ids):
+	"""
+	Separa los ids con formato UUID válido (sin repetir) de los inválidos.
+	"""
+	validos, invalidos = {}, []
+	for id_texto in ids:
+		try:
+			validos.setdefault(UUID(str(id_texto)), id_texto)
+		except ValueError:
+			invalidos.append(id_texto)
+	return validos, invalidos
+
+
+def _por_bloques(db, columna, ids, sentencia, tam_bloque):
+	validos, faltantes = _normalizar_ids(ids)
+	claves = list(validos)
+	encontrados = []
+	for inicio in range(0, len(claves), tam_bloque):
+		bloque = claves[inicio:inicio + tam_bloque]
+		existentes = set(db.scalars(select(columna).where(columna.in_(bloque))))
+		if existentes:
+			db.execute(sentencia.where(columna.in_(existentes)))
+		encontrados.extend(validos[c] for c in bloque if c in existentes)
+		faltantes.extend(validos[c] for c in bloque if c not in existentes)
+	db.commit()
+	return encontrados, faltantes
+
+
+def leer_por_ids(db, columna, ids, seleccion, tam_bloque=TAM_BLOQUE):
+	"""
+	Valores de `seleccion` para las filas cuyo id está en `ids`, por bloques.
+	"""
+	claves = list(_normalizar_ids(ids)[0])
+	valores = []
+	for inicio in range(0, len(claves), tam_bloque):
+		valores.extend(db.scalars(select(seleccion).where(columna.in_(claves[inicio:inicio + tam_bloque]))))
+	return valores
+
+
+def leer_filas_por_ids(db, columna, ids, *columnas, tam_bloque=TAM_BLOQUE):
+	"""
+	Filas con `columnas` de los registros cuyo id está en `ids`, por bloques.
+	"""
+	claves = list(_normalizar_ids(ids)[0])
+	filas = []
+	for inicio in range(0, len(claves), tam_bloque):
+		filas.extend(db.execute(select(*columnas).where(columna.in_(claves[inicio:inicio + tam_bloque]))))
+	return filas
+
+
+def eliminar_por_ids(db, columna, ids, tam_bloque=TAM_BLOQUE):
+	"""
+	DELETE ... WHERE id IN (...) por bloques, sin cargar los objetos.
+	Devuelve (encontrados, faltantes) con los ids tal como llegaron.
+	"""
+	return _por_bloques(db, columna, ids, delete(columna.table), tam_bloque)
+
+
+def actualizar_por_ids(db, columna, ids, valores, tam_bloque=TAM_BLOQUE):
+	"""
+	UPDATE ... SET valores WHERE id IN (...) por bloques.
+	Devuelve (encontrados, faltantes) con los ids tal como llegaron.
+	"""
+	return _por_bloques(db, columna, ids, update(columna.table).values(**valores), tam_bloque)
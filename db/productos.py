@@ -0,0 +1,205 @@
+import base64
+import csv
+import io
+import json
+from uuid import UUID, uuid4
+
+from pydantic import ValidationError
+from sqlalchemy import and_, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from db.imagenes import descartar, guardar_bytes
+from models.data import Producto
+from schemas.producto import ProductoImportar
+
+# Columnas que devuelven los listados; nunca incluyen la imagen
+COLUMNAS_LISTADO = (Producto.id_producto, Producto.nombre_producto, Producto.desc_producto)
+
+ORDENES = ("id", "nombre", "consumo")
+
+LIMITE_MAXIMO = 1000
+
+
+def codificar_cursor(valores):
+	datos = json.dumps(valores, separators=(",", ":")).encode("utf-8")
+	return base64.urlsafe_b64encode(datos).decode("ascii")
+
+
+def decodificar_cursor(cursor):
+	try:
+		return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+	except (ValueError, UnicodeError):
+		raise ValueError("Cursor de paginación inválido")
+
+
+def listar_pagina(db, limit=100, skip=0, cursor=None, orden="id"):
+	"""
+	Una página del catálogo con solo id, nombre y descripción.
+
+	Con `cursor` la paginación es por conjunto de claves (keyset): la consulta
+	empieza justo después de la última fila de la página anterior y su coste
+	no depende de lo lejos que esté la página. Sin cursor se usa `skip`.
+	Devuelve (filas, cursor_siguiente); el cursor es None en la última página.
+	"""
+	if orden not in ORDENES:
+		raise ValueError(f"Orden desconocido: {orden}")
+	limit = max(1, min(limit, LIMITE_MAXIMO))
+	# consumo_producto admite NULL: cuenta como 0 tanto al ordenar como en el
+	# cursor, o esas filas quedarían fuera de la paginación por claves
+	consumo = func.coalesce(Producto.consumo_producto, 0)
+	consulta = select(*COLUMNAS_LISTADO, consumo.label("consumo"))
+
+	if orden == "id":
+		consulta = consulta.order_by(Producto.id_producto)
+	elif orden == "nombre":
+		consulta = consulta.order_by(Producto.nombre_producto)
+	else:
+		consulta = consulta.order_by(consumo.desc(), Producto.id_producto)
+
+	if cursor is not None:
+		ultimo = decodificar_cursor(cursor)
+		try:
+			if orden == "id":
+				consulta = consulta.where(Producto.id_producto > UUID(ultimo[0]))
+			elif orden == "nombre":
+				consulta = consulta.where(Producto.nombre_producto > ultimo[0])
+			else:
+				consumo_ultimo, id_producto = int(ultimo[0]), UUID(ultimo[1])
+				consulta = consulta.where(or_(
+					consumo < consumo_ultimo,
+					and_(consumo == consumo_ultimo, Producto.id_producto > id_producto)))
+		except (IndexError, TypeError, ValueError):
+			raise ValueError("Cursor de paginación inválido")
+	elif skip:
+		consulta = consulta.offset(skip)
+
+	filas = db.execute(consulta.limit(limit)).all()
+	siguiente = None
+	if len(filas) == limit:
+		ultima = filas[-1]
+		if orden == "id":
+			siguiente = codificar_cursor([str(ultima.id_producto)])
+		elif orden == "nombre":
+			siguiente = codificar_cursor([ultima.nombre_producto])
+		else:
+			siguiente = codificar_cursor([ultima.consumo, str(ultima.id_producto)])
+	return filas, siguiente
+
+
+def iterar_catalogo(db, tam_lote=1000):
+	"""
+	Recorre todo el catálogo (sin imágenes) por lotes de `tam_lote` filas con
+	yield_per, sin cargar el resultado completo en memoria.
+	"""
+	consulta = select(*COLUMNAS_LISTADO, Producto.consumo_producto).execution_options(yield_per=tam_lote)
+	for lote in db.execute(consulta).partitions():
+		yield lote
+
+
+def _insertar_lote(db, lote, resumen, al_insertar=None):
+	"""
+	Inserta un lote con un solo executemany. Si otro proceso insertó un nombre
+	entre la comprobación y el insert, se repite fila a fila para señalarlo.
+	Las imágenes se guardan aquí, solo para las filas que se van a insertar.
+	`al_insertar` recibe (id, nombre, descripcion) de las filas insertadas.
+	"""
+	for _, valores in lote:
+		imagen = valores.pop("imagen")
+		valores["imagen_hash"] = guardar_bytes(imagen) if imagen else None
+		# El id se fija aquí para poder avisar de las filas insertadas
+		valores["id_producto"] = uuid4()
+	insertadas = []
+	try:
+		db.execute(insert(Producto), [valores for _, valores in lote])
+		db.commit()
+		resumen["insertados"] += len(lote)
+		insertadas = [valores for _, valores in lote]
+	except IntegrityError:
+		db.rollback()
+		for numero, valores in lote:
+			try:
+				db.execute(insert(Producto), [valores])
+				db.commit()
+				resumen["insertados"] += 1
+				insertadas.append(valores)
+			except IntegrityError:
+				db.rollback()
+				resumen["conflictos"].append({"fila": numero, "nombre_producto": valores["nombre_producto"],
+					"error": "Ya existe un producto con ese nombre"})
+				_descartar_imagen(db, valores["imagen_hash"])
+	if al_insertar is not None and insertadas:
+		al_insertar([(v["id_producto"], v["nombre_producto"], v["desc_producto"]) for v in insertadas])
+
+
+def _descartar_imagen(db, huella):
+	# Imagen de una fila rechazada: se borra si ninguna otra fila la usa
+	if huella and db.scalar(select(Producto.id_producto).where(Producto.imagen_hash == huella).limit(1)) is None:
+		descartar(huella)
+
+
+def importar_productos(db, filas, tam_lote=500, al_insertar=None):
+	"""
+	Importa productos desde un iterable de dicts, validándolos uno a uno
+	según llegan e insertándolos por lotes de `tam_lote`.
+
+	Los nombres repetidos (en la base de datos o dentro de la propia
+	importación) se informan por fila en "conflictos"; las filas inválidas en
+	"errores". Las filas válidas se insertan igualmente. `al_insertar` recibe
+	tras cada lote (id, nombre, descripcion) de las filas insertadas.
+	"""
+	resumen = {"insertados": 0, "conflictos": [], "errores": []}
+	vistos = set()
+	pendientes = []
+
+	def vaciar():
+		nombres = [valores["nombre_producto"] for _, valores in pendientes]
+		existentes = set(db.scalars(select(Producto.nombre_producto).where(Producto.nombre_producto.in_(nombres))))
+		lote = []
+		for numero, valores in pendientes:
+			if valores["nombre_producto"] in existentes:
+				resumen["conflictos"].append({"fila": numero, "nombre_producto": valores["nombre_producto"],
+					"error": "Ya existe un producto con ese nombre"})
+			else:
+				lote.append((numero, valores))
+		if lote:
+			_insertar_lote(db, lote, resumen, al_insertar)
+		pendientes.clear()
+
+	for numero, fila in enumerate(filas, start=1):
+		try:
+			producto = ProductoImportar.model_validate(fila)
+			imagen = base64.b64decode(producto.imagen_b64, validate=True) if producto.imagen_b64 else None
+		except (ValidationError, ValueError) as e:
+			resumen["errores"].append({"fila": numero, "error": str(e)})
+			continue
+		if producto.nombre_producto in vistos:
+			resumen["conflictos"].append({"fila": numero, "nombre_producto": producto.nombre_producto,
+				"error": "Nombre repetido dentro de la importación"})
+			continue
+		vistos.add(producto.nombre_producto)
+		pendientes.append((numero, {"nombre_producto": producto.nombre_producto,
+			"desc_producto": producto.desc_producto, "imagen": imagen}))
+		if len(pendientes) >= tam_lote:
+			vaciar()
+	if pendientes:
+		vaciar()
+	resumen["conflictos"].sort(key=lambda c: c["fila"])
+	return resumen
+
+
+def leer_filas_archivo(archivo, formato):
+	"""
+	Filas de un fichero CSV (con cabecera) o NDJSON, leídas en streaming.
+	Una línea NDJSON mal formada se devuelve como texto para que falle la validación.
+	"""
+	texto = io.TextIOWrapper(archivo, encoding="utf-8", newline="")
+	if formato == "csv":
+		for fila in csv.DictReader(texto):
+			yield {k: v for k, v in fila.items() if v not in (None, "")}
+		return
+	for linea in texto:
+		if linea.strip():
+			try:
+				yield json.loads(linea)
+			except ValueError:
+				yield linea
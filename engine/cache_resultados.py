@@ -0,0 +1,142 @@
+import asyncio
+import sys
+
+from cachetools import TTLCache
+
+from core import config
+
+
+def tamano_resultado(clave, valor):
+    """Bytes aproximados de una entrada: lista de dicts con cadenas."""
+    tamano = sys.getsizeof(clave) + sum(sys.getsizeof(s) for s in clave[2]) + sys.getsizeof(valor)
+    for fila in valor:
+        tamano += sys.getsizeof(fila) + sum(sys.getsizeof(v) for v in fila.values())
+    return tamano
+
+
+class _CacheContada(TTLCache):
+    # TTLCache (LRU con caducidad) que cuenta lo que expulsa por falta de sitio
+    # y lo que descarta por caducado
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.expulsadas = 0
+        self.caducadas = 0
+
+    def popitem(self):
+        self.expulsadas += 1
+        return super().popitem()
+
+    def expire(self, time=None):
+        caducadas = super().expire(time)
+        self.caducadas += len(caducadas)
+        return caducadas
+
+    def vaciar(self):
+        # clear() usa popitem(): no son expulsiones por falta de sitio
+        expulsadas = self.expulsadas
+        self.clear()
+        self.expulsadas = expulsadas
+
+
+class CacheResultados:
+    """
+    Caché de recomendaciones para los carruseles que repiten la misma cesta.
+
+    La clave es el motor, la versión de su índice y la cesta normalizada (sin
+    repetidos; ordenada cuando el resultado no depende del orden) más top_n y
+    las demás opciones. Cada motor lleva su propia versión: cuando cambia, se
+    descartan de una vez las entradas de ese motor y las del otro siguen.
+
+    Es LRU con caducidad (`ttl` segundos) y un tope de memoria en bytes
+    estimados. Varias peticiones concurrentes con la misma clave ausente
+    esperan a un único cálculo. Solo se usa desde el bucle de eventos.
+    """
+
+    def __init__(self, max_bytes=None, ttl=None):
+        max_bytes = int(config.RECOMENDADOR_CACHE_MB * 2**20) if max_bytes is None else max_bytes
+        self.ttl = config.RECOMENDADOR_CACHE_TTL if ttl is None else ttl
+        self.activa = max_bytes > 0
+        self._cache = _CacheContada(maxsize=max(max_bytes, 1), ttl=self.ttl,
+                                    getsizeof=lambda entrada: entrada[1])
+        self._en_vuelo = {}
+        self._versiones = {}
+        self.aciertos = 0
+        self.fallos = 0
+        self.coalescidas = 0
+        self.invalidaciones = 0
+
+    @staticmethod
+    def clave(motor, version, nombres, top_n, agregacion=None, *opciones):
+        semillas = tuple(dict.fromkeys(nombres))
+        if agregacion is not None:
+            # Con agregación la cesta es un conjunto; sin ella el orden de las
+            # semillas decide el orden de la respuesta
+            semillas = tuple(sorted(semillas))
+        return (motor, version, semillas, top_n, agregacion, *opciones)
+
+    async def obtener(self, clave, calcular):
+        """
+        Devuelve el resultado de `clave` o lo calcula con `await calcular()`.
+        Los dos primeros elementos de la clave son el motor y su versión.
+        """
+        if not self.activa:
+            return await calcular()
+        motor, version = clave[:2]
+        anterior = self._versiones.get(motor)
+        if version != anterior:
+            if anterior is not None:
+                self._descartar(motor)
+                self.invalidaciones += 1
+            self._versiones[motor] = version
+        entrada = self._cache.get(clave)
+        if entrada is not None:
+            self.aciertos += 1
+            return entrada[0]
+        tarea = self._en_vuelo.get(clave)
+        if tarea is not None:
+            self.coalescidas += 1
+        else:
+            self.fallos += 1
+            # Una tarea propia: si se cancela la petición que la lanzó, las
+            # demás que esperan el mismo resultado siguen adelante
+            tarea = asyncio.ensure_future(calcular())
+            self._en_vuelo[clave] = tarea
+            tarea.add_done_callback(lambda t: self._guardar(clave, t))
+        return await asyncio.shield(tarea)
+
+    def _guardar(self, clave, tarea):
+        self._en_vuelo.pop(clave, None)
+        if tarea.cancelled() or tarea.exception() is not None:
+            return
+        valor = tarea.result()
+        tamano = tamano_resultado(clave, valor)
+        if self._versiones.get(clave[0]) == clave[1] and tamano <= self._cache.maxsize:
+            self._cache[clave] = (valor, tamano)
+
+    def _descartar(self, motor):
+        # Borrar una entrada no pasa por popitem(): no cuenta como expulsión
+        for clave in [clave for clave in self._cache.keys() if clave[0] == motor]:
+            self._cache.pop(clave, None)
+
+    def limpiar(self):
+        self._cache.vaciar()
+
+    def estado(self):
+        return {
+            "activa": self.activa,
+            "entradas": len(self._cache),
+            "bytes": self._cache.currsize,
+            "max_bytes": self._cache.maxsize if self.activa else 0,
+            "ttl": self.ttl,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "coalescidas": self.coalescidas,
+            "expulsadas": self._cache.expulsadas,
+            "caducadas": self._cache.caducadas,
+            "invalidaciones": self.invalidaciones,
+            "en_vuelo": len(self._en_vuelo),
+        }
+
+
+cache_recomendaciones = CacheResultados()
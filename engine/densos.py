@@ -0,0 +1,401 @@
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+from core import config
+from engine import snapshot
+from engine.similitud import seleccionar_top_k
+
+# Filas que se puntúan de una vez en la fuerza bruta y al asignar listas IVF
+TAM_BLOQUE = 8192
+
+# Versión del formato de las generaciones en DENSO_DIR
+FORMATO = 1
+
+
+def normalizar(vectores):
+    vectores = np.asarray(vectores, dtype=np.float32)
+    normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return vectores / normas
+
+
+def hash_texto(texto):
+    return hashlib.sha1((texto or "").encode("utf-8")).hexdigest()
+
+
+# -- Codificadores -----------------------------------------------------------
+
+class CodificadorSentenceTransformer:
+    """
+    Modelo SentenceTransformer cargado de ficheros locales, en CPU y sin
+    acceso a la red. Los vectores salen con norma L2. No depende del
+    catálogo, así que los vectores de descripciones sin cambios se reutilizan.
+    """
+
+    necesita_ajuste = False
+
+    def __init__(self, ruta_modelo=None, tam_lote=None):
+        self.ruta_modelo = ruta_modelo or config.DENSO_MODELO_DIR
+        self.tam_lote = tam_lote or config.DENSO_TAM_LOTE
+        self._modelo = None
+
+    @property
+    def huella(self):
+        return f"st-{os.path.basename(os.path.normpath(self.ruta_modelo))}"
+
+    def _cargar(self):
+        if self._modelo is None:
+            if not os.path.isdir(self.ruta_modelo):
+                raise RuntimeError(
+                    f"No se encuentra el modelo en {self.ruta_modelo}. Copie allí los ficheros "
+                    "del modelo (p. ej. hiiamsid/sentence_similarity_spanish_es) o ajuste DENSO_MODELO_DIR")
+            os.environ.setdefault("HF_HUB_OFFLINE", "1")
+            os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+            from sentence_transformers import SentenceTransformer
+            self._modelo = SentenceTransformer(self.ruta_modelo, device="cpu", local_files_only=True)
+        return self._modelo
+
+    def ajustar(self, textos):
+        return self.codificar(textos)
+
+    def codificar(self, textos):
+        textos = list(textos)
+        if not textos:
+            return np.empty((0, self._cargar().get_sentence_embedding_dimension()), dtype=np.float32)
+        return self._cargar().encode(textos, batch_size=self.tam_lote, convert_to_numpy=True,
+                                     normalize_embeddings=True, show_progress_bar=False).astype(np.float32)
+
+    def __getstate__(self):
+        # El modelo se vuelve a cargar de disco, no se guarda con la generación
+        return {**self.__dict__, "_modelo": None}
+
+
+class CodificadorLSA:
+    """
+    Alternativa sin modelo preentrenado: TF-IDF sublineal sobre el texto
+    normalizado y SVD truncada (análisis semántico latente) ajustada al
+    propio catálogo, que acerca términos que aparecen en contextos parecidos.
+    Cada ajuste cambia el espacio, así que se codifica el catálogo entero.
+    """
+
+    necesita_ajuste = True
+
+    def __init__(self, dimension=None):
+        self.dimension = dimension or config.DENSO_DIMENSION_LSA
+        self.huella = f"lsa-{self.dimension}"
+        self._vectorizer = None
+        self._svd = None
+
+    def ajustar(self, textos):
+        """Ajusta el codificador y devuelve los vectores de `textos`."""
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from engine.texto import normalizar_en_paralelo
+
+        textos = list(textos)
+        self._vectorizer = TfidfVectorizer(sublinear_tf=True)
+        matriz = self._vectorizer.fit_transform(normalizar_en_paralelo(textos))
+        componentes = max(1, min(self.dimension, matriz.shape[0] - 1, matriz.shape[1] - 1))
+        self._svd = TruncatedSVD(n_components=componentes, random_state=0)
+        vectores = normalizar(self._svd.fit_transform(matriz))
+        self.huella = f"lsa-{self.dimension}-{hash_texto(''.join(textos))[:16]}"
+        return vectores
+
+    def codificar(self, textos):
+        from engine.texto import normalizador_por_defecto
+
+        normalizador = normalizador_por_defecto()
+        matriz = self._vectorizer.transform([normalizador.normalize(t) for t in textos])
+        return normalizar(self._svd.transform(matriz))
+
+
+CODIFICADORES = {
+    "lsa": CodificadorLSA,
+    "sentence-transformers": CodificadorSentenceTransformer,
+}
+
+
+def crear_codificador(nombre=None):
+    nombre = nombre or config.DENSO_CODIFICADOR
+    if nombre not in CODIFICADORES:
+        raise ValueError(f"Codificador desconocido: {nombre}")
+    return CODIFICADORES[nombre]()
+
+
+# -- Almacenamiento compacto ---------------------------------------------------
+
+class Vectores:
+    """
+    Matriz de vectores con norma L2 en float32, o cuantizada a int8 con una
+    escala por fila (v ≈ q · escala), que ocupa la cuarta parte. En disco son
+    ficheros .npy que se abren con memmap.
+    """
+
+    def __init__(self, datos, escalas=None):
+        self.datos = datos
+        self.escalas = escalas
+
+    @classmethod
+    def desde_float32(cls, vectores, cuantizacion=None):
+        cuantizacion = cuantizacion or config.DENSO_CUANTIZACION
+        vectores = np.asarray(vectores, dtype=np.float32)
+        if cuantizacion == "float32":
+            return cls(vectores)
+        if cuantizacion != "int8":
+            raise ValueError(f"Cuantización desconocida: {cuantizacion}")
+        maximos = np.abs(vectores).max(axis=1) if len(vectores) else np.empty(0, dtype=np.float32)
+        maximos[maximos == 0] = 1.0
+        escalas = (maximos / 127.0).astype(np.float32)
+        datos = np.round(vectores / escalas[:, None]).astype(np.int8)
+        return cls(datos, escalas)
+
+    def __len__(self):
+        return self.datos.shape[0]
+
+    @property
+    def dimension(self):
+        return self.datos.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.datos.nbytes + (self.escalas.nbytes if self.escalas is not None else 0)
+
+    def filas(self, indices):
+        """Filas en float32 (descuantizadas si hace falta)."""
+        filas = self.datos[indices].astype(np.float32)
+        if self.escalas is not None:
+            filas *= self.escalas[indices, None]
+        return filas
+
+    def puntuar(self, indices, consultas):
+        """Producto escalar de cada consulta con las filas `indices`: (q, len(indices))."""
+        return consultas @ self.filas(indices).T
+
+    def guardar(self, directorio):
+        np.save(os.path.join(directorio, "datos.npy"), self.datos)
+        if self.escalas is not None:
+            np.save(os.path.join(directorio, "escalas.npy"), self.escalas)
+
+    @classmethod
+    def cargar(cls, directorio):
+        escalas = os.path.join(directorio, "escalas.npy")
+        return cls(np.load(os.path.join(directorio, "datos.npy"), mmap_mode="r"),
+                   np.load(escalas, mmap_mode="r") if os.path.exists(escalas) else None)
+
+
+# -- Índices de vecinos aproximados --------------------------------------------
+
+def _top_k_filas(candidatos, puntos, k, vivos):
+    # Top-k de cada fila de `puntos` (columnas = `candidatos`), sin filas muertas
+    resultados = []
+    for fila in puntos:
+        if vivos is not None:
+            fila = np.where(vivos[candidatos], fila, -np.inf)
+        elegidos = seleccionar_top_k(fila, k)
+        elegidos = elegidos[np.isfinite(fila[elegidos])]
+        resultados.append((candidatos[elegidos], fila[elegidos]))
+    return resultados
+
+
+def _fusionar(a, b, k):
+    indices = np.concatenate([a[0], b[0]])
+    puntos = np.concatenate([a[1], b[1]])
+    elegidos = seleccionar_top_k(puntos, k)
+    return indices[elegidos], puntos[elegidos]
+
+
+class IndiceExacto:
+    """Fuerza bruta por bloques: referencia de recall y lo más rápido en catálogos pequeños."""
+
+    tipo = "exacto"
+
+    def __init__(self, vectores):
+        self.vectores = vectores
+
+    def buscar(self, consultas, k, vivos=None):
+        n = len(self.vectores)
+        mejores = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))] * len(consultas)
+        for inicio in range(0, n, TAM_BLOQUE):
+            indices = np.arange(inicio, min(inicio + TAM_BLOQUE, n))
+            parciales = _top_k_filas(indices, self.vectores.puntuar(indices, consultas), k, vivos)
+            mejores = [_fusionar(a, b, k) for a, b in zip(mejores, parciales)]
+        return mejores
+
+
+class IndiceIVF:
+    """
+    Índice de ficheros invertidos en numpy: k-means esférico en `listas`
+    centroides y, por consulta, fuerza bruta solo sobre las `sondeos` listas
+    más cercanas. Más sondeos, más recall y más latencia.
+    """
+
+    tipo = "ivf"
+
+    def __init__(self, vectores, listas=None, sondeos=None, iteraciones=10, semilla=0):
+        self.vectores = vectores
+        n = len(vectores)
+        listas = listas or config.DENSO_IVF_LISTAS or int(np.sqrt(max(n, 1)))
+        self.listas = max(1, min(listas, n))
+        self.sondeos = sondeos or config.DENSO_IVF_SONDEOS
+        self.centroides = self._kmeans(iteraciones, np.random.default_rng(semilla))
+        asignacion = self._asignar()
+        # Filas agrupadas por lista: la lista l ocupa orden[inicios[l]:inicios[l + 1]]
+        self.orden = np.argsort(asignacion, kind="stable")
+        self.inicios = np.searchsorted(asignacion[self.orden], np.arange(self.listas + 1))
+
+    def _asignar(self):
+        n = len(self.vectores)
+        asignacion = np.empty(n, dtype=np.int64)
+        for inicio in range(0, n, TAM_BLOQUE):
+            bloque = np.arange(inicio, min(inicio + TAM_BLOQUE, n))
+            asignacion[bloque] = (self.vectores.filas(bloque) @ self.centroides.T).argmax(axis=1)
+        return asignacion
+
+    def _kmeans(self, iteraciones, azar):
+        n = len(self.vectores)
+        muestra = np.sort(azar.choice(n, size=min(n, 64 * self.listas), replace=False))
+        puntos = self.vectores.filas(muestra)
+        centroides = puntos[azar.choice(len(puntos), size=self.listas, replace=False)]
+        for _ in range(iteraciones):
+            asignacion = (puntos @ centroides.T).argmax(axis=1)
+            sumas = np.zeros_like(centroides)
+            np.add.at(sumas, asignacion, puntos)
+            vacias = np.bincount(asignacion, minlength=self.listas) == 0
+            # Una lista vacía se reinicia con un punto al azar
+            sumas[vacias] = puntos[azar.choice(len(puntos), size=int(vacias.sum()))]
+            centroides = normalizar(sumas)
+        return centroides
+
+    def buscar(self, consultas, k, vivos=None):
+        sondeos = min(self.sondeos, self.listas)
+        cercanas = np.argpartition(-(consultas @ self.centroides.T), sondeos - 1, axis=1)[:, :sondeos]
+        resultados = []
+        for consulta, listas in zip(consultas, cercanas):
+            candidatos = np.concatenate([self.orden[self.inicios[l]:self.inicios[l + 1]] for l in listas])
+            resultados.extend(_top_k_filas(candidatos, self.vectores.puntuar(candidatos, consulta[None, :]),
+                                           k, vivos))
+        return resultados
+
+
+class IndiceHNSW:
+    """
+    Grafo HNSW de hnswlib (dependencia opcional). `ef_busqueda` regula
+    recall frente a latencia; `m` y `ef_construccion`, la calidad del grafo.
+    Construirlo es lo caro, así que se guarda con la generación.
+    """
+
+    tipo = "hnsw"
+    FICHERO = "hnsw.bin"
+
+    def __init__(self, vectores, m=None, ef_construccion=None, ef_busqueda=None, directorio=None):
+        import hnswlib
+
+        self.vectores = vectores
+        self.ef_busqueda = ef_busqueda or config.DENSO_HNSW_EF_BUSQUEDA
+        n = len(vectores)
+        self._indice = hnswlib.Index(space="ip", dim=vectores.dimension)
+        ruta = os.path.join(directorio, self.FICHERO) if directorio else None
+        if ruta and os.path.exists(ruta):
+            self._indice.load_index(ruta, max_elements=max(n, 1))
+            return
+        self._indice.init_index(max_elements=max(n, 1), M=m or config.DENSO_HNSW_M,
+                                ef_construction=ef_construccion or config.DENSO_HNSW_EF_CONSTRUCCION,
+                                random_seed=0)
+        for inicio in range(0, n, TAM_BLOQUE):
+            bloque = np.arange(inicio, min(inicio + TAM_BLOQUE, n))
+            self._indice.add_items(self.vectores.filas(bloque), bloque)
+
+    def guardar(self, directorio):
+        self._indice.save_index(os.path.join(directorio, self.FICHERO))
+
+    def buscar(self, consultas, k, vivos=None):
+        n = len(self.vectores)
+        k = min(k, n)
+        if k <= 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))] * len(consultas)
+        filtro = None
+        if vivos is not None and not vivos[:n].all():
+            vivos_base = vivos[:n]
+            filtro = lambda i: bool(vivos_base[i])
+        self._indice.set_ef(max(self.ef_busqueda, k))
+        try:
+            etiquetas, distancias = self._indice.knn_query(consultas, k=k, num_threads=1, filter=filtro)
+        except RuntimeError:
+            # Quedan menos de k filas vivas alcanzables
+            return IndiceExacto(self.vectores).buscar(consultas, k, vivos)
+        # Con space="ip" hnswlib devuelve 1 - producto escalar
+        return [(e.astype(np.int64), 1.0 - d) for e, d in zip(etiquetas, distancias)]
+
+
+def crear_indice_ann(vectores, tipo=None, directorio=None):
+    """
+    "auto" usa HNSW si hnswlib está instalado y, si no, IVF; por debajo de
+    DENSO_MINIMO_ANN filas la fuerza bruta ya es más rápida que cualquiera.
+    """
+    tipo = tipo or config.DENSO_ANN
+    if tipo == "auto":
+        if len(vectores) < config.DENSO_MINIMO_ANN:
+            tipo = "exacto"
+        else:
+            try:
+                import hnswlib  # noqa: F401
+                tipo = "hnsw"
+            except ImportError:
+                tipo = "ivf"
+    if tipo == "exacto":
+        return IndiceExacto(vectores)
+    if tipo == "ivf":
+        return IndiceIVF(vectores)
+    if tipo == "hnsw":
+        return IndiceHNSW(vectores, directorio=directorio)
+    raise ValueError(f"Índice ANN desconocido: {tipo}")
+
+
+# -- Generaciones en disco -----------------------------------------------------
+
+def leer_generacion(directorio):
+    """Metadatos de la generación vigente de DENSO_DIR, o None."""
+    if not directorio:
+        return None
+    return snapshot.leer_actual(directorio, formato=FORMATO)
+
+
+def cargar_generacion(directorio, meta):
+    """(codificador, vectores, ann) de una generación; los vectores con memmap."""
+    ruta = os.path.join(directorio, meta["generacion"])
+    with open(os.path.join(ruta, "codificador.pkl"), "rb") as f:
+        codificador = pickle.load(f)
+    vectores = Vectores.cargar(ruta)
+    ann = crear_indice_ann(vectores, meta["ann"], directorio=ruta)
+    return codificador, vectores, ann
+
+
+def guardar_generacion(directorio, codificador, vectores, ann, productos, hash_catalogo):
+    """
+    Escribe vectores, codificador, índice ANN (si se puede guardar) y el hash
+    de cada descripción, y la publica como generación vigente.
+    """
+    generacion, temporal = snapshot.nueva_generacion(directorio)
+    vectores.guardar(temporal)
+    with open(os.path.join(temporal, "codificador.pkl"), "wb") as f:
+        pickle.dump(codificador, f)
+    if hasattr(ann, "guardar"):
+        ann.guardar(temporal)
+    meta = {
+        "formato": FORMATO,
+        "hash_catalogo": hash_catalogo,
+        "codificador": codificador.huella,
+        "ann": ann.tipo,
+        "ids": [p[0] for p in productos],
+        "nombres": [p[1] for p in productos],
+        "descripciones": [p[2] for p in productos],
+        "hash_textos": [hash_texto(p[2]) for p in productos],
+    }
+    with open(os.path.join(temporal, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    snapshot.publicar(directorio, generacion, temporal)
+    return generacion
@@ -0,0 +1,186 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from engine.popularidad import prior
+from engine.recomendador import limpiar_texto
+from engine.similitud import seleccionar_top_k, top_k_agregado, top_k_similares
+from engine.texto import normalizar_en_paralelo
+
+
+class EstadoIndice:
+    """
+    Contenido del índice: una matriz base ajustada de una vez y un bloque
+    "delta" con las filas añadidas después, transformadas con el vocabulario
+    existente. Las filas nunca se reescriben: una actualización marca la fila
+    vieja como eliminada (tombstone) y añade una nueva al delta.
+    """
+
+    def __init__(self, vectorizer, matriz, ids, nombres, descripciones):
+        self.vectorizer = vectorizer
+        self.base = matriz
+        self.delta = None
+        self.ids = ids
+        self.nombres = nombres
+        self.descripciones = descripciones
+        self.vivos = np.ones(len(ids), dtype=bool)
+        self.fila_por_nombre = {nombre: i for i, nombre in enumerate(nombres)}
+        self.fila_por_id = {id_producto: i for i, id_producto in enumerate(ids)}
+        self.vocabulario = vectorizer.vocabulary_ if vectorizer is not None else {}
+        # Consumo con decaimiento por fila (valores de referencia de Popularidad);
+        # lo mantiene el índice, None = aún sin sincronizar
+        self.popularidad = np.zeros(len(ids))
+        self.epoca_popularidad = None
+        # Medidas de deriva respecto al último ajuste completo
+        self.terminos_nuevos = set()
+        self.muertas = 0
+
+    @property
+    def n_filas(self):
+        return len(self.ids)
+
+    @property
+    def n_base(self):
+        return self.base.shape[0] if self.base is not None else 0
+
+    @property
+    def n_delta(self):
+        return self.delta.shape[0] if self.delta is not None else 0
+
+    def fila(self, i):
+        if i < self.n_base:
+            return self.base[i]
+        return self.delta[i - self.n_base]
+
+    def agregar(self, id_producto, nombre, descripcion):
+        texto = limpiar_texto(descripcion)
+        self.terminos_nuevos.update(t for t in texto.split() if t not in self.vocabulario)
+        fila = self.vectorizer.transform([texto]).tocsr()
+        self.delta = fila if self.delta is None else sp.vstack([self.delta, fila], format="csr")
+        i = len(self.ids)
+        self.ids.append(id_producto)
+        self.nombres.append(nombre)
+        self.descripciones.append(descripcion)
+        self.vivos = np.append(self.vivos, True)
+        self.popularidad = np.append(self.popularidad, 0.0)
+        self.fila_por_nombre[nombre] = i
+        self.fila_por_id[id_producto] = i
+
+    def eliminar(self, id_producto):
+        i = self.fila_por_id.pop(id_producto, None)
+        if i is None:
+            return False
+        if self.fila_por_nombre.get(self.nombres[i]) == i:
+            del self.fila_por_nombre[self.nombres[i]]
+        self.vivos[i] = False
+        self.muertas += 1
+        return True
+
+    def aplicar(self, operacion, argumentos):
+        """
+        Aplica una operación del diario. Son idempotentes: repetir "agregar"
+        o "eliminar" sobre un estado que ya la refleja no cambia el resultado.
+        """
+        if operacion == "eliminar":
+            self.eliminar(*argumentos)
+        elif self.vectorizer is None:
+            # Sin vocabulario todavía: el primer documento útil obliga a ajustar
+            documentos = [d for d in self.documentos() if d[0] != argumentos[0]]
+            self.__dict__.update(ajustar(documentos + [argumentos]).__dict__)
+        else:
+            self.eliminar(argumentos[0])
+            self.agregar(*argumentos)
+
+    def documentos(self):
+        return [(self.ids[i], self.nombres[i], self.descripciones[i])
+                for i in np.flatnonzero(self.vivos)]
+
+    def deriva(self):
+        return {
+            "tombstones": self.muertas / max(self.n_filas, 1),
+            "terminos_nuevos": len(self.terminos_nuevos) / max(len(self.vocabulario), 1),
+            "filas_incrementales": self.n_delta / max(self.n_base, 1),
+        }
+
+    def preparar_consulta(self, nombres, con_popularidad=False):
+        """
+        Toma lo necesario para responder una consulta. Se llama con el lock del
+        índice; el cálculo posterior (`recomendar`) ya no lo necesita.
+        """
+        if self.vectorizer is None:
+            return None
+        filas = [self.fila_por_nombre.get(nombre) for nombre in nombres]
+        filas = list(dict.fromkeys(f for f in filas if f is not None))
+        if not filas:
+            return None
+        consultas = sp.vstack([self.fila(f) for f in filas], format="csr")
+        popularidad = self.popularidad.copy() if con_popularidad else None
+        return (filas, consultas, [self.base, self.delta], self.vivos.copy(),
+                self.nombres, self.descripciones, popularidad)
+
+    def preparar_similares(self, id_producto):
+        fila = self.fila_por_id.get(id_producto)
+        if fila is None or self.vectorizer is None:
+            return None
+        return (fila, self.fila(fila), [self.base, self.delta], self.vivos.copy(),
+                self.ids, self.nombres, self.descripciones)
+
+    def preparar_populares(self):
+        return self.vivos.copy(), self.popularidad.copy(), self.nombres, self.descripciones
+
+
+def ajustar(productos):
+    """
+    Ajuste completo a partir de un iterable de (id, nombre, descripcion).
+    """
+    ids, nombres, descripciones = [], [], []
+    for id_producto, nombre, descripcion in productos:
+        ids.append(str(id_producto))
+        nombres.append(nombre)
+        descripciones.append(descripcion)
+
+    vectorizer = TfidfVectorizer()
+    try:
+        matriz = vectorizer.fit_transform(normalizar_en_paralelo(descripciones)).tocsr()
+    except ValueError:
+        # Catálogo vacío o sin vocabulario útil
+        vectorizer, matriz = None, None
+    return EstadoIndice(vectorizer, matriz, ids, nombres, descripciones)
+
+
+def recomendar(consulta, top_n, agregacion=None, peso=0.0, escala=1.0):
+    filas, consultas, matrices, vivos, nombres, descripciones, popularidad = consulta
+    prior_filas = prior(popularidad, escala, vivos) if popularidad is not None and peso else None
+    if agregacion is None:
+        similares, _ = top_k_similares(matrices, consultas, top_n,
+                                       excluir=[[f] for f in filas], vivos=vivos,
+                                       prior=prior_filas, peso=peso)
+        indices = dict.fromkeys(int(i) for fila in similares for i in fila)
+    else:
+        indices, _ = top_k_agregado(matrices, consultas, top_n, agregacion,
+                                    excluir=filas, vivos=vivos, prior=prior_filas, peso=peso)
+        indices = indices.tolist()
+    return [{"nombre_producto": nombres[i], "desc_producto": descripciones[i]}
+            for i in indices]
+
+
+def similares(consulta, top_n):
+    """Mismo formato que TablaVecinos.similares."""
+    fila, vector, matrices, vivos, ids, nombres, descripciones = consulta
+    indices, puntos = top_k_similares(matrices, vector, top_n, excluir=[[fila]], vivos=vivos)
+    return [{"id_producto": ids[i], "nombre_producto": nombres[i], "desc_producto": descripciones[i],
+             "similitud": round(float(p), 4)}
+            for i, p in zip(indices[0].tolist(), puntos[0].tolist())]
+
+
+def populares(consulta, top_n, escala=1.0):
+    """
+    Los top_n productos vivos con más consumo reciente, para cuando no hay
+    semillas (arranque en frío).
+    """
+    vivos, popularidad, nombres, descripciones = consulta
+    puntos = prior(popularidad, escala, vivos)
+    puntos[~vivos | (popularidad <= 0)] = -np.inf
+    indices = [i for i in seleccionar_top_k(puntos, top_n) if np.isfinite(puntos[i])]
+    return [{"nombre_producto": nombres[i], "desc_producto": descripciones[i]}
+            for i in indices]
@@ -0,0 +1,143 @@
+import numpy as np
+
+from engine import densos
+
+
+class EstadoDenso:
+    """
+    Vectores del catálogo: una base cuantizada con su índice ANN, construida
+    de una vez, y un delta float32 con las filas añadidas después, que se
+    busca por fuerza bruta. Como en EstadoIndice, una actualización marca la
+    fila vieja como eliminada y añade una nueva al delta.
+    """
+
+    def __init__(self, codificador, vectores, ann, ids, nombres, descripciones):
+        self.codificador = codificador
+        self.base = vectores
+        self.ann = ann
+        dimension = vectores.dimension if vectores is not None else 0
+        self.delta = np.empty((0, dimension), dtype=np.float32)
+        self.ids = ids
+        self.nombres = nombres
+        self.descripciones = descripciones
+        self.vivos = np.ones(len(ids), dtype=bool)
+        self.fila_por_nombre = {nombre: i for i, nombre in enumerate(nombres)}
+        self.fila_por_id = {id_producto: i for i, id_producto in enumerate(ids)}
+        self.muertas = 0
+
+    @property
+    def n_filas(self):
+        return len(self.ids)
+
+    @property
+    def n_base(self):
+        return len(self.base) if self.base is not None else 0
+
+    def fila(self, i):
+        if i < self.n_base:
+            return self.base.filas([i])[0]
+        return self.delta[i - self.n_base]
+
+    def agregar(self, id_producto, nombre, descripcion):
+        vector = self.codificador.codificar([descripcion])
+        # Arrays nuevos en lugar de modificarlos: las consultas en curso conservan los suyos
+        self.delta = np.vstack([self.delta, vector])
+        i = len(self.ids)
+        self.ids.append(id_producto)
+        self.nombres.append(nombre)
+        self.descripciones.append(descripcion)
+        self.vivos = np.append(self.vivos, True)
+        self.fila_por_nombre[nombre] = i
+        self.fila_por_id[id_producto] = i
+
+    def eliminar(self, id_producto):
+        i = self.fila_por_id.pop(id_producto, None)
+        if i is None:
+            return False
+        if self.fila_por_nombre.get(self.nombres[i]) == i:
+            del self.fila_por_nombre[self.nombres[i]]
+        self.vivos[i] = False
+        self.muertas += 1
+        return True
+
+    def aplicar(self, operacion, argumentos):
+        """Las mismas operaciones idempotentes del diario de RecommenderIndex."""
+        if operacion == "eliminar":
+            self.eliminar(*argumentos)
+        else:
+            self.eliminar(argumentos[0])
+            self.agregar(*argumentos)
+
+    def deriva(self):
+        return {
+            "tombstones": self.muertas / max(self.n_filas, 1),
+            "filas_incrementales": len(self.delta) / max(self.n_base, 1),
+        }
+
+    def preparar_consulta(self, nombres):
+        """Se llama con el lock del índice; `recomendar` ya no lo necesita."""
+        filas = [self.fila_por_nombre.get(nombre) for nombre in nombres]
+        filas = list(dict.fromkeys(f for f in filas if f is not None))
+        if not filas:
+            return None
+        consultas = np.vstack([self.fila(f) for f in filas]).astype(np.float32)
+        return (filas, consultas, self.ann, self.delta, self.n_base, self.vivos.copy(),
+                self.nombres, self.descripciones)
+
+
+def _buscar(ann, delta, n_base, vivos, consultas, k):
+    # Top-k de cada consulta: ANN sobre la base y fuerza bruta sobre el delta
+    if ann is not None and n_base:
+        resultados = ann.buscar(consultas, k, vivos[:n_base])
+    else:
+        resultados = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))] * len(consultas)
+    if len(delta):
+        candidatos = np.arange(n_base, n_base + len(delta))
+        recientes = densos._top_k_filas(candidatos, consultas @ delta.T, k,
+                                        np.concatenate([np.zeros(n_base, dtype=bool), vivos[n_base:]]))
+        resultados = [densos._fusionar(a, b, k) for a, b in zip(resultados, recientes)]
+    return resultados
+
+
+def _ordenar(puntos, k):
+    indices = np.fromiter(puntos.keys(), dtype=np.int64, count=len(puntos))
+    valores = np.fromiter(puntos.values(), dtype=np.float64, count=len(puntos))
+    return indices[np.lexsort((indices, -valores))[:k]].tolist()
+
+
+def recomendar(consulta, top_n, agregacion=None):
+    """
+    Mismo contrato que engine.estado.recomendar. Con "suma" basta una
+    búsqueda: la suma de cosenos con las semillas es el producto escalar con
+    su centroide. "max" y "rrf" combinan una búsqueda por semilla.
+    """
+    from engine.similitud import AGREGACIONES, CONSTANTE_RRF
+
+    filas, consultas, ann, delta, n_base, vivos, nombres, descripciones = consulta
+    if agregacion is not None and agregacion not in AGREGACIONES:
+        raise ValueError(f"Agregación desconocida: {agregacion}")
+    semillas = set(filas)
+    if agregacion is None:
+        vecinos = _buscar(ann, delta, n_base, vivos, consultas, top_n + 1)
+        indices = dict.fromkeys(int(i) for fila, (similares, _) in zip(filas, vecinos)
+                                for i in [j for j in similares if j != fila][:top_n])
+    elif agregacion == "suma":
+        centroide = densos.normalizar(consultas.sum(axis=0, keepdims=True))
+        similares, _ = _buscar(ann, delta, n_base, vivos, centroide, top_n + len(filas))[0]
+        indices = [int(i) for i in similares if i not in semillas][:top_n]
+    else:
+        profundidad = top_n + len(filas) if agregacion == "max" else max(10 * top_n, CONSTANTE_RRF)
+        puntos = {}
+        for similares, valores in _buscar(ann, delta, n_base, vivos, consultas, profundidad):
+            rango = 0
+            for i, valor in zip(similares.tolist(), valores.tolist()):
+                if i in semillas:
+                    continue
+                rango += 1
+                if agregacion == "max":
+                    puntos[i] = max(puntos.get(i, -np.inf), valor)
+                else:
+                    puntos[i] = puntos.get(i, 0.0) + 1.0 / (CONSTANTE_RRF + rango)
+        indices = _ordenar(puntos, top_n)
+    return [{"nombre_producto": nombres[i], "desc_producto": descripciones[i]}
+            for i in indices]
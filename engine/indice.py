@@ -0,0 +1,372 @@
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from core import config
+from models.data import Producto
+
+
+def _motor():
+    # numpy, scipy, sklearn y NLTK se importan en la primera construcción,
+    # no al arrancar el worker
+    from engine import estado
+    return estado
+
+
+def _snapshot():
+    from engine import snapshot
+    return snapshot
+
+
+def productos_db(db=None):
+    """(id, nombre, descripcion) de todo el catálogo, sin cargar imágenes."""
+    if db is None:
+        from db.database import SessionLocal
+        with SessionLocal() as db:
+            return productos_db(db)
+    return db.query(Producto.id_producto, Producto.nombre_producto, Producto.desc_producto).all()
+
+
+def consumo_db(db=None):
+    """(id, consumo) de los productos con consumo registrado."""
+    if db is None:
+        from db.database import SessionLocal
+        with SessionLocal() as db:
+            return consumo_db(db)
+    return db.query(Producto.id_producto, Producto.consumo_producto).filter(
+        Producto.consumo_producto > 0).all()
+
+
+class RecommenderIndex:
+    """
+    Índice de recomendación de larga vida, propiedad de la aplicación.
+
+    Guarda el TfidfVectorizer ajustado, la matriz TF-IDF dispersa (filas con
+    norma L2, por lo que el coseno es el producto escalar) y el mapa
+    nombre -> fila. Las peticiones solo hacen búsquedas.
+
+    Los cambios de un producto se aplican de forma incremental (cuestan un
+    documento). Cuando la deriva supera los umbrales de core.config se lanza
+    un reajuste completo en segundo plano. Mientras haya un ajuste en curso
+    las operaciones se anotan en un diario y se repiten sobre el índice nuevo
+    antes de publicarlo.
+
+    Cada ajuste completo se guarda como snapshot versionado en disco. Los
+    demás workers lo abren con memmap en lugar de reajustar, y recargan cuando
+    aparece una generación nueva.
+
+    La popularidad (consumo con decaimiento) se siembra desde la base una vez
+    y después solo cambia con los contadores (`sumar_consumo`, `fijar_consumo`),
+    que actualizan en el sitio el vector por fila del estado publicado.
+    """
+
+    def __init__(self, umbrales=None, al_superar_deriva=None, directorio_snapshot=None,
+                 fuente=productos_db, fuente_consumo=consumo_db):
+        self._lock = threading.RLock()
+        self._estado = None
+        self._diario = None
+        self._ajustes_activos = 0
+        self.umbrales = umbrales or {
+            "tombstones": config.RECOMENDADOR_UMBRAL_TOMBSTONES,
+            "terminos_nuevos": config.RECOMENDADOR_UMBRAL_TERMINOS_NUEVOS,
+            "filas_incrementales": config.RECOMENDADOR_UMBRAL_FILAS_INCREMENTALES,
+        }
+        self.al_superar_deriva = al_superar_deriva or self.reajustar_en_segundo_plano
+        # De dónde lee el catálogo un reajuste completo
+        self.fuente = fuente
+        self.fuente_consumo = fuente_consumo
+        self._popularidad = None
+        self.version = 0
+        # Operaciones incrementales aplicadas; con `version` identifica el contenido
+        self.cambios = 0
+        self.duracion_construccion = None
+        self.directorio_snapshot = (config.RECOMENDADOR_SNAPSHOT_DIR
+                                    if directorio_snapshot is None else directorio_snapshot)
+        self.generacion_snapshot = None
+        self._mtime_snapshot = None
+        self._proxima_revision = 0.0
+        # Operaciones recientes para repetirlas sobre snapshots de otros workers
+        self._recientes = deque(maxlen=10000)
+        # Otros índices que reciben las mismas operaciones (`aplicar`) y cada
+        # estado publicado (`publicado`): el denso y la tabla de vecinos
+        self.oyentes = []
+
+    @property
+    def listo(self):
+        return self._estado is not None
+
+    @property
+    def popularidad(self):
+        # Popularidad usa numpy: se crea en el primer uso, no al importar main
+        if self._popularidad is None:
+            from engine.popularidad import Popularidad
+            with self._lock:
+                if self._popularidad is None:
+                    self._popularidad = Popularidad()
+        return self._popularidad
+
+    @property
+    def version_catalogo(self):
+        """Cambia con cada reajuste, snapshot recargado u operación incremental."""
+        return (self.version, self.cambios)
+
+    def _iniciar_ajuste(self):
+        with self._lock:
+            if self._diario is None:
+                self._diario = []
+            self._ajustes_activos += 1
+            return len(self._diario)
+
+    def _terminar_ajuste(self, estado, desde, inicio):
+        with self._lock:
+            if estado is not None:
+                for operacion, argumentos in self._diario[desde:]:
+                    estado.aplicar(operacion, argumentos)
+                self._publicar(estado)
+                self.duracion_construccion = time.perf_counter() - inicio
+            self._ajustes_activos -= 1
+            if self._ajustes_activos == 0:
+                self._diario = None
+
+    def _publicar(self, estado):
+        # Con el lock tomado
+        self._sincronizar_popularidad(estado)
+        self._estado = estado
+        self.version += 1
+        for oyente in self.oyentes:
+            oyente.publicado(estado)
+
+    def _ajustar(self, obtener_productos):
+        inicio = time.perf_counter()
+        leido = time.time()
+        desde = self._iniciar_ajuste()
+        estado = None
+        try:
+            productos = list(obtener_productos())
+            self._sembrar_popularidad()
+            if self.directorio_snapshot:
+                estado = self._ajustar_con_snapshot(productos, leido)
+            else:
+                estado = _motor().ajustar(productos)
+        finally:
+            self._terminar_ajuste(estado, desde, inicio)
+        return estado
+
+    def _ajustar_con_snapshot(self, productos, leido):
+        snapshot = _snapshot()
+        huella = snapshot.hash_catalogo(productos)
+        meta = snapshot.leer_actual(self.directorio_snapshot)
+        if meta is not None and meta["hash_catalogo"] == huella:
+            # Otro worker ya ajustó este mismo catálogo
+            estado = snapshot.cargar(self.directorio_snapshot, meta)
+            generacion = meta["generacion"]
+        else:
+            estado = _motor().ajustar(productos)
+            if estado.vectorizer is None:
+                return estado
+            # Se guarda antes de publicar: aún nadie más modifica este estado
+            generacion = snapshot.guardar(estado, self.directorio_snapshot, huella, leido)
+        self.generacion_snapshot = generacion
+        return estado
+
+    def _sembrar_popularidad(self):
+        if self.popularidad.cargado or self.fuente_consumo is None:
+            return
+        try:
+            self.popularidad.cargar(self.fuente_consumo())
+        except SQLAlchemyError:
+            # Sin base disponible el ranking sigue siendo solo por contenido
+            pass
+
+    def _sincronizar_popularidad(self, estado):
+        # Con el lock tomado. Reconstruye el vector por fila si el estado es
+        # nuevo o si Popularidad movió su origen
+        if estado.epoca_popularidad != self.popularidad.epoca:
+            estado.popularidad = self.popularidad.vector(estado.ids)
+            estado.epoca_popularidad = self.popularidad.epoca
+
+    def revision_pendiente(self):
+        """Si a `revisar_snapshot` le toca mirar el disco."""
+        return bool(self.directorio_snapshot) and time.monotonic() >= self._proxima_revision
+
+    def revisar_snapshot(self):
+        """
+        Recarga el índice si otro worker publicó una generación más nueva.
+        Como mucho mira el disco una vez cada RECOMENDADOR_SNAPSHOT_INTERVALO.
+        """
+        ahora = time.monotonic()
+        if not self.directorio_snapshot or ahora < self._proxima_revision:
+            return False
+        self._proxima_revision = ahora + config.RECOMENDADOR_SNAPSHOT_INTERVALO
+        try:
+            mtime = os.stat(os.path.join(self.directorio_snapshot, "ACTUAL")).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime_snapshot:
+            return False
+        self._mtime_snapshot = mtime
+        snapshot = _snapshot()
+        meta = snapshot.leer_actual(self.directorio_snapshot)
+        if meta is None or meta["generacion"] <= (self.generacion_snapshot or ""):
+            return False
+        inicio = time.perf_counter()
+        estado = snapshot.cargar(self.directorio_snapshot, meta)
+        with self._lock:
+            # Lo aplicado aquí después de que el otro worker leyera el catálogo
+            for instante, operacion, argumentos in self._recientes:
+                if instante >= meta["creado"]:
+                    estado.aplicar(operacion, argumentos)
+            self.generacion_snapshot = meta["generacion"]
+            self._publicar(estado)
+            self.duracion_construccion = time.perf_counter() - inicio
+        return True
+
+    def construir(self, productos):
+        """
+        Ajusta el índice a partir de un iterable de (id, nombre, descripcion).
+        """
+        return self._ajustar(lambda: productos)
+
+    def construir_desde_db(self, db):
+        return self._ajustar(lambda: productos_db(db))
+
+    def reajustar(self):
+        """
+        Reajuste completo leyendo de nuevo el catálogo desde la fuente.
+        """
+        with self._lock:
+            if self._diario is not None:
+                # Ya hay un ajuste en curso y repetirá lo que llegue mientras tanto
+                return None
+        return self._ajustar(self.fuente)
+
+    def reajustar_en_segundo_plano(self):
+        threading.Thread(target=self.reajustar, name="reajuste-indice", daemon=True).start()
+
+    def _modificar(self, operacion, argumentos):
+        with self._lock:
+            self._recientes.append((time.time(), operacion, argumentos))
+            self.cambios += 1
+            # Dentro del lock: los oyentes ven las operaciones en el mismo orden
+            for oyente in self.oyentes:
+                oyente.aplicar(operacion, argumentos)
+            if self._diario is not None:
+                self._diario.append((operacion, argumentos))
+            estado = self._estado
+            if estado is None:
+                # El próximo ajuste leerá el catálogo completo
+                return
+            estado.aplicar(operacion, argumentos)
+            if operacion == "agregar":
+                self._actualizar_popularidad(estado, argumentos[0])
+            if self._diario is not None:
+                return
+            deriva = estado.deriva()
+        if any(deriva[k] > self.umbrales[k] for k in self.umbrales):
+            self.al_superar_deriva()
+
+    def agregar_producto(self, id_producto, nombre, descripcion):
+        self._modificar("agregar", (str(id_producto), nombre, descripcion))
+
+    def actualizar_producto(self, id_producto, nombre, descripcion):
+        self._modificar("agregar", (str(id_producto), nombre, descripcion))
+
+    def agregar_productos(self, productos):
+        """(id, nombre, descripcion) de varios productos, uno a uno como agregar_producto."""
+        for id_producto, nombre, descripcion in productos:
+            self.agregar_producto(id_producto, nombre, descripcion)
+
+    def actualizar_productos(self, productos):
+        """(id, nombre, descripcion) de varios productos, uno a uno como actualizar_producto."""
+        for id_producto, nombre, descripcion in productos:
+            self.actualizar_producto(id_producto, nombre, descripcion)
+
+    def eliminar_producto(self, id_producto):
+        self._modificar("eliminar", (str(id_producto),))
+
+    def eliminar_productos(self, ids_productos):
+        for id_producto in ids_productos:
+            self.eliminar_producto(id_producto)
+
+    def _actualizar_popularidad(self, estado, id_producto):
+        if estado.epoca_popularidad != self.popularidad.epoca:
+            self._sincronizar_popularidad(estado)
+            return
+        i = estado.fila_por_id.get(id_producto)
+        if i is not None:
+            estado.popularidad[i] = self.popularidad.referencia(id_producto)
+
+    def sumar_consumo(self, id_producto, n=1):
+        """Refleja un cambio del contador de consumo en el prior de popularidad."""
+        self.popularidad.sumar(id_producto, n)
+        with self._lock:
+            if self._estado is not None:
+                self._actualizar_popularidad(self._estado, str(id_producto))
+
+    def fijar_consumo(self, ids_productos, consumo):
+        for id_producto in ids_productos:
+            self.popularidad.fijar(id_producto, consumo)
+        with self._lock:
+            if self._estado is not None:
+                for id_producto in ids_productos:
+                    self._actualizar_popularidad(self._estado, str(id_producto))
+
+    def deriva(self):
+        estado = self._estado
+        return estado.deriva() if estado is not None else {}
+
+    def recomendar(self, nombres, top_n=5, agregacion=None, peso_popularidad=None):
+        """
+        Sin `agregacion` devuelve hasta top_n productos similares por cada
+        nombre semilla, sin repetidos y en el orden en que aparecen.
+
+        Con `agregacion` ("suma", "max" o "rrf") puntúa toda la cesta de una
+        vez y devuelve el top_n global, excluyendo las propias semillas.
+
+        `peso_popularidad` en [0, 1] mezcla la similitud con el prior de
+        popularidad; None usa RECOMENDADOR_PESO_POPULARIDAD.
+        """
+        peso = config.RECOMENDADOR_PESO_POPULARIDAD if peso_popularidad is None else peso_popularidad
+        self.revisar_snapshot()
+        with self._lock:
+            estado = self._estado
+            consulta = None
+            if estado is not None:
+                if peso:
+                    self._sincronizar_popularidad(estado)
+                consulta = estado.preparar_consulta(nombres, con_popularidad=bool(peso))
+            escala = self.popularidad.escala()
+        if consulta is None:
+            return []
+        return _motor().recomendar(consulta, top_n, agregacion, peso=peso, escala=escala)
+
+    def similares(self, id_producto, top_n=10):
+        """
+        Vecinos de un producto calculados en vivo, para los que la tabla de
+        vecinos aún no cubre. None si el producto no está en el índice.
+        """
+        self.revisar_snapshot()
+        with self._lock:
+            estado = self._estado
+            consulta = estado.preparar_similares(str(id_producto)) if estado is not None else None
+        if consulta is None:
+            return None
+        return _motor().similares(consulta, top_n)
+
+    def populares(self, top_n=10):
+        """Los productos con más consumo reciente; no necesita semillas."""
+        self.revisar_snapshot()
+        with self._lock:
+            estado = self._estado
+            if estado is None:
+                return []
+            self._sincronizar_popularidad(estado)
+            consulta = estado.preparar_populares()
+            escala = self.popularidad.escala()
+        return _motor().populares(consulta, top_n, escala=escala)
+
+
+indice_recomendador = RecommenderIndex()
@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+from collections import deque
+
+from core import config
+from engine.indice import productos_db
+
+
+def _densos():
+    # numpy, sklearn y el modelo se cargan en la primera construcción
+    from engine import densos
+    return densos
+
+
+def _motor():
+    # EstadoDenso y la búsqueda usan numpy: no se importan al arrancar el worker
+    from engine import estado_denso
+    return estado_denso
+
+
+class IndiceDenso:
+    """
+    Recomendaciones por similitud de embeddings densos (engine.densos), en
+    paralelo al índice TF-IDF.
+
+    Recibe las mismas operaciones que RecommenderIndex (se registra en su
+    lista de `oyentes`): las encola y un hilo propio las codifica y aplica al
+    delta, fuera del lock del índice TF-IDF. Si la deriva supera los
+    umbrales se reconstruye en un hilo; lo que llega mientras tanto se anota
+    en un diario y se repite antes de publicar el estado nuevo.
+
+    Cada construcción se guarda en DENSO_DIR (vectores, codificador e índice
+    HNSW). Al arrancar con el mismo catálogo se abre con memmap sin
+    codificar nada, y con un codificador que no depende del catálogo solo se
+    codifican las descripciones nuevas o cambiadas.
+    """
+
+    def __init__(self, fuente=productos_db, directorio=None, umbrales=None):
+        self._lock = threading.RLock()
+        self._estado = None
+        self._diario = None
+        # Operaciones recibidas como oyente, pendientes de codificar
+        self._cola = deque()
+        self._lock_cola = threading.Lock()
+        self._drenando = False
+        self.fuente = fuente
+        self.directorio = config.DENSO_DIR if directorio is None else directorio
+        self.umbrales = umbrales or {
+            "tombstones": config.RECOMENDADOR_UMBRAL_TOMBSTONES,
+            "filas_incrementales": config.RECOMENDADOR_UMBRAL_FILAS_INCREMENTALES,
+        }
+        self.version = 0
+        self.cambios = 0
+        self.duracion_construccion = None
+        self.codificados = 0
+        self.ultimo_error = None
+
+    @property
+    def listo(self):
+        return self._estado is not None
+
+    @property
+    def version_catalogo(self):
+        return (self.version, self.cambios)
+
+    def _ajustar(self, productos):
+        import numpy as np
+        from engine.snapshot import hash_catalogo
+
+        densos = _densos()
+        motor = _motor()
+
+        huella = hash_catalogo(productos)
+        meta = densos.leer_generacion(self.directorio)
+        codificador = densos.crear_codificador()
+        compatible = meta is not None and (meta["codificador"] == codificador.huella
+                                           or meta["codificador"].startswith(codificador.huella + "-"))
+        ids = [p[0] for p in productos]
+        nombres = [p[1] for p in productos]
+        descripciones = [p[2] for p in productos]
+        if compatible and meta["hash_catalogo"] == huella:
+            # Mismo catálogo que la última generación: nada que codificar
+            codificador, vectores, ann = densos.cargar_generacion(self.directorio, meta)
+            return motor.EstadoDenso(codificador, vectores, ann, list(meta["ids"]), list(meta["nombres"]),
+                               list(meta["descripciones"]))
+        if not productos:
+            return motor.EstadoDenso(None, None, None, [], [], [])
+
+        if compatible and not codificador.necesita_ajuste:
+            # Se reutilizan los vectores de las descripciones que no cambiaron
+            anteriores = densos.Vectores.cargar(os.path.join(self.directorio, meta["generacion"]))
+            fila_por_hash = {h: i for i, h in enumerate(meta["hash_textos"])}
+            previas = [fila_por_hash.get(densos.hash_texto(d)) for d in descripciones]
+            nuevas = [i for i, f in enumerate(previas) if f is None]
+            matriz = np.empty((len(productos), anteriores.dimension), dtype=np.float32)
+            conocidas = [i for i, f in enumerate(previas) if f is not None]
+            if conocidas:
+                matriz[conocidas] = anteriores.filas([previas[i] for i in conocidas])
+            if nuevas:
+                matriz[nuevas] = codificador.codificar([descripciones[i] for i in nuevas])
+            self.codificados += len(nuevas)
+        else:
+            try:
+                matriz = codificador.ajustar(descripciones)
+            except ValueError:
+                # Catálogo sin vocabulario útil
+                return motor.EstadoDenso(None, None, None, [], [], [])
+            self.codificados += len(productos)
+
+        vectores = densos.Vectores.desde_float32(matriz)
+        ann = densos.crear_indice_ann(vectores)
+        if self.directorio:
+            densos.guardar_generacion(self.directorio, codificador, vectores, ann, productos, huella)
+        return motor.EstadoDenso(codificador, vectores, ann, ids, nombres, descripciones)
+
+    def construir(self, productos=None):
+        """
+        Construye y publica el estado a partir de (id, nombre, descripcion);
+        sin argumentos lee el catálogo de la fuente.
+        """
+        inicio = time.perf_counter()
+        with self._lock:
+            if self._diario is not None:
+                # Ya hay una construcción en curso y repetirá lo que llegue
+                return None
+            self._diario = []
+        estado = None
+        try:
+            productos = [(str(p[0]), p[1], p[2]) for p in (self.fuente() if productos is None else productos)]
+            estado = self._ajustar(productos)
+            self.ultimo_error = None
+        except Exception as error:
+            self.ultimo_error = repr(error)
+            raise
+        finally:
+            with self._lock:
+                if estado is not None:
+                    for operacion, argumentos in self._diario:
+                        self._aplicar_en(estado, operacion, argumentos)
+                    self._estado = estado
+                    self.version += 1
+                    self.duracion_construccion = time.perf_counter() - inicio
+                self._diario = None
+        return estado
+
+    def reajustar_en_segundo_plano(self):
+        threading.Thread(target=self.construir, name="reajuste-indice-denso", daemon=True).start()
+
+    def _aplicar_en(self, estado, operacion, argumentos):
+        if estado.codificador is None:
+            # Se construyó sobre un catálogo vacío: hay que ajustar el codificador
+            return False
+        estado.aplicar(operacion, argumentos)
+        return True
+
+    def aplicar(self, operacion, argumentos):
+        """
+        Punto de entrada como oyente de RecommenderIndex. Se llama con el lock
+        del índice TF-IDF tomado, así que solo encola: codificar (y cargar el
+        modelo) bloquearía todas sus lecturas y escrituras.
+        """
+        with self._lock_cola:
+            self._cola.append((operacion, argumentos))
+            if self._drenando:
+                return
+            self._drenando = True
+        threading.Thread(target=self._drenar, name="operaciones-indice-denso", daemon=True).start()
+
+    def _drenar(self):
+        # Un solo hilo a la vez: las operaciones se aplican en orden de llegada
+        reajustar = False
+        while True:
+            with self._lock_cola:
+                if not self._cola:
+                    self._drenando = False
+                    break
+                operacion, argumentos = self._cola.popleft()
+            try:
+                reajustar |= self._aplicar(operacion, argumentos)
+            except Exception as error:
+                self.ultimo_error = repr(error)
+                reajustar = True
+        if reajustar:
+            self.reajustar_en_segundo_plano()
+
+    def _aplicar(self, operacion, argumentos):
+        """Aplica una operación con el lock propio; True si hace falta reajustar."""
+        with self._lock:
+            self.cambios += 1
+            if self._diario is not None:
+                self._diario.append((operacion, argumentos))
+            estado = self._estado
+            if estado is None:
+                # La próxima construcción leerá el catálogo completo
+                return False
+            aplicado = self._aplicar_en(estado, operacion, argumentos)
+            if self._diario is not None:
+                return False
+            deriva = estado.deriva()
+        return not aplicado or any(deriva[k] > self.umbrales[k] for k in self.umbrales)
+
+    def publicado(self, estado):
+        """Oyente de RecommenderIndex; el denso se reconstruye según su propia deriva."""
+
+    def recomendar(self, nombres, top_n=5, agregacion=None):
+        """Mismo contrato que RecommenderIndex.recomendar, sin prior de popularidad."""
+        with self._lock:
+            estado = self._estado
+            consulta = estado.preparar_consulta(nombres) if estado is not None and estado.codificador else None
+        if consulta is None:
+            return []
+        return _motor().recomendar(consulta, top_n, agregacion)
+
+    def estado(self):
+        estado = self._estado
+        if estado is None:
+            return {"listo": False, "construyendo": self._diario is not None, "ultimo_error": self.ultimo_error}
+        return {
+            "listo": True,
+            "construyendo": self._diario is not None,
+            "pendientes": len(self._cola),
+            "version": self.version,
+            "codificador": estado.codificador.huella if estado.codificador else None,
+            "ann": estado.ann.tipo if estado.ann is not None else None,
+            "filas": int(estado.vivos.sum()),
+            "filas_delta": len(estado.delta),
+            "bytes_vectores": estado.base.nbytes if estado.base is not None else 0,
+            "codificados": self.codificados,
+            "duracion_construccion": self.duracion_construccion,
+            "deriva": estado.deriva(),
+            "ultimo_error": self.ultimo_error,
+        }
+
+
+indice_denso = IndiceDenso()
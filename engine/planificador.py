@@ -0,0 +1,133 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import config
+from engine.indice import indice_recomendador
+
+
+class PlanificadorIndice:
+    """
+    Tarea asyncio, propiedad del ciclo de vida de la aplicación, que
+    reconstruye el índice de recomendación en segundo plano.
+
+    Los avisos de cambio del catálogo se agrupan (debounce): la reconstrucción
+    empieza cuando pasan `espera` segundos sin avisos nuevos, o como mucho
+    `espera_maxima` segundos después del primero. El ajuste corre
+    en un executor, fuera del bucle de eventos, y el índice nuevo sustituye al
+    anterior en una sola asignación, así que los lectores nunca ven uno a
+    medio construir.
+    """
+
+    def __init__(self, indice, espera=None, espera_maxima=None):
+        self.indice = indice
+        self.espera = config.RECOMENDADOR_DEBOUNCE if espera is None else espera
+        self.espera_maxima = config.RECOMENDADOR_DEBOUNCE_MAXIMO if espera_maxima is None else espera_maxima
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reconstruccion-indice")
+        self._loop = None
+        self._aviso = None
+        self._listo = None
+        self._tarea = None
+        self.en_curso = False
+        self.reconstrucciones = 0
+        self.ultima_reconstruccion = None
+        self.ultimo_error = None
+        self._fallo = None
+
+    async def iniciar(self, precargar=True):
+        self._loop = asyncio.get_running_loop()
+        self._aviso = asyncio.Event()
+        self._listo = asyncio.Event()
+        if self.indice.listo:
+            self._listo.set()
+        self._tarea = asyncio.create_task(self._bucle())
+        if precargar:
+            self._aviso.set()
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        self._loop = None
+
+    def notificar(self):
+        """
+        Avisa de un cambio en el catálogo. Se puede llamar desde cualquier hilo.
+        """
+        if self._loop is None:
+            # Sin planificador en marcha (scripts, pruebas): reajuste en un hilo
+            self.indice.reajustar_en_segundo_plano()
+            return
+        self._loop.call_soon_threadsafe(self._aviso.set)
+
+    async def esperar_indice(self):
+        """
+        Garantiza que hay un índice publicado sin bloquear el bucle de eventos.
+        Si la última construcción falló hace menos de RECOMENDADOR_REINTENTO
+        segundos vuelve sin índice en lugar de repetirla en cada petición.
+        """
+        if self.indice.listo:
+            return
+        if self._fallo is not None and time.monotonic() - self._fallo < config.RECOMENDADOR_REINTENTO:
+            return
+        if self._loop is None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.indice.reajustar)
+            return
+        self._listo.clear()
+        if not self.en_curso:
+            # Con un ajuste en curso basta esperarlo; avisar pediría otro
+            self._aviso.set()
+        await self._listo.wait()
+
+    async def _bucle(self):
+        while True:
+            await self._aviso.wait()
+            limite = time.monotonic() + self.espera_maxima
+            # Debounce: seguir esperando mientras lleguen avisos, hasta el
+            # límite. La primera construcción no espera, hay peticiones
+            # aguardando el índice
+            while self.indice.listo:
+                self._aviso.clear()
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._aviso.wait(), timeout=min(self.espera, restante))
+                except asyncio.TimeoutError:
+                    break
+            self.en_curso = True
+            # Se limpia antes de empezar: un aviso durante el ajuste trae
+            # cambios que este ajuste quizá no vea y pide otra vuelta
+            self._aviso.clear()
+            try:
+                await self._loop.run_in_executor(self._executor, self.indice.reajustar)
+                self.reconstrucciones += 1
+                self.ultima_reconstruccion = time.time()
+                self.ultimo_error = None
+                self._fallo = None
+            except Exception as e:
+                self.ultimo_error = str(e)
+                self._fallo = time.monotonic()
+            finally:
+                self.en_curso = False
+                self._listo.set()
+
+    def estado(self):
+        indice = self.indice
+        return {
+            "version": indice.version,
+            "duracion_construccion": indice.duracion_construccion,
+            "generacion_snapshot": indice.generacion_snapshot,
+            "deriva": indice.deriva(),
+            "en_curso": self.en_curso,
+            "reconstrucciones": self.reconstrucciones,
+            "ultima_reconstruccion": self.ultima_reconstruccion,
+            "ultimo_error": self.ultimo_error,
+        }
+
+
+planificador_indice = PlanificadorIndice(indice_recomendador)
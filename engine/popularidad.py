@@ -0,0 +1,104 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+from core import config
+
+
+class Popularidad:
+    """
+    Consumo de cada producto con decaimiento exponencial en el tiempo.
+
+    Los valores se guardan referidos a un instante común `origen`: sumar n en
+    el instante t añade n·e^((t - origen)/tau). El decaimiento hasta "ahora"
+    es entonces el mismo factor para todos los productos (`escala`), así que
+    un incremento toca un solo valor y no hay que recorrer el catálogo.
+    Cuando el factor crece demasiado se mueve el origen, se reescala todo y
+    se incrementa `epoca` para que los vectores derivados se reconstruyan.
+    """
+
+    # Exponente máximo antes de mover el origen (e^50 ≈ 5e21, lejos del desbordamiento)
+    MAX_EXPONENTE = 50.0
+
+    def __init__(self, vida_media=None):
+        horas = config.RECOMENDADOR_POPULARIDAD_VIDA_MEDIA if vida_media is None else vida_media
+        self.tau = horas * 3600 / math.log(2)
+        self._lock = threading.Lock()
+        self._valores = {}
+        self.origen = time.time()
+        self.epoca = 0
+        # Cuántas veces ha cambiado algún valor (versión para cachés de resultados)
+        self.cambios = 0
+        self.cargado = False
+
+    def _exponente(self, instante):
+        return (instante - self.origen) / self.tau
+
+    def _preparar(self, instante):
+        if self._exponente(instante) > self.MAX_EXPONENTE:
+            factor = math.exp(-self._exponente(instante))
+            self._valores = {k: v * factor for k, v in self._valores.items()}
+            self.origen = instante
+            self.epoca += 1
+        return math.exp(self._exponente(instante))
+
+    def cargar(self, pares, instante=None):
+        """
+        Siembra (id, consumo) como consumido en `instante`; no pisa valores
+        que ya se estén siguiendo.
+        """
+        instante = time.time() if instante is None else instante
+        with self._lock:
+            factor = self._preparar(instante)
+            for id_producto, consumo in pares:
+                if consumo:
+                    self._valores.setdefault(str(id_producto), max(consumo, 0) * factor)
+            self.cargado = True
+            self.cambios += 1
+
+    def sumar(self, id_producto, n, instante=None):
+        instante = time.time() if instante is None else instante
+        with self._lock:
+            factor = self._preparar(instante)
+            id_producto = str(id_producto)
+            valor = max(self._valores.get(id_producto, 0.0) + n * factor, 0.0)
+            self._valores[id_producto] = valor
+            self.cambios += 1
+            return valor
+
+    def fijar(self, id_producto, consumo, instante=None):
+        instante = time.time() if instante is None else instante
+        with self._lock:
+            factor = self._preparar(instante)
+            valor = max(consumo, 0) * factor
+            self._valores[str(id_producto)] = valor
+            self.cambios += 1
+            return valor
+
+    def referencia(self, id_producto):
+        return self._valores.get(str(id_producto), 0.0)
+
+    def vector(self, ids):
+        with self._lock:
+            valores = self._valores
+            return np.fromiter((valores.get(i, 0.0) for i in ids), dtype=np.float64, count=len(ids))
+
+    def escala(self, instante=None):
+        """Factor que lleva los valores de referencia al instante dado."""
+        instante = time.time() if instante is None else instante
+        return math.exp(-self._exponente(instante))
+
+
+def prior(referencias, escala, vivos=None):
+    """
+    Prior de popularidad en [0, 1]: log(1 + consumo con decaimiento),
+    normalizado por el máximo entre las filas vivas.
+    """
+    valores = np.log1p(referencias * escala)
+    candidatos = valores if vivos is None else valores[vivos]
+    maximo = candidatos.max() if candidatos.size else 0.0
+    if maximo <= 0:
+        return np.zeros_like(valores)
+    return valores / maximo
@@ -1,53 +1,55 @@
-import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import SnowballStemmer
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import pandas as pd
-from nltk.tokenize import word_tokenize
-
-nltk.download('punkt')
-nltk.download('stopwords')
-
+from engine.texto import normalizador_por_defecto, normalizar_en_paralelo
+from engine.popularidad import prior
+from engine.similitud import MatrizSimilitud, seleccionar_top_k, top_k_agregado, top_k_similares
 
 # model = SentenceTransformer('hiiamsid/sentence_similarity_spanish_es')
 def limpiar_texto(texto):
-    texto = texto.lower()
-    texto = re.sub(r'[^a-zA-Záéíóúñ\s]', '', texto)
-    texto = re.sub(r'\W+', ' ', texto)
-    tokens = word_tokenize(texto)
-    stop_words = set(stopwords.words('spanish'))
-    words = [word for word in tokens if word not in stop_words]
-    stemmer = SnowballStemmer('spanish')
-    words_stem = [stemmer.stem(word) for word in words]
-    return ' '.join(words_stem)
+    return normalizador_por_defecto().normalize(texto)
 
-def crear_matrix_tfidf(df):
-    df['descripcion_limpia'] = df['desc_producto'].apply(limpiar_texto)
+def crear_matrix_tfidf(df, workers=None):
+    df['descripcion_limpia'] = list(normalizar_en_paralelo(df['desc_producto'], workers=workers))
     vectorizer = TfidfVectorizer()
     tfidf_matrix = vectorizer.fit_transform(df['descripcion_limpia'])
     return tfidf_matrix, vectorizer
 
 def calcular_similitud(tfidf_matrix):
-    return cosine_similarity(tfidf_matrix, tfidf_matrix)
+    # Las filas de TfidfVectorizer tienen norma L2: el coseno es el producto escalar.
+    # No se materializa la matriz N×N, las filas se calculan bajo demanda.
+    return MatrizSimilitud(tfidf_matrix)
 
 def obtener_indices_similares(indice_producto, similitud_matrix, top_n=5):
-    similitudes = similitud_matrix[indice_producto]
-    indices_similares = similitudes.argsort()[::-1]
-    indices_similares = indices_similares[indices_similares != indice_producto] 
-    return indices_similares[:top_n]
+    indices = np.atleast_1d(indice_producto)
+    if indices.size == 0:
+        return np.empty(0, dtype=np.int64)
+    indice_producto = int(indices[0])
+    if isinstance(similitud_matrix, MatrizSimilitud):
+        return similitud_matrix.top_k(indice_producto, top_n)
+    similitudes = np.array(similitud_matrix[indice_producto], dtype=np.float64)
+    similitudes[indice_producto] = -np.inf
+    return seleccionar_top_k(similitudes, min(top_n, similitudes.shape[0] - 1))
 
-def recomendar_productos(df, productos_nombres, top_n=5):
+def recomendar_productos(df, productos_nombres, top_n=5, agregacion=None, peso_popularidad=0.0):
+    # Con peso_popularidad > 0 mezcla el coseno con log(1 + consumo_producto)
+    # normalizado; aquí sin decaimiento, el DataFrame no trae historial
     tfidf_matrix, vectorizer = crear_matrix_tfidf(df)
-    similitud_matrix = calcular_similitud(tfidf_matrix)
-    indices_similares = []
-    for producto in productos_nombres:
-        indice_producto = df.index[df['nombre_producto'] == producto].tolist()
-        indices_recomendados = obtener_indices_similares(indice_producto, similitud_matrix, top_n)
-        for item in indices_recomendados:
-            if item not in indices_similares:
-                indices_similares.append(int(item))
     df.drop("descripcion_limpia", axis=1, inplace=True)
+    fila_por_nombre = {nombre: i for i, nombre in enumerate(df['nombre_producto'])}
+    filas = list(dict.fromkeys(
+        fila_por_nombre[p] for p in productos_nombres if p in fila_por_nombre))
+    if not filas:
+        return df.iloc[[]]
+    consultas = tfidf_matrix[filas]
+    prior_filas = None
+    if peso_popularidad and 'consumo_producto' in df:
+        prior_filas = prior(df['consumo_producto'].fillna(0).clip(lower=0).to_numpy(dtype=np.float64), 1.0)
+    if agregacion is None:
+        similares, _ = top_k_similares(tfidf_matrix, consultas, top_n, excluir=[[f] for f in filas],
+                                       prior=prior_filas, peso=peso_popularidad)
+        indices_similares = list(dict.fromkeys(int(i) for fila in similares for i in fila))
+    else:
+        indices_similares, _ = top_k_agregado(tfidf_matrix, consultas, top_n, agregacion, excluir=filas,
+                                              prior=prior_filas, peso=peso_popularidad)
     return df.iloc[indices_similares]
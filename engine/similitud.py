@@ -0,0 +1,188 @@
+import numpy as np
+import scipy.sparse as sp
+
+# Filas del catálogo que se puntúan de una vez; acota la memoria de trabajo
+TAM_BLOQUE = 4096
+
+
+def seleccionar_top_k(puntos, k):
+    """
+    Índices de los k mayores valores de un vector, ordenados de mayor a menor.
+    Usa argpartition (O(n)) y solo ordena los k elegidos.
+    """
+    k = min(k, puntos.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidatos = np.argpartition(-puntos, k - 1)[:k]
+    return candidatos[np.argsort(-puntos[candidatos], kind="stable")]
+
+
+def _bloques(matrices, tam_bloque):
+    desplazamiento = 0
+    for matriz in matrices:
+        if matriz is None:
+            continue
+        for inicio in range(0, matriz.shape[0], tam_bloque):
+            yield desplazamiento + inicio, matriz[inicio:inicio + tam_bloque]
+        desplazamiento += matriz.shape[0]
+
+
+def _mezclar(puntos, prior, peso, inicio, fin):
+    # (1 - peso)·similitud + peso·prior, sobre las columnas [inicio, fin)
+    if prior is None or not peso:
+        return puntos
+    return (1.0 - peso) * puntos + peso * prior[inicio:fin]
+
+
+def top_k_similares(matrices, consultas, k, excluir=None, vivos=None, tam_bloque=TAM_BLOQUE,
+                    prior=None, peso=0.0):
+    """
+    Los k vecinos más similares (coseno sobre filas con norma L2) de cada fila
+    de `consultas` sin construir la matriz N×N.
+
+    `matrices` es una matriz CSR o una lista de ellas apiladas lógicamente.
+    El catálogo se recorre por bloques de filas: cada bloque se multiplica por
+    las consultas y solo sobreviven sus k mejores candidatos, así que la
+    memoria es O(nnz + tam_bloque·q + q·k).
+
+    `excluir` es una lista (una por consulta) de índices a descartar, y `vivos`
+    una máscara booleana opcional de filas válidas. Con `prior` (un valor en
+    [0, 1] por fila) la puntuación es (1 - peso)·coseno + peso·prior.
+    Devuelve (indices, puntos), dos listas con un array por consulta.
+    """
+    if sp.issparse(matrices):
+        matrices = [matrices]
+    if k <= 0:
+        return [np.empty(0, dtype=np.int64)] * consultas.shape[0], \
+            [np.empty(0)] * consultas.shape[0]
+    consultas_t = sp.csr_matrix(consultas).T.tocsc()
+    n_consultas = consultas_t.shape[1]
+    mejores_idx = np.empty((n_consultas, 0), dtype=np.int64)
+    mejores_val = np.empty((n_consultas, 0), dtype=np.float64)
+
+    for inicio, bloque in _bloques(matrices, tam_bloque):
+        puntos = (bloque @ consultas_t).toarray().T
+        fin = inicio + puntos.shape[1]
+        puntos = _mezclar(puntos, prior, peso, inicio, fin)
+        if vivos is not None:
+            puntos[:, ~vivos[inicio:fin]] = -np.inf
+        if excluir is not None:
+            for q, descartes in enumerate(excluir):
+                for i in descartes:
+                    if inicio <= i < fin:
+                        puntos[q, i - inicio] = -np.inf
+        kb = min(k, puntos.shape[1])
+        locales = np.argpartition(-puntos, kb - 1, axis=1)[:, :kb]
+        mejores_idx = np.hstack([mejores_idx, locales + inicio])
+        mejores_val = np.hstack([mejores_val, np.take_along_axis(puntos, locales, axis=1)])
+        if mejores_idx.shape[1] > k:
+            corte = np.argpartition(-mejores_val, k - 1, axis=1)[:, :k]
+            mejores_idx = np.take_along_axis(mejores_idx, corte, axis=1)
+            mejores_val = np.take_along_axis(mejores_val, corte, axis=1)
+
+    indices, valores = [], []
+    for q in range(n_consultas):
+        orden = np.lexsort((mejores_idx[q], -mejores_val[q]))
+        validos = orden[np.isfinite(mejores_val[q][orden])]
+        indices.append(mejores_idx[q][validos])
+        valores.append(mejores_val[q][validos])
+    return indices, valores
+
+
+AGREGACIONES = ("suma", "max", "rrf")
+
+# Constante habitual de reciprocal-rank fusion: 1 / (CONSTANTE_RRF + rango)
+CONSTANTE_RRF = 60
+
+
+def top_k_agregado(matrices, consultas, k, agregacion="suma", excluir=(), vivos=None,
+                   tam_bloque=TAM_BLOQUE, profundidad_rrf=None, prior=None, peso=0.0):
+    """
+    Top-k global para varias consultas a la vez (una cesta de productos).
+
+    Con "suma" y "max" las puntuaciones de todas las semillas se calculan en
+    una sola multiplicación por bloque y se agregan por fila. Con "rrf" cada
+    semilla aporta 1 / (CONSTANTE_RRF + rango) por sus `profundidad_rrf`
+    mejores vecinos. Las filas de `excluir` (p. ej. las propias semillas)
+    nunca se devuelven. Con `prior` la puntuación agregada (la suma como media
+    de las semillas, RRF normalizado a su máximo) se mezcla como en
+    `top_k_similares`. Devuelve (indices, puntos) ordenados de mayor a menor.
+    """
+    if agregacion not in AGREGACIONES:
+        raise ValueError(f"Agregación desconocida: {agregacion}")
+    if sp.issparse(matrices):
+        matrices = [matrices]
+    excluir = np.fromiter(excluir, dtype=np.int64)
+    if k <= 0 or consultas.shape[0] == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    if agregacion == "rrf":
+        profundidad = profundidad_rrf or max(10 * k, CONSTANTE_RRF)
+        vecinos, _ = top_k_similares(matrices, consultas, profundidad,
+                                     excluir=[excluir] * consultas.shape[0],
+                                     vivos=vivos, tam_bloque=tam_bloque)
+        fusion = {}
+        for indices in vecinos:
+            for rango, i in enumerate(indices.tolist(), start=1):
+                fusion[i] = fusion.get(i, 0.0) + 1.0 / (CONSTANTE_RRF + rango)
+        if not fusion:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        indices = np.fromiter(fusion.keys(), dtype=np.int64, count=len(fusion))
+        puntos = np.fromiter(fusion.values(), dtype=np.float64, count=len(fusion))
+        if prior is not None and peso:
+            puntos = (1.0 - peso) * puntos / puntos.max() + peso * prior[indices]
+        orden = np.lexsort((indices, -puntos))[:k]
+        return indices[orden], puntos[orden]
+
+    consultas_t = sp.csr_matrix(consultas).T.tocsc()
+    mejores_idx = np.empty(0, dtype=np.int64)
+    mejores_val = np.empty(0, dtype=np.float64)
+    for inicio, bloque in _bloques(matrices, tam_bloque):
+        parcial = (bloque @ consultas_t).toarray()
+        puntos = parcial.sum(axis=1) if agregacion == "suma" else parcial.max(axis=1)
+        fin = inicio + puntos.shape[0]
+        if prior is not None and peso:
+            if agregacion == "suma":
+                puntos /= parcial.shape[1]
+            puntos = _mezclar(puntos, prior, peso, inicio, fin)
+        if vivos is not None:
+            puntos[~vivos[inicio:fin]] = -np.inf
+        locales = excluir[(excluir >= inicio) & (excluir < fin)]
+        puntos[locales - inicio] = -np.inf
+        elegidos = np.argpartition(-puntos, min(k, puntos.shape[0]) - 1)[:k]
+        mejores_idx = np.concatenate([mejores_idx, elegidos + inicio])
+        mejores_val = np.concatenate([mejores_val, puntos[elegidos]])
+        if mejores_idx.shape[0] > k:
+            corte = np.argpartition(-mejores_val, k - 1)[:k]
+            mejores_idx, mejores_val = mejores_idx[corte], mejores_val[corte]
+
+    orden = np.lexsort((mejores_idx, -mejores_val))
+    orden = orden[np.isfinite(mejores_val[orden])]
+    return mejores_idx[orden], mejores_val[orden]
+
+
+class MatrizSimilitud:
+    """
+    Sustituto perezoso de la matriz densa de similitud N×N: guarda solo la
+    matriz TF-IDF dispersa y calcula las filas bajo demanda.
+    """
+
+    def __init__(self, tfidf_matrix):
+        self.tfidf_matrix = sp.csr_matrix(tfidf_matrix)
+
+    @property
+    def shape(self):
+        n = self.tfidf_matrix.shape[0]
+        return (n, n)
+
+    def __len__(self):
+        return self.tfidf_matrix.shape[0]
+
+    def __getitem__(self, indice):
+        filas = (self.tfidf_matrix @ self.tfidf_matrix[indice].T).toarray().T
+        return filas[0] if np.ndim(indice) == 0 else filas
+
+    def top_k(self, indice, k):
+        indices, _ = top_k_similares(self.tfidf_matrix, self.tfidf_matrix[[indice]], k,
+                                     excluir=[[indice]])
+        return indices[0]
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from engine.estado import EstadoIndice
+
+# Versión del formato en disco; un cambio incompatible la incrementa
+FORMATO = 1
+
+# Fichero con el nombre de la generación vigente, reemplazado de forma atómica
+ACTUAL = "ACTUAL"
+
+# Generaciones antiguas que se conservan para workers que aún las tengan abiertas
+CONSERVAR = 2
+
+ARRAYS = ("data", "indices", "indptr", "idf")
+
+
+def hash_catalogo(productos):
+    """
+    Huella del catálogo: sha256 de los (id, nombre, descripción) ordenados por id.
+    """
+    huella = hashlib.sha256()
+    for id_producto, nombre, descripcion in sorted((str(p[0]), p[1], p[2]) for p in productos):
+        huella.update(f"{id_producto}\x1f{nombre}\x1f{descripcion}\x1e".encode("utf-8"))
+    return huella.hexdigest()
+
+
+def leer_actual(directorio, formato=FORMATO):
+    """
+    Metadatos de la generación vigente, o None si no hay snapshot utilizable.
+    """
+    try:
+        with open(os.path.join(directorio, ACTUAL), encoding="utf-8") as f:
+            generacion = f.read().strip()
+        with open(os.path.join(directorio, generacion, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("formato") != formato:
+        return None
+    meta["generacion"] = generacion
+    return meta
+
+
+def guardar(estado, directorio, hash_catalogo, creado):
+    """
+    Escribe una generación nueva con las filas vivas compactadas y la publica
+    reemplazando ACTUAL. `creado` es el instante en que se leyó el catálogo.
+    """
+    vivos = np.flatnonzero(estado.vivos)
+    matriz = sp.vstack([m for m in (estado.base, estado.delta) if m is not None], format="csr")
+    matriz = matriz[vivos]
+    matriz.sort_indices()
+
+    generacion, temporal = nueva_generacion(directorio)
+    # scipy exige el mismo tipo en indices e indptr; si no coinciden copia al abrir
+    tipo_indice = np.int32 if matriz.nnz < np.iinfo(np.int32).max else np.int64
+    arrays = {
+        "data": matriz.data.astype(np.float64),
+        "indices": matriz.indices.astype(tipo_indice),
+        "indptr": matriz.indptr.astype(tipo_indice),
+        "idf": np.asarray(estado.vectorizer.idf_, dtype=np.float64),
+    }
+    for nombre, array in arrays.items():
+        np.save(os.path.join(temporal, f"{nombre}.npy"), array)
+    meta = {
+        "formato": FORMATO,
+        "creado": creado,
+        "hash_catalogo": hash_catalogo,
+        "forma": list(matriz.shape),
+        "vocabulario": {termino: int(i) for termino, i in estado.vectorizer.vocabulary_.items()},
+        "ids": [estado.ids[i] for i in vivos],
+        "nombres": [estado.nombres[i] for i in vivos],
+        "descripciones": [estado.descripciones[i] for i in vivos],
+    }
+    with open(os.path.join(temporal, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    publicar(directorio, generacion, temporal)
+    return generacion
+
+
+def nueva_generacion(directorio):
+    """Nombre de una generación nueva y el directorio temporal donde escribirla."""
+    os.makedirs(directorio, exist_ok=True)
+    generacion = f"gen-{time.time_ns():020d}-{os.getpid()}"
+    temporal = os.path.join(directorio, f".{generacion}.tmp")
+    os.makedirs(temporal)
+    return generacion, temporal
+
+
+def publicar(directorio, generacion, temporal):
+    """Mueve la generación a su sitio, la apunta desde ACTUAL y borra las antiguas."""
+    os.rename(temporal, os.path.join(directorio, generacion))
+    puntero = os.path.join(directorio, f".{ACTUAL}.{os.getpid()}.tmp")
+    with open(puntero, "w", encoding="utf-8") as f:
+        f.write(generacion)
+    os.replace(puntero, os.path.join(directorio, ACTUAL))
+    _limpiar(directorio, generacion)
+
+
+def _limpiar(directorio, vigente):
+    generaciones = sorted(g for g in os.listdir(directorio) if g.startswith("gen-"))
+    for generacion in generaciones[:-CONSERVAR]:
+        if generacion != vigente:
+            shutil.rmtree(os.path.join(directorio, generacion), ignore_errors=True)
+
+
+def cargar(directorio, meta):
+    """
+    Abre una generación con numpy.memmap: los arrays grandes se comparten
+    entre workers a través de la caché de páginas, sin copias ni reajuste.
+    """
+    ruta = os.path.join(directorio, meta["generacion"])
+    arrays = {nombre: np.load(os.path.join(ruta, f"{nombre}.npy"), mmap_mode="r")
+              for nombre in ARRAYS}
+    matriz = sp.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]),
+                           shape=tuple(meta["forma"]), copy=False)
+
+    vectorizer = TfidfVectorizer()
+    vectorizer.vocabulary_ = meta["vocabulario"]
+    vectorizer.idf_ = np.asarray(arrays["idf"])
+    return EstadoIndice(vectorizer, matriz, list(meta["ids"]), list(meta["nombres"]),
+                        list(meta["descripciones"]))
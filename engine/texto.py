@@ -0,0 +1,138 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import nltk
+from nltk.corpus import stopwords
+from nltk.stem import SnowballStemmer
+
+from core import config
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cargar_stopwords(idioma):
+    """
+    Stopwords desde disco, sin descargas: primero la lista incluida en el
+    repositorio (STOPWORDS_FILE/<idioma>, una palabra por línea) y después el
+    directorio de datos de NLTK configurado en NLTK_DATA_DIR.
+    """
+    # Relativa a la raíz del repositorio, no al directorio de trabajo
+    incluida = os.path.join(RAIZ, config.STOPWORDS_FILE, idioma)
+    if os.path.isfile(incluida):
+        with open(incluida, encoding="utf-8") as f:
+            return frozenset(linea.strip() for linea in f if linea.strip())
+    if config.NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, config.NLTK_DATA_DIR)
+    try:
+        return frozenset(stopwords.words(idioma))
+    except LookupError:
+        raise RuntimeError(
+            f"No se encontraron las stopwords de NLTK para '{idioma}'. Copie la lista en "
+            f"{incluida} o instálelas sin conexión con "
+            f"'python -m nltk.downloader -d {config.NLTK_DATA_DIR} stopwords'."
+        ) from None
+
+
+class TextNormalizer:
+    """
+    Normalización de descripciones en español: minúsculas, solo letras,
+    sin stopwords y con stemming Snowball.
+
+    Las stopwords, el stemmer y las expresiones regulares se preparan una sola
+    vez. Los stems se memorizan por token y los textos limpios por descripción
+    (clave: hash de la descripción), ambos con política LRU.
+    """
+
+    def __init__(self, idioma="spanish", tam_cache_stems=100_000, tam_cache_textos=50_000):
+        self.idioma = idioma
+        self.stop_words = cargar_stopwords(idioma)
+        self.stemmer = SnowballStemmer(idioma)
+        self._no_letras = re.compile(r'[^a-zA-Záéíóúñ\s]')
+        self._no_palabra = re.compile(r'\W+')
+        self.stem = lru_cache(maxsize=tam_cache_stems)(self.stemmer.stem)
+        self._tam_cache_textos = tam_cache_textos
+        self._textos = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _clave(texto):
+        return hashlib.blake2b(texto.encode("utf-8"), digest_size=16).digest()
+
+    def _normalizar(self, texto):
+        texto = self._no_letras.sub('', texto.lower())
+        texto = self._no_palabra.sub(' ', texto)
+        stop_words, stem = self.stop_words, self.stem
+        # Tras las sustituciones solo quedan letras y espacios: partir por espacios
+        # equivale a word_tokenize y evita depender del modelo punkt
+        return ' '.join(stem(word) for word in texto.split() if word not in stop_words)
+
+    def normalize(self, texto):
+        clave = self._clave(texto)
+        with self._lock:
+            limpio = self._textos.get(clave)
+            if limpio is not None:
+                self._textos.move_to_end(clave)
+                return limpio
+        limpio = self._normalizar(texto)
+        with self._lock:
+            self._textos[clave] = limpio
+            if len(self._textos) > self._tam_cache_textos:
+                self._textos.popitem(last=False)
+        return limpio
+
+    def normalize_many(self, textos):
+        return [self.normalize(texto) for texto in textos]
+
+    def limpiar_cache(self):
+        self.stem.cache_clear()
+        with self._lock:
+            self._textos.clear()
+
+
+_normalizador = None
+_lock_normalizador = threading.Lock()
+
+
+def normalizador_por_defecto():
+    global _normalizador
+    if _normalizador is None:
+        with _lock_normalizador:
+            if _normalizador is None:
+                _normalizador = TextNormalizer()
+    return _normalizador
+
+
+def _normalizar_bloque(textos):
+    # Se ejecuta en el proceso hijo, que mantiene su propio normalizador y cachés
+    return normalizador_por_defecto().normalize_many(textos)
+
+
+def normalizar_en_paralelo(textos, workers=None, tam_bloque=None):
+    """
+    Normaliza un corpus completo repartiéndolo en bloques entre procesos.
+
+    Tokenizar y hacer stemming con NLTK retiene el GIL, así que se usa un
+    ProcessPoolExecutor. Sus procesos se crean con `spawn`: con `fork` un hijo
+    podría heredar tomado un lock de otro hilo del servidor y bloquearse.
+    Es un generador: devuelve los textos limpios en el mismo orden de entrada
+    a medida que terminan los bloques. Con un solo worker, o si el corpus cabe
+    en un bloque, se normaliza en serie. workers=0 usa todos los núcleos.
+    """
+    workers = config.RECOMENDADOR_WORKERS if workers is None else workers
+    tam_bloque = tam_bloque or config.RECOMENDADOR_TAM_BLOQUE_TEXTO
+    workers = workers or os.cpu_count() or 1
+    textos = list(textos)
+    if workers <= 1 or len(textos) <= tam_bloque:
+        yield from normalizador_por_defecto().normalize_many(textos)
+        return
+    bloques = [textos[i:i + tam_bloque] for i in range(0, len(textos), tam_bloque)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(bloques)),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        for limpios in pool.map(_normalizar_bloque, bloques):
+            yield from limpios
@@ -0,0 +1,318 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from core import config
+
+# Versión del formato de las generaciones en VECINOS_DIR
+FORMATO = 1
+
+
+def _snapshot():
+    from engine import snapshot
+    return snapshot
+
+
+def calcular(matrices, k, vivos=None, tam_bloque=None):
+    """
+    Vecinos de todas las filas de `matrices` (CSR o lista apilada) por
+    bloques de consultas. top_k_similares recorre a su vez el catálogo por
+    bloques, así que la memoria está acotada por tam_bloque·TAM_BLOQUE.
+    """
+    import numpy as np
+    import scipy.sparse as sp
+    from engine.similitud import top_k_similares
+
+    tam_bloque = tam_bloque or config.VECINOS_TAM_BLOQUE
+    if sp.issparse(matrices):
+        matrices = [matrices]
+    matrices = [m for m in matrices if m is not None]
+    n = sum(m.shape[0] for m in matrices)
+    vecinos = np.full((n, k), -1, dtype=np.int32)
+    puntos = np.zeros((n, k), dtype=np.float16)
+    desplazamiento = 0
+    for matriz in matrices:
+        for inicio in range(0, matriz.shape[0], tam_bloque):
+            consultas = matriz[inicio:inicio + tam_bloque]
+            filas = range(desplazamiento + inicio, desplazamiento + inicio + consultas.shape[0])
+            if vivos is not None:
+                filas = [f for f in filas if vivos[f]]
+                consultas = consultas[[f - desplazamiento - inicio for f in filas]]
+            if not len(filas):
+                continue
+            indices, valores = top_k_similares(matrices, consultas, k, excluir=[[f] for f in filas],
+                                               vivos=vivos)
+            for f, idx, val in zip(filas, indices, valores):
+                vecinos[f, :len(idx)] = idx
+                puntos[f, :len(val)] = val
+        desplazamiento += matriz.shape[0]
+    return vecinos, puntos
+
+
+def guardar(directorio, vecinos, puntos, ids, nombres, descripciones, hash_catalogo, creado):
+    import numpy as np
+
+    snapshot = _snapshot()
+    generacion, temporal = snapshot.nueva_generacion(directorio)
+    np.save(os.path.join(temporal, "vecinos.npy"), vecinos)
+    np.save(os.path.join(temporal, "puntos.npy"), puntos)
+    meta = {
+        "formato": FORMATO,
+        "hash_catalogo": hash_catalogo,
+        "k": int(vecinos.shape[1]),
+        "creado": creado,
+        "ids": ids,
+        "nombres": nombres,
+        "descripciones": descripciones,
+    }
+    with open(os.path.join(temporal, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    snapshot.publicar(directorio, generacion, temporal)
+    return generacion
+
+
+def capturar(estado):
+    """
+    Copia coherente de lo que necesita el cálculo. Se llama con el lock del
+    índice tomado; las matrices no se copian porque nunca se reescriben.
+    """
+    import numpy as np
+
+    vivos = estado.vivos.copy()
+    filas = np.flatnonzero(vivos)
+    return {
+        "capturado": time.time(),
+        "matrices": [estado.base, estado.delta],
+        "vivos": vivos,
+        "filas": filas,
+        "ids": [estado.ids[i] for i in filas],
+        "nombres": [estado.nombres[i] for i in filas],
+        "descripciones": [estado.descripciones[i] for i in filas],
+    }
+
+
+class TablaVecinos:
+    """
+    Tabla precalculada de vecinos producto -> producto.
+
+    Para cada producto guarda sus K vecinos más similares (coseno TF-IDF)
+    como arrays empaquetados: `vecinos` (N×K, int32, -1 = hueco) con filas de
+    la propia tabla y `puntos` (N×K, float16). Responder "similares a este
+    producto" es leer una fila: O(K), sin vectorizer ni recorrer el catálogo.
+
+    Se calcula en un hilo cada vez que el índice publica un estado nuevo (es
+    uno de sus `oyentes`) o con `python -m engine.vecinos`, y se guarda como
+    generación en VECINOS_DIR que los workers abren con memmap.
+
+    Entre cálculos se mantiene al día con las operaciones del índice: un
+    producto eliminado deja de aparecer como vecino, y uno añadido o
+    modificado no tiene fila válida (`similares` devuelve None para que se
+    calcule en vivo). Los nombres y descripciones modificados se sirven ya
+    actualizados.
+    """
+
+    def __init__(self, directorio=None, k=None):
+        self.directorio = config.VECINOS_DIR if directorio is None else directorio
+        self.k = k or config.VECINOS_K
+        self._lock = threading.Lock()
+        self._tabla = None
+        # Operaciones llegadas durante un cálculo, para repetirlas sobre la tabla nueva
+        self._diario = None
+        # Y las recientes, para las generaciones que calculan otros workers
+        self._recientes = deque(maxlen=10000)
+        self._mtime = None
+        self._proxima_revision = 0.0
+        self.generacion = None
+        self.duracion_calculo = None
+        self.ultimo_error = None
+
+    @property
+    def lista(self):
+        return self._tabla is not None
+
+    def _cargar(self, meta):
+        import numpy as np
+
+        ruta = os.path.join(self.directorio, meta["generacion"])
+        ids = meta["ids"]
+        return {
+            "vecinos": np.load(os.path.join(ruta, "vecinos.npy"), mmap_mode="r"),
+            "puntos": np.load(os.path.join(ruta, "puntos.npy"), mmap_mode="r"),
+            "ids": ids,
+            "nombres": meta["nombres"],
+            "descripciones": meta["descripciones"],
+            "fila_por_id": {id_producto: i for i, id_producto in enumerate(ids)},
+            "hash_catalogo": meta["hash_catalogo"],
+            "muertas": set(),
+            "cambiadas": {},
+        }
+
+    def revision_pendiente(self):
+        return bool(self.directorio) and time.monotonic() >= self._proxima_revision
+
+    def revisar(self):
+        """
+        Abre la generación vigente si es más nueva que la cargada (otro worker
+        o la línea de comandos la calcularon). Mira el disco como mucho una vez
+        cada RECOMENDADOR_SNAPSHOT_INTERVALO.
+        """
+        ahora = time.monotonic()
+        if not self.directorio or ahora < self._proxima_revision:
+            return False
+        self._proxima_revision = ahora + config.RECOMENDADOR_SNAPSHOT_INTERVALO
+        try:
+            mtime = os.stat(os.path.join(self.directorio, "ACTUAL")).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        meta = _snapshot().leer_actual(self.directorio, formato=FORMATO)
+        if meta is None or meta["generacion"] <= (self.generacion or ""):
+            return False
+        tabla = self._cargar(meta)
+        with self._lock:
+            for instante, operacion, argumentos in self._recientes:
+                if instante >= meta["creado"]:
+                    self._aplicar_en(tabla, operacion, argumentos)
+            self._tabla = tabla
+            self.generacion = meta["generacion"]
+        return True
+
+    def construir(self, captura):
+        """
+        Calcula la tabla a partir de `capturar(estado)` y la publica. Si la
+        generación vigente ya es de este mismo catálogo, solo la abre.
+        """
+        import numpy as np
+
+        inicio = time.perf_counter()
+        snapshot = _snapshot()
+        try:
+            huella = snapshot.hash_catalogo(zip(captura["ids"], captura["nombres"], captura["descripciones"]))
+            meta = snapshot.leer_actual(self.directorio, formato=FORMATO)
+            if meta is None or meta["hash_catalogo"] != huella or meta["k"] < self.k:
+                vecinos, puntos = calcular(captura["matrices"], self.k, captura["vivos"])
+                # Solo las filas vivas, con los índices renumerados a la tabla compacta
+                filas = captura["filas"]
+                nueva = np.full(len(captura["vivos"]), -1, dtype=np.int32)
+                nueva[filas] = np.arange(len(filas), dtype=np.int32)
+                vecinos = vecinos[filas]
+                vecinos = np.where(vecinos >= 0, nueva[np.maximum(vecinos, 0)], -1).astype(np.int32)
+                guardar(self.directorio, vecinos, puntos[filas], captura["ids"], captura["nombres"],
+                        captura["descripciones"], huella, captura["capturado"])
+                meta = snapshot.leer_actual(self.directorio, formato=FORMATO)
+            tabla = self._cargar(meta)
+        except Exception as error:
+            self.ultimo_error = repr(error)
+            with self._lock:
+                self._diario = None
+            raise
+        with self._lock:
+            for operacion, argumentos in self._diario or ():
+                self._aplicar_en(tabla, operacion, argumentos)
+            self._diario = None
+            self._tabla = tabla
+            self.generacion = meta["generacion"]
+        self.duracion_calculo = time.perf_counter() - inicio
+        self.ultimo_error = None
+        return True
+
+    def publicado(self, estado):
+        """
+        Oyente de RecommenderIndex, llamado con su lock tomado al publicar un
+        estado nuevo: captura el estado y calcula la tabla en un hilo.
+        """
+        if not config.VECINOS_ACTIVO or not self.directorio or estado.vectorizer is None:
+            return
+        with self._lock:
+            if self._diario is not None:
+                # Ya hay un cálculo en curso; el siguiente estado publicado lo pondrá al día
+                return
+            self._diario = []
+        threading.Thread(target=self.construir, args=(capturar(estado),), name="tabla-vecinos",
+                         daemon=True).start()
+
+    @staticmethod
+    def _aplicar_en(tabla, operacion, argumentos):
+        i = tabla["fila_por_id"].get(argumentos[0])
+        if i is None:
+            return
+        if operacion == "eliminar":
+            tabla["muertas"].add(i)
+        else:
+            tabla["cambiadas"][i] = (argumentos[1], argumentos[2])
+
+    def aplicar(self, operacion, argumentos):
+        """Oyente de RecommenderIndex: refleja un cambio incremental."""
+        with self._lock:
+            self._recientes.append((time.time(), operacion, argumentos))
+            if self._diario is not None:
+                self._diario.append((operacion, argumentos))
+            if self._tabla is not None:
+                self._aplicar_en(self._tabla, operacion, argumentos)
+
+    def similares(self, id_producto, top_n):
+        """
+        Hasta top_n vecinos del producto, o None si la tabla no lo cubre
+        (producto nuevo, modificado, eliminado o top_n mayor que K).
+        """
+        tabla = self._tabla
+        if tabla is None or top_n > tabla["vecinos"].shape[1]:
+            return None
+        i = tabla["fila_por_id"].get(id_producto)
+        if i is None or i in tabla["muertas"] or i in tabla["cambiadas"]:
+            return None
+        resultado = []
+        for j, puntos in zip(tabla["vecinos"][i].tolist(), tabla["puntos"][i].tolist()):
+            if j < 0 or len(resultado) == top_n:
+                break
+            if j in tabla["muertas"]:
+                continue
+            nombre, descripcion = tabla["cambiadas"].get(j, (tabla["nombres"][j], tabla["descripciones"][j]))
+            resultado.append({"id_producto": tabla["ids"][j], "nombre_producto": nombre,
+                              "desc_producto": descripcion, "similitud": round(puntos, 4)})
+        return resultado
+
+    def estado(self):
+        tabla = self._tabla
+        return {
+            "lista": tabla is not None,
+            "construyendo": self._diario is not None,
+            "generacion": self.generacion,
+            "filas": len(tabla["ids"]) if tabla else 0,
+            "k": int(tabla["vecinos"].shape[1]) if tabla else self.k,
+            "eliminadas": len(tabla["muertas"]) if tabla else 0,
+            "modificadas": len(tabla["cambiadas"]) if tabla else 0,
+            "duracion_calculo": self.duracion_calculo,
+            "ultimo_error": self.ultimo_error,
+        }
+
+
+tabla_vecinos = TablaVecinos()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcula la tabla de vecinos desde la base de datos")
+    parser.add_argument("--k", type=int, default=config.VECINOS_K)
+    parser.add_argument("--directorio", default=config.VECINOS_DIR)
+    args = parser.parse_args()
+
+    from engine.estado import ajustar
+    from engine.indice import productos_db
+
+    inicio = time.perf_counter()
+    estado = ajustar(productos_db())
+    if estado.vectorizer is None:
+        print("Catálogo vacío: no hay nada que calcular")
+        return
+    TablaVecinos(directorio=args.directorio, k=args.k).construir(capturar(estado))
+    print(json.dumps({"productos": estado.n_filas, "k": args.k,
+                      "segundos": round(time.perf_counter() - inicio, 2)}))
+
+
+if __name__ == "__main__":
+    main()
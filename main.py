@@ -1,15 +1,54 @@
 from fastapi import FastAPI
 from functools import lru_cache
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import asyncio
 from uuid import uuid4
 
 import core.config as config
 from routers.user import users
 from routers.security import auth
 from routers.productos import producto
+from engine.indice import indice_recomendador
+from engine.indice_denso import indice_denso
+from engine.vecinos import tabla_vecinos
+from engine.planificador import planificador_indice
+from db.consumo import acumulador_consumo
+from db.database import crear_esquema
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	if config.DB_CREAR_ESQUEMA:
+		await asyncio.to_thread(crear_esquema)
+	# El índice de recomendación vive con la aplicación. El planificador lo construye
+	# en segundo plano (al arrancar si hay precarga, si no en la primera recomendación)
+	# y lo reconstruye cuando la deriva de los cambios incrementales lo pide
+	indice_recomendador.al_superar_deriva = planificador_indice.notificar
+	# Antes de la primera construcción, para que reciban el primer estado publicado:
+	# la tabla precalculada de vecinos, que se recalcula con cada estado nuevo, y el
+	# índice de embeddings densos, que se construye en un hilo (o se abre de
+	# DENSO_DIR si el catálogo no cambió)
+	if tabla_vecinos not in indice_recomendador.oyentes:
+		indice_recomendador.oyentes.append(tabla_vecinos)
+	if config.DENSO_ACTIVO:
+		if indice_denso not in indice_recomendador.oyentes:
+			indice_recomendador.oyentes.append(indice_denso)
+		indice_denso.reajustar_en_segundo_plano()
+	await planificador_indice.iniciar(precargar=config.RECOMENDADOR_PRECARGA)
+	app.state.indice_recomendador = indice_recomendador
+	app.state.planificador_indice = planificador_indice
+	app.state.indice_denso = indice_denso
+	app.state.tabla_vecinos = tabla_vecinos
+	# Contadores de consumo por lotes; al apagar se vuelca lo pendiente
+	if config.CONSUMO_WRITE_BEHIND:
+		acumulador_consumo.iniciar()
+	app.state.acumulador_consumo = acumulador_consumo
+	yield
+	await asyncio.to_thread(acumulador_consumo.detener)
+	await planificador_indice.detener()
 
 #Create our main app "https://pp-back-end.onrender.com"
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(auth.router)  #, prefix="/auth", tags=["auth"]
 app.include_router(users.router, prefix="/usuario", tags=["usuario"])
@@ -2,7 +2,7 @@
 import datetime
 from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, Float, String
 from sqlalchemy import LargeBinary, Text, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from fastapi_utils.guid_type import GUID, GUID_DEFAULT_SQLITE
 from sqlalchemy.types import TypeDecorator, String
 import json
@@ -38,7 +38,11 @@ class Producto(Base):
 	nombre_producto = Column(String(50), unique=True, nullable=False, index=True) 
 	desc_producto = Column(String(250), nullable=False, index=True)
 	consumo_producto = Column(Integer, nullable=True, index=True, default=0)
-	imagen_b64 = Column(LargeBinary, nullable=True)
+	# Diferida: solo se lee al acceder al atributo o con undefer_group("imagen")
+	imagen_b64 = deferred(Column(LargeBinary, nullable=True), group="imagen")
+	# SHA-256 de la imagen en el almacén en disco (db/imagenes.py); imagen_b64
+	# solo se mantiene para filas antiguas, que se migran al servirlas
+	imagen_hash = Column(String(64), nullable=True)
 
 	def __repr__(self):
 		return f"Producto(id={self.id_producto}, nombre={self.nombre_producto}, descripcion={self.desc_producto})"
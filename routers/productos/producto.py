@@ -1,49 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Security, Query
-from fastapi.responses import JSONResponse, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Security, Query, Request, BackgroundTasks
+from fastapi.responses import JSONResponse, Response, StreamingResponse, FileResponse
 from fastapi.encoders import jsonable_encoder
 from fastapi import File, UploadFile, Form
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from db.database import SessionLocal, engine, get_db
 from models.data import Producto
-from schemas.producto import ProductoBase, ProductoConsumo, ProductoRecomendar, DeleteRequest
+from db.consumo import acumulador_consumo, existe_producto, id_producto, sumar_consumo
+from db.imagenes import guardar_stream, generar_variantes, ruta_imagen, etag, coincide_etag, tipo_mime
+from db.imagenes import tamanos as tamanos_imagen
+from db.operaciones import eliminar_por_ids, actualizar_por_ids, leer_filas_por_ids
+from db.productos import listar_pagina, iterar_catalogo, importar_productos, leer_filas_archivo
+from schemas.producto import ProductoBase, ProductoConsumo, ProductoRecomendar, DeleteRequest, ProductoActualizacionMasiva
 from schemas.user import User_InDB
 from security.auth import get_current_active_user, get_current_user
 from typing_extensions import Annotated
+from typing import Optional, Literal, List
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-import pandas as pd
-from engine.recomendador import recomendar_productos 
+from engine.indice import indice_recomendador
+from engine.indice_denso import indice_denso
+from engine.cache_resultados import cache_recomendaciones
+from engine.vecinos import tabla_vecinos
+from engine.planificador import planificador_indice
+from core.ejecutores import en_ejecutor_cpu
+import core.config as config
+import csv
+import io
+import json
+import zlib
 
 
 
 router = APIRouter()
 
+def _guardar_imagen(imagen, tareas):
+	# La subida se copia al almacén por trozos; las miniaturas, después de responder
+	huella = guardar_stream(imagen.file)
+	tareas.add_task(generar_variantes, huella)
+	return huella
+
 # Ruta para crear un producto
 @router.post("/crear_producto_temp/", status_code=status.HTTP_201_CREATED)
-async def crear_producto_temp(
+def crear_producto_temp(
 				current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])],
 				nombre_producto: str = Form(...), 
 				desc_producto: str = Form(...), 
 				imagen: UploadFile = File(...),
+				tareas: BackgroundTasks = None,
 				db: Session = Depends(get_db)):
 	
     producto = Producto(
 		nombre_producto=nombre_producto, 
 		desc_producto=desc_producto, 
-		imagen_b64=await imagen.read())
+		imagen_hash=_guardar_imagen(imagen, tareas))
 	
     db.add(producto)
     db.commit()
     db.refresh(producto)
+    indice_recomendador.agregar_producto(producto.id_producto, producto.nombre_producto, producto.desc_producto)
     return {"mensaje": "Producto creado con éxito", "id": producto.id_producto}
 
 # Ruta para actualizar un producto
 @router.put("/actualizar_producto_temp/{id}", status_code=status.HTTP_201_CREATED)
-async def actualizar_producto_temp(
+def actualizar_producto_temp(
 				current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])],
 				id: str, 
 				nombre_producto: str = Form(None), 
 				desc_producto: str = Form(None), 
 				imagen: UploadFile = File(None),
+				tareas: BackgroundTasks = None,
 				db: Session = Depends(get_db)):
 	
 	print(nombre_producto)
@@ -54,15 +79,18 @@ async def actualizar_producto_temp(
 		if desc_producto:
 			producto.desc_producto = desc_producto
 		if imagen:
-			producto.imagen_b64 = await imagen.read()
+			producto.imagen_hash = _guardar_imagen(imagen, tareas)
+			producto.imagen_b64 = None
 		db.commit()
 		db.refresh(producto)
+		if nombre_producto or desc_producto:
+			indice_recomendador.actualizar_producto(producto.id_producto, producto.nombre_producto, producto.desc_producto)
 		return {"mensaje": "Producto actualizado con éxito"}
 	return {"mensaje": "Producto no encontrado"}
 
 
 @router.post("/crear_producto/", status_code=status.HTTP_201_CREATED)
-async def crear_producto(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])],
+def crear_producto(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])],
 					producto: ProductoBase, db: Session = Depends(get_db)):
 	try:
 		db_producto = Producto(
@@ -72,6 +100,7 @@ async def crear_producto(current_user: Annotated[User_InDB, Security(get_current
 		db.add(db_producto)   	
 		db.commit()
 		db.refresh(db_producto)			
+		indice_recomendador.agregar_producto(db_producto.id_producto, db_producto.nombre_producto, db_producto.desc_producto)
 		return db_producto
 	except IntegrityError as e:
 		raise HTTPException(status_code=500, detail="Error de integridad creando objeto Producto")
@@ -79,17 +108,18 @@ async def crear_producto(current_user: Annotated[User_InDB, Security(get_current
 		raise HTTPException(status_code=405, detail="Error inesperado SQLAlchemy creando el objeto Producto")		
 
 @router.delete("/eliminar_producto/{id}", status_code=status.HTTP_201_CREATED) 
-async def eliminar_producto(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])],
+def eliminar_producto(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])],
 					id: str, db: Session = Depends(get_db)):
 	db_producto = db.query(Producto).filter(Producto.id_producto == id).first()
 	if db_producto is None:
 		raise HTTPException(status_code=404, detail="El producto no existe en la base de datos")	
 	db.delete(db_producto)	
 	db.commit()
+	indice_recomendador.eliminar_producto(db_producto.id_producto)
 	return {"Result": "Producto eliminado satisfactoriamente"}
 
 @router.put("/actualizar_producto/{id}", status_code=status.HTTP_201_CREATED) 
-async def actualizar_producto(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])], 
+def actualizar_producto(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])], 
 				id: str, nueva_producto: ProductoBase, db: Session = Depends(get_db)):
 	db_producto = db.query(Producto).filter(Producto.id_producto == id).first()
 	if db_producto is None:
@@ -98,33 +128,31 @@ async def actualizar_producto(current_user: Annotated[User_InDB, Security(get_cu
 	db_producto.desc_producto=nueva_producto.desc_producto
 	db.commit()
 	db.refresh(db_producto)	
+	indice_recomendador.actualizar_producto(db_producto.id_producto, db_producto.nombre_producto, db_producto.desc_producto)
 	return {"Result": "Producto actualizado satisfactoriamente"}	
 
-@router.put("/incrementar_consumo/{id}", status_code=status.HTTP_200_OK) 
-async def incrementar_consumo(id: str, db: Session = Depends(get_db)):
-	db_producto = db.query(Producto).filter(Producto.id_producto == id).first()
-	if db_producto is None:
+def _sumar_consumo(id, n, db):
+	if acumulador_consumo.activo:
+		# Write-behind: solo se comprueba que existe, el volcado va por lotes
+		if not existe_producto(db, id):
+			raise HTTPException(status_code=404, detail="El producto seleccionada no existe en la base de datos")
+		acumulador_consumo.sumar(id, n)
+	elif not sumar_consumo(db, {id: n}):
 		raise HTTPException(status_code=404, detail="El producto seleccionada no existe en la base de datos")
-	db_producto.consumo_producto=(db_producto.consumo_producto + 1)
-	db.commit()
-	db.refresh(db_producto)	
+	indice_recomendador.sumar_consumo(id_producto(id), n)
+
+@router.put("/incrementar_consumo/{id}", status_code=status.HTTP_200_OK) 
+def incrementar_consumo(id: str, db: Session = Depends(get_db)):
+	_sumar_consumo(id, 1, db)
 	return {"Result": "El consumo del producto actualizado satisfactoriamente"}	
 
 @router.put("/reducir_consumo/{id}", status_code=status.HTTP_200_OK) 
-async def reducir_consumo(id: str, db: Session = Depends(get_db)):
-	db_producto = db.query(Producto).filter(Producto.id_producto == id).first()
-	if db_producto is None:
-		raise HTTPException(status_code=404, detail="El producto seleccionada no existe en la base de datos")
-	if db_producto.consumo_producto > 0:
-		db_producto.consumo_producto=(db_producto.consumo_producto - 1)
-	else:
-		db_producto.consumo_producto=0
-	db.commit()
-	db.refresh(db_producto)	
+def reducir_consumo(id: str, db: Session = Depends(get_db)):
+	_sumar_consumo(id, -1, db)
 	return {"Result": "El consumo del producto actualizado satisfactoriamente"}	
 	
 @router.put("/actualizar_producto_consumo/{id}", status_code=status.HTTP_201_CREATED) 
-async def actualizar_producto_consumo(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])], 
+def actualizar_producto_consumo(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])], 
 				id: str, nueva_producto: ProductoConsumo, db: Session = Depends(get_db)):
 	db_producto = db.query(Producto).filter(Producto.id_producto == id).first()
 	if db_producto is None:
@@ -132,54 +160,231 @@ async def actualizar_producto_consumo(current_user: Annotated[User_InDB, Securit
 	db_producto.consumo_producto=nueva_producto.consumo_producto
 	db.commit()
 	db.refresh(db_producto)	
+	indice_recomendador.fijar_consumo([db_producto.id_producto], nueva_producto.consumo_producto)
 	return {"Result": "Producto actualizado satisfactoriamente"}	
 
-@router.get("/leer_productos/", status_code=status.HTTP_201_CREATED)  
-async def leer_productos(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["cliente"])],
-					skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):    
+def _pagina_productos(response, db, skip, limit, cursor, orden):
+	try:
+		filas, siguiente = listar_pagina(db, limit=limit, skip=skip, cursor=cursor, orden=orden)
+	except ValueError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+	if siguiente is not None:
+		response.headers["X-Siguiente-Cursor"] = siguiente
 	return [{"id_producto": p.id_producto, "nombre_producto": p.nombre_producto, "desc_producto": p.desc_producto} 
-            for p in db.query(Producto).all()]
+            for p in filas]
+
+@router.get("/leer_productos/", status_code=status.HTTP_201_CREATED)  
+def leer_productos(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["cliente"])],
+					response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+					orden: Literal["id", "nombre", "consumo"] = "id", db: Session = Depends(get_db)):    
+	return _pagina_productos(response, db, skip, limit, cursor, orden)
 	
 @router.get("/leer_productos_libres/", status_code=status.HTTP_200_OK)  
-async def leer_productos_libres(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):    
-	return [{"id_producto": p.id_producto, "nombre_producto": p.nombre_producto, "desc_producto": p.desc_producto} 
-            for p in db.query(Producto).all()]
+def leer_productos_libres(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+					orden: Literal["id", "nombre", "consumo"] = "id", db: Session = Depends(get_db)):    
+	return _pagina_productos(response, db, skip, limit, cursor, orden)
 
 @router.post("/leer_productos_recomendados/", status_code=status.HTTP_200_OK)  
-async def leer_productos_recomendados(nombres: ProductoRecomendar,
-				db: Session = Depends(get_db)):  
-	descrip = []	  
-	productos = db.query(Producto).all()
-	for p in productos:
-		print((p.nombre_producto, p.desc_producto))
-		descrip.append((p.nombre_producto, p.desc_producto))
-	df_productos = pd.DataFrame(data=descrip, columns=["nombre_producto","desc_producto"])
-	df_productos = recomendar_productos(df_productos, nombres.nombres_productos, top_n=2)
-	dictres = []
-	for index, row in df_productos.iterrows():
-		dictres.append({
-			"nombre_producto": row.nombre_producto,
-			"desc_producto": row.desc_producto
-		})
-	return dictres
+async def leer_productos_recomendados(nombres: ProductoRecomendar):  
+	# Las cestas repetidas (carruseles) salen de cache_recomendaciones; la clave
+	# incluye el motor y la versión de su índice, así que un cambio del catálogo la invalida
+	motor = nombres.motor or config.RECOMENDADOR_MOTOR
+	if motor == "denso":
+		_comprobar_denso()
+		clave = cache_recomendaciones.clave(motor, indice_denso.version_catalogo, nombres.nombres_productos,
+					nombres.top_n, nombres.agregacion)
+		return await cache_recomendaciones.obtener(clave, lambda: en_ejecutor_cpu(
+					indice_denso.recomendar, nombres.nombres_productos,
+					top_n=nombres.top_n, agregacion=nombres.agregacion))
+	await _esperar_indice()
+	if indice_recomendador.revision_pendiente():
+		await en_ejecutor_cpu(indice_recomendador.revisar_snapshot)
+	peso = config.RECOMENDADOR_PESO_POPULARIDAD if nombres.peso_popularidad is None else nombres.peso_popularidad
+	# Con peso de popularidad el resultado también cambia con cada consumo
+	clave = cache_recomendaciones.clave(motor, indice_recomendador.version_catalogo, nombres.nombres_productos,
+				nombres.top_n, nombres.agregacion, peso,
+				indice_recomendador.popularidad.cambios if peso else None)
+	return await cache_recomendaciones.obtener(clave, lambda: en_ejecutor_cpu(
+				indice_recomendador.recomendar, nombres.nombres_productos,
+				top_n=nombres.top_n, agregacion=nombres.agregacion, peso_popularidad=peso))
+
+async def _esperar_indice():
+	# Si la construcción falló y no hay índice publicado, 503 con el error en
+	# lugar de recomendar sobre un catálogo vacío
+	await planificador_indice.esperar_indice()
+	if not indice_recomendador.listo:
+		raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+			detail=f"El índice de recomendación no está disponible: {planificador_indice.ultimo_error}",
+			headers={"Retry-After": str(int(config.RECOMENDADOR_REINTENTO))})
+
+def _comprobar_denso():
+	if not config.DENSO_ACTIVO:
+		raise HTTPException(status_code=400, detail="El motor denso está desactivado (DENSO_ACTIVO)")
+	if not indice_denso.listo:
+		raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+			detail="El índice denso se está construyendo, reintente en unos segundos",
+			headers={"Retry-After": "5"})
+
+@router.get("/recomendaciones/cache", status_code=status.HTTP_200_OK)
+async def estado_cache_recomendaciones():
+	return cache_recomendaciones.estado()
+
+@router.get("/similares/{id}", status_code=status.HTTP_200_OK)
+async def leer_productos_similares(id: str, top_n: int = Query(10, ge=1, le=100)):
+	# Una fila de la tabla precalculada, O(K); lo que la tabla aún no cubre
+	# (productos nuevos o modificados desde el cálculo) se calcula con el índice
+	clave = id_producto(id)
+	if clave is None:
+		raise HTTPException(status_code=404, detail="Producto no encontrado")
+	if tabla_vecinos.revision_pendiente():
+		await en_ejecutor_cpu(tabla_vecinos.revisar)
+	similares = tabla_vecinos.similares(str(clave), top_n)
+	if similares is None:
+		await _esperar_indice()
+		similares = await en_ejecutor_cpu(indice_recomendador.similares, str(clave), top_n)
+	if similares is None:
+		raise HTTPException(status_code=404, detail="Producto no encontrado")
+	return similares
+
+@router.get("/vecinos/estado", status_code=status.HTTP_200_OK)
+async def estado_tabla_vecinos():
+	return tabla_vecinos.estado()
+
+@router.get("/populares/", status_code=status.HTTP_200_OK)
+async def leer_productos_populares(top_n: int = Query(10, ge=1, le=100)):
+	await _esperar_indice()
+	return await en_ejecutor_cpu(indice_recomendador.populares, top_n)
+
+@router.get("/indice/estado", status_code=status.HTTP_200_OK)
+async def estado_indice():
+	return planificador_indice.estado()
+
+@router.get("/indice/denso/estado", status_code=status.HTTP_200_OK)
+async def estado_indice_denso():
+	return indice_denso.estado()
+
+@router.get("/consumo/estado", status_code=status.HTTP_200_OK)
+async def estado_consumo():
+	return acumulador_consumo.estado()
+
+CAMPOS_EXPORTACION = ["id_producto", "nombre_producto", "desc_producto", "consumo_producto"]
+
+def _exportar_catalogo(formato, comprimir, tam_lote):
+	# Sesión propia: el generador sigue vivo después de que termine el endpoint
+	db = SessionLocal()
+	compresor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if comprimir else None
+	try:
+		if formato == "csv":
+			buffer = io.StringIO()
+			csv.writer(buffer).writerow(CAMPOS_EXPORTACION)
+			cabecera = buffer.getvalue().encode("utf-8")
+			yield compresor.compress(cabecera) if compresor else cabecera
+		for lote in iterar_catalogo(db, tam_lote):
+			buffer = io.StringIO()
+			if formato == "csv":
+				escritor = csv.writer(buffer)
+				for p in lote:
+					escritor.writerow([p.id_producto, p.nombre_producto, p.desc_producto, p.consumo_producto])
+			else:
+				for p in lote:
+					buffer.write(json.dumps({"id_producto": str(p.id_producto), "nombre_producto": p.nombre_producto,
+						"desc_producto": p.desc_producto, "consumo_producto": p.consumo_producto}, ensure_ascii=False))
+					buffer.write("\n")
+			datos = buffer.getvalue().encode("utf-8")
+			if compresor:
+				datos = compresor.compress(datos) + compresor.flush(zlib.Z_SYNC_FLUSH)
+			yield datos
+		if compresor:
+			yield compresor.flush()
+	finally:
+		db.close()
+
+@router.get("/exportar", status_code=status.HTTP_200_OK)
+def exportar_productos(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["cliente"])],
+					formato: Literal["ndjson", "csv"] = "ndjson", gzip: bool = False,
+					tam_lote: int = Query(1000, ge=1, le=10000)):
+	# Con gzip se descarga el fichero .gz tal cual: sin Content-Encoding, que
+	# haría que navegadores y curl --compressed lo descomprimieran al vuelo
+	media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+	if gzip:
+		media_type = "application/gzip"
+	headers = {"Content-Disposition": f'attachment; filename="productos.{formato}{".gz" if gzip else ""}"'}
+	return StreamingResponse(_exportar_catalogo(formato, gzip, tam_lote), media_type=media_type, headers=headers)
+
+@router.post("/importar", status_code=status.HTTP_200_OK)
+def importar_productos_json(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])],
+					productos: List[dict], tam_lote: int = Query(500, ge=1, le=5000), db: Session = Depends(get_db)):
+	nuevos = []
+	resumen = importar_productos(db, productos, tam_lote, al_insertar=nuevos.extend)
+	_indexar_importados(nuevos)
+	return resumen
+
+@router.post("/importar_archivo", status_code=status.HTTP_200_OK)
+def importar_productos_archivo(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])],
+					archivo: UploadFile = File(...), formato: Optional[Literal["csv", "ndjson"]] = Form(None),
+					tam_lote: int = Form(500, ge=1, le=5000), db: Session = Depends(get_db)):
+	if formato is None:
+		formato = "csv" if (archivo.filename or "").lower().endswith(".csv") else "ndjson"
+	nuevos = []
+	resumen = importar_productos(db, leer_filas_archivo(archivo.file, formato), tam_lote, al_insertar=nuevos.extend)
+	_indexar_importados(nuevos)
+	return resumen
+
+def _indexar_importados(nuevos):
+	# Pocas filas: altas incrementales, recomendables al momento. Muchas: un
+	# único reajuste en lugar de apilar cada una en el delta del índice
+	if len(nuevos) <= config.RECOMENDADOR_IMPORTACION_INCREMENTAL:
+		indice_recomendador.agregar_productos(nuevos)
+	else:
+		planificador_indice.notificar()
 
 @router.delete("/delete-productos/")
-async def delete_items(request: DeleteRequest, db: Session = Depends(get_db)):
-    indices_to_delete = request.indices
-    items_to_delete = db.query(Producto).filter(
-		Producto.id_producto.in_(indices_to_delete)).all()
-    if not items_to_delete:
+def delete_items(request: DeleteRequest, db: Session = Depends(get_db)):
+    encontrados, faltantes = eliminar_por_ids(db, Producto.id_producto, request.indices)
+    if not encontrados:
         raise HTTPException(status_code=404, detail="No items found to delete")
-    for item in items_to_delete:
-        db.delete(item)
-    db.commit()
-    return {"message": "Productos eliminados satisfactoriamente"}
+    indice_recomendador.eliminar_productos(encontrados)
+    return {"message": "Productos eliminados satisfactoriamente",
+            "encontrados": len(encontrados), "faltantes": faltantes}
+
+@router.put("/actualizar-productos/", status_code=status.HTTP_200_OK)
+def actualizar_items(current_user: Annotated[User_InDB, Security(get_current_user, scopes=["admin"])],
+					request: ProductoActualizacionMasiva, db: Session = Depends(get_db)):
+	valores = request.model_dump(exclude={"indices"}, exclude_none=True)
+	if not valores:
+		raise HTTPException(status_code=400, detail="No hay campos que actualizar")
+	encontrados, faltantes = actualizar_por_ids(db, Producto.id_producto, request.indices, valores)
+	if not encontrados:
+		raise HTTPException(status_code=404, detail="No items found to update")
+	if "desc_producto" in valores:
+		# Incremental, como actualizar_producto: el índice, la tabla de vecinos y
+		# el denso ven las descripciones nuevas sin esperar a un reajuste
+		indice_recomendador.actualizar_productos(leer_filas_por_ids(db, Producto.id_producto, encontrados,
+			Producto.id_producto, Producto.nombre_producto, Producto.desc_producto))
+	if "consumo_producto" in valores:
+		indice_recomendador.fijar_consumo([id_producto(i) for i in encontrados], valores["consumo_producto"])
+	return {"message": "Productos actualizados satisfactoriamente",
+			"encontrados": len(encontrados), "faltantes": faltantes}
 
 # Ruta para obtener la imagen de un producto por ID
 @router.get("/imagen/{id}")
-async def obtener_imagen(id: str):
-    db = SessionLocal()
-    producto = db.query(Producto).filter(Producto.id_producto == id).first()
-    if producto and producto.imagen_b64:
-        return Response(content=producto.imagen_b64, media_type="image/jpeg")
-    return {"mensaje": "Imagen no encontrada"}
\ No newline at end of file
+def obtener_imagen(id: str, request: Request, size: Optional[int] = Query(None), db: Session = Depends(get_db)):
+	if size is not None and size not in tamanos_imagen():
+		raise HTTPException(status_code=400, detail=f"Tamaños disponibles: {list(tamanos_imagen())}")
+	clave = id_producto(id)
+	huella = None
+	if clave is not None:
+		huella = db.scalar(select(Producto.imagen_hash).where(Producto.id_producto == clave))
+		if huella is None:
+			# Fila anterior al almacén que crear_esquema aún no ha migrado: se
+			# sirve el BLOB tal cual, como el endpoint original, sin escribir nada
+			blob = db.scalar(select(Producto.imagen_b64).where(Producto.id_producto == clave))
+			if blob:
+				return Response(content=blob, media_type="image/jpeg")
+	ruta = ruta_imagen(huella, size) if huella else None
+	if ruta is None:
+		return {"mensaje": "Imagen no encontrada"}
+	cabeceras = {"ETag": etag(huella, size), "Cache-Control": config.IMAGENES_CACHE_CONTROL}
+	if coincide_etag(request.headers.get("if-none-match"), cabeceras["ETag"]):
+		return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+	return FileResponse(ruta, media_type=tipo_mime(ruta), headers=cabeceras)
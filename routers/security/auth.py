@@ -5,7 +5,8 @@ from fastapi import APIRouter, Depends, HTTPException, status, Security
 from sqlalchemy.orm import Session
 
 from schemas.token import Token
-from security.auth import create_access_token, authenticate_user, get_current_active_user, get_current_user
+from security.auth import create_access_token, autenticar_usuario, get_current_active_user, get_current_user
+from core.ejecutores import ColaLlena, ejecutor_hash
 from db.database import get_db
 from schemas.user import User_InDB
 
@@ -16,7 +17,14 @@ router = APIRouter()
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
                                     db: Session = Depends(get_db)):
-	user = authenticate_user(form_data.username, form_data.password, db)
+	try:
+		user = await autenticar_usuario(form_data.username, form_data.password, db)
+	except ColaLlena:
+		raise HTTPException(
+			status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+			detail="Demasiados inicios de sesión simultáneos, reintente en unos segundos",
+			headers={"Retry-After": "1"},
+		)
 	if not user:
 		raise HTTPException(
 			status_code=status.HTTP_401_UNAUTHORIZED,
@@ -25,11 +33,15 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
 		)
 	access_token_expires = timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES))
 	access_token = create_access_token(
-		data={"sub": user.usuario, "scopes": user.role},   #form_data.scopes
+		data={"sub": user.usuario, "uid": str(user.id), "scopes": user.role},   #form_data.scopes
 		expires_delta=access_token_expires
 	)
 	return {"detail": "Ok", "access_token": access_token, "token_type": "Bearer"}
 
+@router.get("/token/estado")
+async def estado_hash():
+	return ejecutor_hash.estado()
+
 @router.get("/users/me")
 async def read_users_me(current_user: Annotated[User_InDB, Depends(get_current_user)]):
 	return current_user
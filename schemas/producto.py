@@ -1,6 +1,6 @@
-from typing import Union, Optional, List
+from typing import Union, Optional, List, Literal
 from datetime import date
-from pydantic import BaseModel, EmailStr 
+from pydantic import BaseModel, EmailStr, Field
 
 class ProductoBase(BaseModel):		
 	nombre_producto : str 
@@ -19,6 +19,24 @@ class ProductoConsumo(BaseModel):
 
 class ProductoRecomendar(BaseModel):
 	nombres_productos: List[str]
+	top_n: int = Field(2, ge=1, le=100)
+	# Sin agregación: top_n por semilla. Con ella: top_n global de toda la cesta
+	agregacion: Optional[Literal["suma", "max", "rrf"]] = None
+	# Peso del prior de popularidad en [0, 1]; None usa el valor por defecto de la configuración
+	peso_popularidad: Optional[float] = Field(None, ge=0, le=1)
+	# "tfidf" o "denso" (embeddings); None usa RECOMENDADOR_MOTOR. El denso no aplica popularidad
+	motor: Optional[Literal["tfidf", "denso"]] = None
+
+class ProductoImportar(BaseModel):
+	nombre_producto : str = Field(min_length=1, max_length=50)
+	desc_producto : str = Field(min_length=1, max_length=250)
+	# Imagen opcional codificada en base64
+	imagen_b64 : Optional[str] = None
+
+class ProductoActualizacionMasiva(BaseModel):
+	indices: List[str]
+	consumo_producto : Optional[int] = Field(None, ge=0)
+	desc_producto : Optional[str] = Field(None, min_length=1, max_length=250)
 
 class DeleteRequest(BaseModel):
     indices: List[str]
@@ -8,37 +8,119 @@ from jose import JWTError, jwt
 from pydantic import ValidationError
 from typing_extensions import Annotated
 from typing import Union
+from uuid import uuid4
+from cachetools import TTLCache
+import threading
+import time
+from starlette.concurrency import run_in_threadpool
 from db.database import get_db
 from core import config
+from core.ejecutores import ejecutor_hash
 from models.data import User
 from schemas.token import TokenData
 from schemas.user import User_InDB
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.HASH_BCRYPT_ROUNDS)
 
 oauth2_scheme = OAuth2PasswordBearer(
 	tokenUrl="token",
 	scopes={"admin": "Adicionar, modificar información.", "cliente": "Consumir información."}
 )
 
+# Usuarios ya resueltos, por (usuario, jti); evita la consulta en cada petición
+_usuarios_en_cache = TTLCache(maxsize=config.AUTH_CACHE_TAMANO, ttl=config.AUTH_CACHE_TTL)
+# Último cambio de cada usuario: con AUTH_CONFIAR_SCOPES_TOKEN los tokens
+# emitidos antes dejan de valer. Basta recordarlo mientras duran los tokens
+_usuarios_modificados = TTLCache(maxsize=config.AUTH_CACHE_TAMANO,
+	ttl=60 * int(config.ACCESS_TOKEN_EXPIRE_MINUTES or 30))
+_lock_usuarios = threading.Lock()
+
+def invalidar_usuario(*usuarios):
+	"""
+	Olvida los usuarios indicados tras modificarlos o eliminarlos.
+	"""
+	ahora = time.time()
+	with _lock_usuarios:
+		for clave in [c for c in _usuarios_en_cache if c[0] in usuarios]:
+			_usuarios_en_cache.pop(clave, None)
+		for usuario in usuarios:
+			_usuarios_modificados[usuario] = ahora
+
+def _usuario_cacheado(db, usuario, jti):
+	clave = (usuario, jti)
+	with _lock_usuarios:
+		user = _usuarios_en_cache.get(clave)
+	if user is not None:
+		return user
+	inicio = time.time()
+	user = get_user(db, usuario)
+	if user is None:
+		return None
+	# Desligado de la sesión de esta petición para poder reutilizarlo en otras
+	db.expunge(user)
+	with _lock_usuarios:
+		# Si el usuario cambió mientras se leía, lo leído puede estar obsoleto
+		if _usuarios_modificados.get(usuario, 0) < inicio:
+			_usuarios_en_cache[clave] = user
+	return user
+
+def _usuario_del_token(payload, usuario, scopes):
+	clave = (usuario, payload.get("jti"))
+	with _lock_usuarios:
+		modificado = _usuarios_modificados.get(usuario)
+		user = _usuarios_en_cache.get(clave)
+	if modificado is not None and payload.get("iat", 0) < int(modificado):
+		return None
+	if user is None:
+		# Sin consultar la base: identidad y scopes salen del token firmado
+		user = User(id=payload.get("uid"), usuario=usuario, role=scopes)
+		with _lock_usuarios:
+			_usuarios_en_cache[clave] = user
+	return user
+
+# bcrypt siempre en ejecutor_hash: limita cuántos hashes corren a la vez
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return ejecutor_hash.ejecutar(pwd_context.verify, plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return ejecutor_hash.ejecutar(pwd_context.hash, password)
 
 def get_user(db: Session, usuario: str):
 	db_user = db.query(User).filter(User.usuario == usuario).first()	
 	if db_user is not None:
 		return db_user 
 
+def _guardar_rehash(db, user, nuevo_hash):
+	# verify_and_update devuelve un hash nuevo si cambió el coste o el esquema
+	user.hashed_password = nuevo_hash
+	db.commit()
+
 def authenticate_user(usuario: str, password: str,  db: Session = Depends(get_db)):
     user = get_user(db, usuario)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password): #secret
+    valido, nuevo_hash = ejecutor_hash.ejecutar(pwd_context.verify_and_update, password, user.hashed_password) #secret
+    if not valido:
         return False
+    if nuevo_hash:
+        _guardar_rehash(db, user, nuevo_hash)
     return user
+
+async def autenticar_usuario(usuario: str, password: str, db: Session):
+	"""
+	Versión async de authenticate_user: la consulta va al threadpool y bcrypt
+	a ejecutor_hash, así el bucle de eventos nunca espera a ninguno. Lanza
+	ColaLlena si ya hay demasiados hashes pendientes.
+	"""
+	user = await run_in_threadpool(get_user, db, usuario)
+	if not user:
+		return False
+	valido, nuevo_hash = await ejecutor_hash.en_ejecutor(pwd_context.verify_and_update, password, user.hashed_password)
+	if not valido:
+		return False
+	if nuevo_hash:
+		await run_in_threadpool(_guardar_rehash, db, user, nuevo_hash)
+	return user
 	
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
     to_encode = data.copy()
@@ -46,11 +128,12 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=30) #Si no se pasa un valor por usuario
-    to_encode.update({"exp": expire})
+    # jti identifica el token en la caché de usuarios; iat permite invalidarlo
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, config.SECRET_KEY, algorithm=config.ALGORITHM)
     return encoded_jwt
 	
-async def get_current_user(
+def get_current_user(
 			security_scopes: SecurityScopes, 
 			token: Annotated[str, Depends(oauth2_scheme)],
 			db: Session = Depends(get_db)):
@@ -79,7 +162,10 @@ async def get_current_user(
 	except JWTError:
 		raise credentials_exception
 	
-	user = get_user(db, usuario=token_data.usuario)
+	if config.AUTH_CONFIAR_SCOPES_TOKEN:
+		user = _usuario_del_token(payload, token_data.usuario, token_data.scopes)
+	else:
+		user = _usuario_cacheado(db, token_data.usuario, payload.get("jti"))
 
 	if user is None:
 		raise credentials_exception
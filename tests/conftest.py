@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Antes de importar core.config: base de datos, almacenes y snapshots desechables
+_TEMPORAL = tempfile.mkdtemp(prefix="pruebas-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TEMPORAL, 'pruebas.db')}")
+os.environ.setdefault("RECOMENDADOR_SNAPSHOT_DIR", "")
+os.environ.setdefault("VECINOS_DIR", os.path.join(_TEMPORAL, "vecinos"))
+os.environ.setdefault("IMAGENES_DIR", os.path.join(_TEMPORAL, "imagenes"))
+os.environ.setdefault("DENSO_DIR", "")
+os.environ.setdefault("HASH_BCRYPT_ROUNDS", "4")
@@ -0,0 +1,112 @@
+import asyncio
+import contextlib
+
+import httpx
+
+from db.database import SessionLocal, crear_esquema
+from models.data import Producto, User
+from security.auth import get_password_hash
+
+
+def _admin(usuario="admin-pruebas", password="clave-pruebas"):
+    crear_esquema()
+    with SessionLocal() as db:
+        if db.query(User).filter(User.usuario == usuario).first() is None:
+            db.add(User(usuario=usuario, role=["admin", "cliente"], hashed_password=get_password_hash(password)))
+            db.commit()
+    return {"username": usuario, "password": password}
+
+
+@contextlib.asynccontextmanager
+async def _cliente():
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://pruebas") as cliente:
+            r = await cliente.post("/token", data=_admin())
+            r.raise_for_status()
+            cliente.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+            yield cliente
+
+
+async def _recomendar(cliente, nombres, top_n=10):
+    r = await cliente.post("/producto/leer_productos_recomendados/",
+                           json={"nombres_productos": nombres, "top_n": top_n, "agregacion": "suma"})
+    r.raise_for_status()
+    return [p["nombre_producto"] for p in r.json()]
+
+
+def test_actualizacion_masiva_llega_al_indice():
+    async def ejecutar():
+        async with _cliente() as cliente:
+            for i, desc in enumerate(["pizza con queso", "pizza con tomate", "sopa de pescado", "sopa de marisco"]):
+                r = await cliente.post("/producto/crear_producto/",
+                                       json={"nombre_producto": f"Masivo {i}", "desc_producto": desc})
+                r.raise_for_status()
+            with SessionLocal() as db:
+                ids = [str(p.id_producto) for p in db.query(Producto).filter(
+                    Producto.nombre_producto.in_(["Masivo 2", "Masivo 3"]))]
+            assert await _recomendar(cliente, ["Masivo 0"], top_n=1) == ["Masivo 1"]
+            r = await cliente.put("/producto/actualizar-productos/",
+                                  json={"indices": ids, "desc_producto": "pizza con queso y tomate"})
+            r.raise_for_status()
+            # Sin esperar a ningún reajuste
+            return await _recomendar(cliente, ["Masivo 0"], top_n=2)
+
+    recomendados = asyncio.run(ejecutar())
+    assert set(recomendados) == {"Masivo 2", "Masivo 3"}
+
+
+def _importar(cliente, prefijo, descripciones):
+    filas = [{"nombre_producto": f"{prefijo} {i}", "desc_producto": desc} for i, desc in enumerate(descripciones)]
+    return cliente.post("/producto/importar", json=filas)
+
+
+def test_importacion_recomendable_al_momento():
+    from engine.indice import indice_recomendador
+
+    async def ejecutar():
+        async with _cliente() as cliente:
+            # El alta incremental usa el vocabulario del último ajuste: se
+            # reajusta primero con un producto que ya contiene sus términos
+            (await _importar(cliente, "Vocabulario", ["tortilla de patatas con cebolla"])).raise_for_status()
+            await asyncio.to_thread(indice_recomendador.reajustar)
+            r = await _importar(cliente, "Importado", ["tortilla de patatas con cebolla"])
+            r.raise_for_status()
+            assert r.json()["insertados"] == 1
+            return await _recomendar(cliente, ["Vocabulario 0"], top_n=1)
+
+    assert asyncio.run(ejecutar()) == ["Importado 0"]
+
+
+def test_importacion_grande_encola_un_reajuste(monkeypatch):
+    import core.config as config
+    from engine.planificador import planificador_indice
+
+    monkeypatch.setattr(config, "RECOMENDADOR_IMPORTACION_INCREMENTAL", 0)
+    monkeypatch.setattr(planificador_indice, "espera", 0.05)
+
+    async def ejecutar():
+        async with _cliente() as cliente:
+            await planificador_indice.esperar_indice()
+            reconstrucciones = planificador_indice.reconstrucciones
+            r = await _importar(cliente, "Reajustado", ["empanada gallega de atun", "empanada gallega de carne",
+                                                        "tarta de manzana"])
+            r.raise_for_status()
+            for _ in range(100):
+                if planificador_indice.reconstrucciones > reconstrucciones:
+                    break
+                await asyncio.sleep(0.05)
+            return await _recomendar(cliente, ["Reajustado 0"], top_n=1)
+
+    assert asyncio.run(ejecutar()) == ["Reajustado 1"]
+
+
+def test_imagen_inexistente_responde_como_el_original():
+    async def ejecutar():
+        async with _cliente() as cliente:
+            r = await cliente.get("/producto/imagen/00000000-0000-0000-0000-000000000000")
+            return r.status_code, r.json()
+
+    assert asyncio.run(ejecutar()) == (200, {"mensaje": "Imagen no encontrada"})
@@ -0,0 +1,48 @@
+import asyncio
+
+from engine.cache_resultados import CacheResultados
+
+
+def test_motores_alternos_no_se_invalidan():
+    cache = CacheResultados(max_bytes=2**20, ttl=60)
+    calculos = []
+
+    def calcular(motor):
+        async def calculo():
+            calculos.append(motor)
+            return [{"id_producto": "1", "nombre_producto": motor}]
+        return calculo
+
+    async def alternar():
+        # Cada motor con su propia versión del catálogo
+        versiones = {"tfidf": 7, "denso": 3}
+        for _ in range(5):
+            for motor, version in versiones.items():
+                clave = cache.clave(motor, version, ["pizza", "pasta"], 5, "suma")
+                assert await cache.obtener(clave, calcular(motor)) == [
+                    {"id_producto": "1", "nombre_producto": motor}]
+
+    asyncio.run(alternar())
+    assert calculos == ["tfidf", "denso"]
+    assert cache.aciertos == 8
+    assert cache.fallos == 2
+    assert cache.invalidaciones == 0
+
+
+def test_cambio_de_version_solo_descarta_su_motor():
+    cache = CacheResultados(max_bytes=2**20, ttl=60)
+
+    async def valor(motor):
+        return [{"nombre_producto": motor}]
+
+    async def pedir():
+        await cache.obtener(cache.clave("tfidf", 1, ["pizza"], 5), lambda: valor("tfidf"))
+        await cache.obtener(cache.clave("denso", 1, ["pizza"], 5), lambda: valor("denso"))
+        await cache.obtener(cache.clave("tfidf", 2, ["pizza"], 5), lambda: valor("tfidf"))
+        await cache.obtener(cache.clave("denso", 1, ["pizza"], 5), lambda: valor("denso"))
+
+    asyncio.run(pedir())
+    assert cache.invalidaciones == 1
+    assert cache.aciertos == 1
+    assert cache.estado()["entradas"] == 2
+    assert cache.estado()["expulsadas"] == 0
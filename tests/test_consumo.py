@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from db.consumo import AcumuladorConsumo, sumar_consumo
+from db.database import crear_esquema, crear_motor
+from models.data import Producto
+
+HILOS = 8
+INCREMENTOS = 50
+
+
+@pytest.fixture
+def sesiones(tmp_path):
+    motor = crear_motor(f"sqlite:///{tmp_path / 'consumo.db'}")
+    crear_esquema(motor)
+    sesiones = sessionmaker(bind=motor)
+    with sesiones() as db:
+        db.execute(insert(Producto), [
+            {"nombre_producto": f"Producto {i}", "desc_producto": "pizza casera", "consumo_producto": 0}
+            for i in range(3)])
+        db.commit()
+    yield sesiones
+    motor.dispose()
+
+
+def _ids(sesiones):
+    with sesiones() as db:
+        return [str(i) for i in db.scalars(select(Producto.id_producto))]
+
+
+def _total(sesiones):
+    with sesiones() as db:
+        return db.scalar(select(func.sum(Producto.consumo_producto)))
+
+
+def _lanzar(operacion, ids):
+    barrera = threading.Barrier(HILOS)
+    errores = []
+
+    def trabajador(h):
+        barrera.wait()
+        for i in range(INCREMENTOS):
+            try:
+                operacion(ids[(h + i) % len(ids)])
+            except Exception as e:
+                errores.append(e)
+
+    hilos = [threading.Thread(target=trabajador, args=(h,)) for h in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert errores == []
+
+
+def test_update_atomico_no_pierde_incrementos(sesiones):
+    def sumar(id):
+        with sesiones() as db:
+            sumar_consumo(db, {id: 1})
+
+    _lanzar(sumar, _ids(sesiones))
+    assert _total(sesiones) == HILOS * INCREMENTOS
+
+
+def test_acumulador_no_pierde_incrementos(sesiones):
+    # Volcados frecuentes y por tamaño de lote mientras siguen llegando incrementos
+    acumulador = AcumuladorConsumo(sesiones=sesiones, intervalo=0.005, max_eventos=7)
+    acumulador.iniciar()
+    ids = _ids(sesiones)
+    try:
+        _lanzar(acumulador.sumar, ids)
+        # Cada tanda queda volcada por separado, haga lo que haga el hilo
+        acumulador.volcar()
+        _lanzar(acumulador.sumar, ids)
+    finally:
+        acumulador.detener()
+    assert acumulador.volcados >= 2
+    assert acumulador.estado()["pendientes"] == 0
+    assert _total(sesiones) == 2 * HILOS * INCREMENTOS
@@ -0,0 +1,26 @@
+from sqlalchemy import insert, select
+
+from db.database import crear_esquema, crear_motor, migrar_imagenes
+from db.imagenes import ruta_imagen
+from models.data import Producto
+
+
+def test_crear_esquema_migra_los_blobs_al_almacen(tmp_path):
+    motor = crear_motor(f"sqlite:///{tmp_path / 'imagenes.db'}")
+    crear_esquema(motor)
+    with motor.begin() as conexion:
+        conexion.execute(insert(Producto), [
+            {"nombre_producto": "Con imagen", "desc_producto": "pizza casera", "imagen_b64": b"\xff\xd8\xff imagen"},
+            {"nombre_producto": "Sin imagen", "desc_producto": "pizza casera", "imagen_b64": None}])
+
+    crear_esquema(motor)
+    with motor.connect() as conexion:
+        filas = dict(conexion.execute(select(Producto.nombre_producto, Producto.imagen_hash)).all())
+        blobs = conexion.execute(select(Producto.imagen_b64).where(Producto.imagen_b64.is_not(None))).all()
+    assert blobs == []
+    assert filas["Sin imagen"] is None
+    with open(ruta_imagen(filas["Con imagen"]), "rb") as f:
+        assert f.read() == b"\xff\xd8\xff imagen"
+    # Ya migradas: las siguientes pasadas no hacen nada
+    assert migrar_imagenes(motor) == 0
+    motor.dispose()
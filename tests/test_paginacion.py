@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from db.database import crear_esquema, crear_motor
+from db.productos import listar_pagina
+from models.data import Producto
+
+
+@pytest.fixture
+def sesiones(tmp_path):
+    motor = crear_motor(f"sqlite:///{tmp_path / 'paginacion.db'}")
+    crear_esquema(motor)
+    sesiones = sessionmaker(bind=motor)
+    with sesiones() as db:
+        # Mezcla de consumos con NULL, que cuenta como 0
+        db.execute(insert(Producto), [
+            {"nombre_producto": f"Producto {i}", "desc_producto": "pizza casera",
+             "consumo_producto": None if i % 3 == 0 else i % 4}
+            for i in range(20)])
+        db.commit()
+    yield sesiones
+    motor.dispose()
+
+
+def test_cursor_por_consumo_recorre_las_filas_sin_consumo(sesiones):
+    vistos = []
+    cursor = None
+    with sesiones() as db:
+        while True:
+            filas, cursor = listar_pagina(db, limit=3, cursor=cursor, orden="consumo")
+            vistos.extend(filas)
+            if cursor is None:
+                break
+    assert sorted(f.nombre_producto for f in vistos) == sorted(f"Producto {i}" for i in range(20))
+    assert [f.consumo for f in vistos] == sorted((f.consumo for f in vistos), reverse=True)
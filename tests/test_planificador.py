@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+from engine.planificador import PlanificadorIndice
+
+
+class IndiceLento:
+    # Sustituto de RecommenderIndex con un ajuste que tarda
+    def __init__(self, duracion):
+        self.duracion = duracion
+        self.listo = False
+        self.ajustes = 0
+        self.empezado = threading.Event()
+
+    def reajustar(self):
+        self.empezado.set()
+        time.sleep(self.duracion)
+        self.ajustes += 1
+        self.listo = True
+
+
+def test_aviso_durante_un_ajuste_provoca_otro():
+    indice = IndiceLento(0.3)
+
+    async def ejecutar():
+        planificador = PlanificadorIndice(indice, espera=0.05, espera_maxima=1.0)
+        await planificador.iniciar()
+        await asyncio.get_running_loop().run_in_executor(None, indice.empezado.wait)
+        planificador.notificar()
+        for _ in range(100):
+            if indice.ajustes >= 2:
+                break
+            await asyncio.sleep(0.05)
+        await planificador.detener()
+        return planificador.reconstrucciones
+
+    assert asyncio.run(ejecutar()) == 2
+    assert indice.ajustes == 2
+
+
+def test_sin_avisos_no_repite_el_ajuste():
+    indice = IndiceLento(0.05)
+
+    async def ejecutar():
+        planificador = PlanificadorIndice(indice, espera=0.05, espera_maxima=1.0)
+        await planificador.iniciar()
+        await planificador.esperar_indice()
+        await asyncio.sleep(0.3)
+        await planificador.detener()
+
+    asyncio.run(ejecutar())
+    assert indice.ajustes == 1